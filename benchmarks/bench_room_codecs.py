@@ -0,0 +1,41 @@
+import argparse
+import time
+
+import django
+
+django.setup()
+
+from pokerback.room.models import Room  # noqa: E402
+from pokerback.utils.codecs import CODECS, decode_object  # noqa: E402
+
+from benchmarks.rooms import build_room  # noqa: E402
+
+
+def _timeit(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    room = build_room(args.games)
+    print("room: {} games".format(args.games))
+    for name, codec in CODECS.items():
+        data = codec.encode(room)
+        encode_time = _timeit(lambda: codec.encode(room), args.repeat)
+        decode_time = _timeit(lambda: decode_object(Room, data), args.repeat)
+        print(
+            "{:8} {:9} bytes, encode {:7.1f} ms, decode {:7.1f} ms".format(
+                name, len(data), encode_time * 1000, decode_time * 1000
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
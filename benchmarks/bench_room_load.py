@@ -0,0 +1,63 @@
+import argparse
+import time
+
+import django
+
+django.setup()
+
+from pokerback.room.models import Room  # noqa: E402
+from pokerback.utils.baseobject import BaseObject  # noqa: E402
+
+from benchmarks.rooms import build_room  # noqa: E402
+
+
+def _timeit(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def _load_validating_every_level(json_str):
+    # Previous behaviour: every nested object validated its subtree when built
+    room = Room.from_json_str(json_str, trusted=True)
+    stack = [room]
+    while stack:
+        obj = stack.pop()
+        obj.validate()
+        for value in obj.__dict__.values():
+            if isinstance(value, dict):
+                value = list(value.values())
+            if isinstance(value, list):
+                stack.extend(item for item in value if isinstance(item, BaseObject))
+            elif isinstance(value, BaseObject):
+                stack.append(value)
+    return room
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    room = build_room(args.games)
+    json_str = room.to_json_str()
+    print("room: {} games, {} bytes".format(args.games, len(json_str)))
+
+    benchmarks = [
+        (
+            "load, validating every level",
+            lambda: _load_validating_every_level(json_str),
+        ),
+        ("load, validating once", lambda: Room.from_json_str(json_str)),
+        ("load, trusted", lambda: Room.from_json_str(json_str, trusted=True)),
+        ("save, validating", lambda: (room.validate(), room.to_json_str())),
+        ("save, not validating", lambda: room.to_json_str()),
+    ]
+    for name, func in benchmarks:
+        print("{:32} {:8.1f} ms".format(name, _timeit(func, args.repeat) * 1000))
+
+
+if __name__ == "__main__":
+    main()
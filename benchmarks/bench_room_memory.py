@@ -0,0 +1,86 @@
+import argparse
+import gc
+import tracemalloc
+
+import django
+
+django.setup()
+
+from pokerback.room.models import Room  # noqa: E402
+from pokerback.utils.baseobject import BaseObject  # noqa: E402
+
+from benchmarks.rooms import build_room  # noqa: E402
+
+
+def _iter_objects(obj):
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        yield obj
+        for key in getattr(obj.__class__, "__annotations__", {}):
+            value = getattr(obj, key, None)
+            if isinstance(value, dict):
+                value = list(value.values())
+            if isinstance(value, list):
+                stack.extend(item for item in value if isinstance(item, BaseObject))
+            elif isinstance(value, BaseObject):
+                stack.append(value)
+
+
+def _without_slots(cls):
+    # Same fields and defaults as a slotted class, stored in a __dict__
+    namespace = dict(cls._slot_defaults)
+    namespace["__annotations__"] = cls.__annotations__
+    return type(cls.__name__, (BaseObject,), namespace)
+
+
+def _traced_size(build):
+    gc.collect()
+    tracemalloc.start()
+    objects = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=300)
+    args = parser.parse_args()
+
+    json_str = build_room(args.games).to_json_str()
+    room_size = _traced_size(lambda: Room.from_json_str(json_str, trusted=True))
+    print("room: {} games, {:.1f} KB loaded".format(args.games, room_size / 1024))
+
+    objects_by_class = {}
+    for obj in _iter_objects(Room.from_json_str(json_str, trusted=True)):
+        objects_by_class.setdefault(obj.__class__, []).append(obj)
+
+    saved = 0
+    for cls, objects in objects_by_class.items():
+        if not cls.__dict__.get("__slots__"):
+            continue
+        dict_cls = _without_slots(cls)
+        fields = [obj._asdict() for obj in objects]
+        slots_size = _traced_size(
+            lambda: [cls(_validate=False, **values) for values in fields]
+        )
+        dict_size = _traced_size(
+            lambda: [dict_cls(_validate=False, **values) for values in fields]
+        )
+        saved += dict_size - slots_size
+        print(
+            "{:20} {:7} objects, {:6.1f} B/object with __dict__, {:6.1f} "
+            "with slots".format(
+                cls.__name__,
+                len(objects),
+                dict_size / len(objects),
+                slots_size / len(objects),
+            )
+        )
+    print("saved by slots: {:.1f} KB".format(saved / 1024))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import json
+import random
+import time
+
+import django
+
+django.setup()
+
+from pokerback.poker.managers import PokerManager  # noqa: E402
+from pokerback.poker.objects import GameStatus  # noqa: E402
+from pokerback.room.models import Room  # noqa: E402
+from pokerback.utils.codecs import get_codec, decode_object  # noqa: E402
+
+from benchmarks.rooms import build_room, play_action, start_game  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=300)
+    parser.add_argument("--actions", type=int, default=200)
+    parser.add_argument("--codec", default="binary")
+    args = parser.parse_args()
+
+    codec = get_codec(args.codec)
+    rand = random.Random(0)
+    manager = PokerManager()
+    room = build_room(args.games)
+    data = codec.encode(room)
+
+    diff_time = 0
+    patch_time = 0
+    patch_sizes = []
+    room_sizes = []
+    for _ in range(args.actions):
+        # Each action loads the room, plays on it and stores the change
+        before = decode_object(Room, data)
+        room = decode_object(Room, data)
+        if room.poker_games.games[-1].game_status == GameStatus.OVER:
+            start_game(manager, room)
+        else:
+            play_action(manager, room.poker_games.games[-1], rand)
+
+        start = time.perf_counter()
+        patch = before.diff(room)
+        diff_time += time.perf_counter() - start
+        start = time.perf_counter()
+        before.patch(patch)
+        patch_time += time.perf_counter() - start
+        assert before == room
+
+        data = codec.encode(room)
+        patch_sizes.append(len(json.dumps(patch)))
+        room_sizes.append(len(data))
+
+    print("room: {} games, {} actions".format(args.games, args.actions))
+    num_actions = args.actions
+    print("stored room {:9.0f} bytes".format(sum(room_sizes) / num_actions))
+    print("patch       {:9.0f} bytes".format(sum(patch_sizes) / num_actions))
+    print("diff        {:9.2f} ms".format(diff_time / num_actions * 1000))
+    print("apply patch {:9.2f} ms".format(patch_time / num_actions * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import argparse
+import time
+
+import django
+
+django.setup()
+
+from pokerback.apis.player_apis import PlayerRetrieveRoomResponse  # noqa: E402
+from pokerback.room.models import Room  # noqa: E402
+from pokerback.utils.codecs import CODECS, decode_object  # noqa: E402
+
+from benchmarks.rooms import build_room  # noqa: E402
+
+
+def _timeit(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+class _User:
+    name = "player"
+    uuid = "player_0"
+    room_key = "BENCH"
+
+
+class _Request:
+    user = _User()
+
+
+def _poll(data):
+    # What a player poll does once the room blob is fetched
+    room = decode_object(Room, data)
+    return PlayerRetrieveRoomResponse.from_room(room, _Request()).to_json_str()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for num_games in args.games:
+        room = build_room(num_games)
+        for name, codec in CODECS.items():
+            data = codec.encode(room)
+            print(
+                "{:4} games {:8} poll {:7.1f} ms".format(
+                    num_games, name, _timeit(lambda: _poll(data), args.repeat) * 1000
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import random
+import time
+
+import django
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+
+from pokerback.poker.managers import PokerManager  # noqa: E402
+from pokerback.poker.objects import GameStatus  # noqa: E402
+from pokerback.room.models import Room  # noqa: E402
+from pokerback.utils.codecs import get_codec  # noqa: E402
+
+from benchmarks.rooms import build_room, play_action, start_game  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=300)
+    parser.add_argument("--actions", type=int, default=200)
+    parser.add_argument("--codec", default="binary")
+    args = parser.parse_args()
+
+    settings.REDIS_OBJECT_CODEC = args.codec
+    rand = random.Random(0)
+    manager = PokerManager()
+    room = build_room(args.games)
+    room_size = len(get_codec(args.codec).encode(room))
+    _, fields = room.get_changed_fields()
+
+    encode_time = 0
+    written_sizes = []
+    for _ in range(args.actions):
+        # Each action loads the room from its fields, plays on it and saves it
+        room = Room.join_fields(fields)
+        room.stored_fields = fields
+        if room.poker_games.games[-1].game_status == GameStatus.OVER:
+            start_game(manager, room)
+        else:
+            play_action(manager, room.poker_games.games[-1], rand)
+
+        start = time.perf_counter()
+        changed, fields = room.get_changed_fields()
+        encode_time += time.perf_counter() - start
+        written_sizes.append(sum(len(encoded) for encoded in changed.values()))
+
+    print("room: {} games, {} actions".format(args.games, args.actions))
+    num_actions = args.actions
+    print("whole room     {:9.0f} bytes".format(room_size))
+    print("changed fields {:9.0f} bytes".format(sum(written_sizes) / num_actions))
+    print("encode fields  {:9.2f} ms".format(encode_time / num_actions * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import random
+
+from pokerback.poker.deck import SeededDealer
+from pokerback.poker.managers import PokerManager
+from pokerback.poker.objects import ActionType, GameMetadata, GameStatus, PokerGames
+from pokerback.poker.player_apis import PokerAction
+from pokerback.poker.utils import get_player_min_bet
+from pokerback.room.models import Room
+from pokerback.room.objects import (
+    GameType,
+    RoomStatus,
+    Slot,
+    SlotStatus,
+    TableMetadata,
+)
+
+
+def build_table_metadata(num_players):
+    return TableMetadata(
+        game_type=GameType.POKER,
+        max_slots=num_players,
+        slots=[
+            Slot(player_id="player_{}".format(idx), slot_status=SlotStatus.ACTIVE)
+            for idx in range(num_players)
+        ],
+        action_seconds_limit=60,
+    )
+
+
+def play_action(manager, game, rand):
+    # Random action of the next player: folds, raises, calls or checks
+    player_id = game.next_player_id
+    min_bet = get_player_min_bet(game.player_states, player_id)
+    choice = rand.random()
+    if choice < 0.1 and min_bet > 0:
+        poker_action = PokerAction(action_type=ActionType.FOLD)
+    elif choice < 0.3:
+        poker_action = PokerAction(action_type=ActionType.BET, amount_bet=min_bet + 20)
+    elif min_bet > 0:
+        poker_action = PokerAction(action_type=ActionType.BET, amount_bet=min_bet)
+    else:
+        poker_action = PokerAction(action_type=ActionType.CHECK)
+    manager.apply_action(game, player_id, poker_action)
+
+
+def start_game(manager, room):
+    # Next game of the room, without the locking and saving of PokerManager
+    poker_games = room.poker_games
+    game_metadata = poker_games.game_metadata
+    game_id = len(poker_games.games)
+    game_metadata.button_idx = game_id % len(room.table_metadata.slots)
+    game = manager.create_game(
+        game_id=game_id,
+        table_metadata=room.table_metadata.copy(),
+        game_metadata=game_metadata.copy(),
+        player_amounts={
+            slot.player_id: game_metadata.init_token
+            for slot in room.table_metadata.slots
+        },
+        seed=manager.dealer.get_game_seed(room, game_id),
+    )
+    poker_games.games.append(game)
+    return game
+
+
+def build_room(num_games, num_players=6, seed=0):
+    # Room with a history of num_games played games, the same for the same seed
+    rand = random.Random(seed)
+    manager = PokerManager(dealer=SeededDealer(seed=seed))
+    room = Room(
+        room_uuid="benchmark",
+        room_key="BENCH",
+        host_user_uuid="host",
+        room_status=RoomStatus.ACTIVE,
+        table_metadata=build_table_metadata(num_players),
+    )
+    room.poker_games = PokerGames(
+        game_metadata=GameMetadata(small_blind=10, init_token=1000000)
+    )
+    for _ in range(num_games):
+        game = start_game(manager, room)
+        while game.game_status == GameStatus.PLAYING:
+            play_action(manager, game, rand)
+    return room
@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import generics
 
 from pokerback.apis.host_apis import (
@@ -12,7 +13,15 @@ from pokerback.utils.authentication import HostAuthentication
 from pokerback.utils.views import BaseGetView, BasePostView, BasicRequest, BasicResponse
 
 
-class CreateRoomView(BasePostView):
+class StreamLargeRoomMixin:
+    # Rooms grow with their games, small ones are rendered at once
+    def should_stream(self, response_obj):
+        poker_games = response_obj.room.poker_games
+        num_games = len(poker_games.games) if poker_games is not None else 0
+        return num_games >= settings.STREAM_RESPONSE_MIN_GAMES
+
+
+class CreateRoomView(StreamLargeRoomMixin, BasePostView):
     authentication_classes = (HostAuthentication,)
 
     request_class = HostCreateRoomRequest
@@ -28,7 +37,7 @@ class CreateRoomView(BasePostView):
         return HostRetrieveRoomResponse(room=room)
 
 
-class RetrieveRoomView(BaseGetView):
+class RetrieveRoomView(StreamLargeRoomMixin, BaseGetView):
     authentication_classes = (HostAuthentication,)
 
     response_class = HostRetrieveRoomResponse
@@ -54,7 +63,7 @@ class CloseRoomView(BasePostView):
         return BasicResponse()
 
 
-class StartGameView(BasePostView):
+class StartGameView(StreamLargeRoomMixin, BasePostView):
     authentication_classes = (HostAuthentication,)
 
     request_class = BasicRequest
@@ -66,7 +75,8 @@ class StartGameView(BasePostView):
             host_user=self.request.user,
             room_status=RoomStatus.ACTIVE,
         )
-        room = room_model.load_room()
-        room = get_game_manager(room.table_metadata.game_type).start_game(room)
+        room = get_game_manager(GameType(room_model.game_type)).start_game(
+            str(room_model.room_uuid)
+        )
 
         return HostRetrieveRoomResponse(room=room)
@@ -10,7 +10,7 @@ from pokerback.apis.player_apis import (
 )
 from pokerback.room.managers import RoomManager, get_game_manager
 from pokerback.room.models import RoomModel
-from pokerback.room.objects import RoomStatus
+from pokerback.room.objects import GameType, RoomStatus
 from pokerback.utils.authentication import PlayerSigninAuthentication
 from pokerback.utils.views import BaseGetView, BasePostView, BasicRequest, BasicResponse
 
@@ -57,9 +57,9 @@ class SitRoomView(BasePostView):
         room_model = generics.get_object_or_404(
             RoomModel.objects, room_key=room_key, room_status=RoomStatus.ACTIVE
         )
-        room = room_model.load_room()
-
-        room = RoomManager().sit_player(room, self.request.user, slot_idx)
+        room = RoomManager().sit_player(
+            str(room_model.room_uuid), self.request.user, slot_idx
+        )
 
         return PlayerRetrieveRoomResponse.from_room(room=room, request=self.request)
 
@@ -73,9 +73,8 @@ class PlayerActionView(BasePostView):
         room_model = generics.get_object_or_404(
             RoomModel.objects, room_key=room_key, room_status=RoomStatus.ACTIVE
         )
-        room = room_model.load_room()
-        room = get_game_manager(room.table_metadata.game_type).handle_player_action(
-            room, self.request.user.uuid, request_obj
+        room = get_game_manager(GameType(room_model.game_type)).handle_player_action(
+            str(room_model.room_uuid), self.request.user.uuid, request_obj
         )
 
         return PlayerRetrieveRoomResponse.from_room(room=room, request=self.request)
@@ -0,0 +1,140 @@
+import numpy as np
+
+from pokerback.poker.cards import CARD_RANKS, CARD_SUITS
+from pokerback.poker.evaluator import (
+    GRADE_HIGH_CARD,
+    GRADE_PAIR,
+    GRADE_TWO_PAIRS,
+    GRADE_THREE_OF_A_KIND,
+    GRADE_STRAIGHT,
+    GRADE_FLUSH,
+    GRADE_FULL_HOUSE,
+    GRADE_FOUR_OF_A_KIND,
+    GRADE_STRAIGHT_FLUSH,
+)
+from pokerback.poker.objects import HAND_TYPES_BY_GRADE
+
+CARD_RANKS_ARRAY = np.array(CARD_RANKS, dtype=np.int64)
+CARD_SUITS_ARRAY = np.array(CARD_SUITS, dtype=np.int64)
+RANK_BITS = np.left_shift(1, np.arange(13, dtype=np.int64))
+
+# Highest rank held in a 13 bit rank mask, -1 for an empty mask
+HIGHEST_RANKS = np.array(
+    [mask.bit_length() - 1 for mask in range(1 << 13)], dtype=np.int64
+)
+
+WHEEL_RANK_MASK = 0b1000000001111
+
+
+def _highest_rank(rank_masks):
+    return HIGHEST_RANKS[rank_masks]
+
+
+def _without_rank(rank_masks, ranks):
+    return rank_masks & ~np.left_shift(1, np.maximum(ranks, 0))
+
+
+def _straight_highs(rank_masks):
+    # Rank of the highest card of the best straight in each mask, or -1
+    highs = np.where(rank_masks & WHEEL_RANK_MASK == WHEEL_RANK_MASK, 3, -1)
+    for high in range(4, 13):
+        straight_mask = 0b11111 << (high - 4)
+        highs = np.where(rank_masks & straight_mask == straight_mask, high, highs)
+    return highs
+
+
+def _encode(grades, ranks):
+    strengths = grades.astype(np.int64)
+    for i in range(5):
+        strengths = np.left_shift(strengths, 4) | ranks[i]
+    return strengths
+
+
+def evaluate_batch(card_ids):
+    # Strengths and grades of the best hands out of an (N, 7) array of card ids,
+    # matching pokerback.poker.evaluator.evaluate for each row
+    card_ids = np.asarray(card_ids, dtype=np.int64)
+    assert card_ids.ndim == 2 and card_ids.shape[1] == 7
+    num_hands = card_ids.shape[0]
+    ranks = CARD_RANKS_ARRAY[card_ids]
+    suits = CARD_SUITS_ARRAY[card_ids]
+
+    # Rank and suit histograms
+    rank_counts = (ranks[:, :, None] == np.arange(13)).sum(axis=1)
+    suit_counts = (suits[:, :, None] == np.arange(4)).sum(axis=1)
+    rank_masks = (rank_counts > 0).astype(np.int64) @ RANK_BITS
+
+    # Flush masks: ranks held in the suit with at least 5 cards
+    flush_suits = suit_counts.argmax(axis=1)
+    has_flush = suit_counts.max(axis=1) >= 5
+    in_flush = suits == flush_suits[:, None]
+    flush_masks = np.where(in_flush, np.left_shift(1, ranks), 0).sum(axis=1)
+    flush_masks = np.where(has_flush, flush_masks, 0)
+
+    straight_highs = _straight_highs(rank_masks)
+    straight_flush_highs = _straight_highs(flush_masks)
+
+    # Ranks ordered by (count, rank) descending, like the bundles of a hand
+    scores = np.where(rank_counts > 0, rank_counts * 16 + np.arange(13), -1)
+    ordered = np.argsort(-scores, axis=1, kind="stable")[:, :5]
+    ordered_counts = np.take_along_axis(rank_counts, ordered, axis=1)
+    o = [ordered[:, i] for i in range(5)]
+    top_count = ordered_counts[:, 0]
+    second_count = ordered_counts[:, 1]
+
+    quads_kickers = _highest_rank(_without_rank(rank_masks, o[0]))
+    two_pairs_kickers = _highest_rank(
+        _without_rank(_without_rank(rank_masks, o[0]), o[1])
+    )
+    flush_ranks = []
+    remaining = flush_masks
+    for _ in range(5):
+        flush_ranks.append(_highest_rank(remaining))
+        remaining = _without_rank(remaining, flush_ranks[-1])
+
+    zeros = np.zeros(num_hands, dtype=np.int64)
+    # (condition, grade, ranks) from the strongest hand type to the weakest
+    categories = [
+        (
+            straight_flush_highs >= 0,
+            GRADE_STRAIGHT_FLUSH,
+            [straight_flush_highs - 1, zeros, zeros, zeros, zeros],
+        ),
+        (
+            top_count == 4,
+            GRADE_FOUR_OF_A_KIND,
+            [o[0], o[0], o[0], o[0], quads_kickers],
+        ),
+        (
+            (top_count == 3) & (second_count >= 2),
+            GRADE_FULL_HOUSE,
+            [o[0], o[0], o[0], o[1], o[1]],
+        ),
+        (has_flush, GRADE_FLUSH, flush_ranks),
+        (
+            straight_highs >= 0,
+            GRADE_STRAIGHT,
+            [straight_highs - 1, zeros, zeros, zeros, zeros],
+        ),
+        (top_count == 3, GRADE_THREE_OF_A_KIND, [o[0], o[0], o[0], o[1], o[2]]),
+        (
+            (top_count == 2) & (second_count == 2),
+            GRADE_TWO_PAIRS,
+            [o[0], o[0], o[1], o[1], two_pairs_kickers],
+        ),
+        (top_count == 2, GRADE_PAIR, [o[0], o[0], o[1], o[2], o[3]]),
+    ]
+
+    grades = np.full(num_hands, GRADE_HIGH_CARD, dtype=np.int64)
+    strengths = _encode(grades, o)
+    # Apply from the weakest hand type up so the strongest one wins
+    for condition, grade, category_ranks in reversed(categories):
+        grades = np.where(condition, grade, grades)
+        strengths = np.where(
+            condition, _encode(np.full(num_hands, grade), category_ranks), strengths
+        )
+    return strengths, grades
+
+
+def hand_types_from_grades(grades):
+    return [HAND_TYPES_BY_GRADE[grade] for grade in np.asarray(grades).tolist()]
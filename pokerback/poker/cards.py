@@ -0,0 +1,64 @@
+# Compact card encoding used by the engine: a card is its id in 0..51, being
+# color_idx * 13 + number - 1, and a set of cards is a 52 bit mask of ids.
+NUM_CARDS = 52
+FULL_DECK_MASK = (1 << NUM_CARDS) - 1
+
+# Bits of each color in a card mask, ordered like Card colors
+SUIT_MASKS = tuple(0x1FFF << (suit * 13) for suit in range(4))
+
+CARD_SUITS = tuple(card_id // 13 for card_id in range(NUM_CARDS))
+CARD_NUMBERS = tuple(card_id % 13 + 1 for card_id in range(NUM_CARDS))
+# Rank of each card from 0 (two) to 12 (ace), used for comparing hands
+CARD_RANKS = tuple((card_id % 13 + 12) % 13 for card_id in range(NUM_CARDS))
+
+# Bits of the 4 cards of each rank in a card mask
+RANK_CARD_MASKS = tuple(
+    sum(1 << card_id for card_id in range(NUM_CARDS) if CARD_RANKS[card_id] == rank)
+    for rank in range(13)
+)
+
+WHEEL_RANK_MASK = 0b1000000001111
+STRAIGHT_RANK_MASKS = frozenset(
+    [0b11111 << low for low in range(9)] + [WHEEL_RANK_MASK]
+)
+
+
+def card_bit(card_id):
+    return 1 << card_id
+
+
+def mask_from_ids(card_ids):
+    mask = 0
+    for card_id in card_ids:
+        mask |= 1 << card_id
+    return mask
+
+
+def ids_from_mask(mask):
+    card_ids = []
+    while mask:
+        low_bit = mask & -mask
+        card_ids.append(low_bit.bit_length() - 1)
+        mask ^= low_bit
+    return card_ids
+
+
+def mask_from_cards(cards):
+    return mask_from_ids(card.card_id for card in cards)
+
+
+def count_cards(mask):
+    return bin(mask).count("1")
+
+
+def suit_rank_mask(mask, suit):
+    # 13 bit mask of the ranks held in one color, the ace moving from bit 0 to 12
+    numbers = (mask >> (suit * 13)) & 0x1FFF
+    return (numbers >> 1) | ((numbers & 1) << 12)
+
+
+def rank_mask(mask):
+    res = 0
+    for suit in range(4):
+        res |= suit_rank_mask(mask, suit)
+    return res
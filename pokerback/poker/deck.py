@@ -0,0 +1,104 @@
+import hashlib
+import queue
+import random
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+
+from pokerback.poker.cards import NUM_CARDS
+from pokerback.poker.objects import CARDS
+
+system_random = random.SystemRandom()
+# Seconds the refill thread of a full pool waits before checking if it was closed
+REFILL_WAIT_SECONDS = 1
+
+
+def shuffle_card_ids(rand=system_random):
+    # random.shuffle is a Fisher-Yates shuffle, SystemRandom draws from os.urandom
+    card_ids = list(range(NUM_CARDS))
+    rand.shuffle(card_ids)
+    return card_ids
+
+
+class Deck:
+    def __init__(self, card_ids):
+        self.card_ids = card_ids
+        self.position = 0
+
+    @classmethod
+    def shuffled(cls, rand=system_random):
+        return cls(shuffle_card_ids(rand))
+
+    def deal(self, num_cards):
+        assert self.position + num_cards <= len(self.card_ids)
+        card_ids = self.card_ids[self.position : self.position + num_cards]
+        self.position += num_cards
+        return [CARDS[card_id] for card_id in card_ids]
+
+
+class DeckPool:
+    # Pre-shuffled decks, refilled by a background thread so that dealing a game
+    # does no RNG work on the request path
+    def __init__(self, size):
+        self.decks = queue.Queue(maxsize=size)
+        self.closed = threading.Event()
+        self.refill_thread = threading.Thread(target=self._refill, daemon=True)
+        self.refill_thread.start()
+
+    def _refill(self):
+        card_ids = None
+        while not self.closed.is_set():
+            if card_ids is None:
+                card_ids = shuffle_card_ids()
+            try:
+                # Blocks while the pool is full, checking now and then for close
+                self.decks.put(card_ids, timeout=REFILL_WAIT_SECONDS)
+                card_ids = None
+            except queue.Full:
+                pass
+
+    def close(self):
+        self.closed.set()
+        self.refill_thread.join()
+
+    def get_deck(self):
+        try:
+            return Deck(self.decks.get_nowait())
+        except queue.Empty:
+            # Pool drained by a burst of games, shuffle in place
+            return Deck.shuffled()
+
+
+@lru_cache(1)
+def get_deck_pool():
+    # Created on first use, so each worker process runs its own refill thread
+    return DeckPool(settings.DECK_POOL_SIZE)
+
+
+def get_deck():
+    if settings.DECK_POOL_SIZE > 0:
+        return get_deck_pool().get_deck()
+    return Deck.shuffled()
+
+
+class Dealer:
+    # Deals from the shuffled deck pool, games are not seeded
+    def get_game_seed(self, room, game_id):
+        return None
+
+    def get_deck(self, seed):
+        if seed is None:
+            return get_deck()
+        return Deck.shuffled(random.Random(seed))
+
+
+class SeededDealer(Dealer):
+    # Deterministic decks for load tests and replays, seeded per room and game
+    def __init__(self, seed=None):
+        self.seed = seed
+
+    def get_game_seed(self, room, game_id):
+        room_seed = self.seed if self.seed is not None else room.room_uuid
+        digest = hashlib.sha256("{}:{}".format(room_seed, game_id).encode()).digest()
+        return int.from_bytes(digest[:8], "big")
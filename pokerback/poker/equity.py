@@ -0,0 +1,132 @@
+import random
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+
+from pokerback.poker.cards import FULL_DECK_MASK, ids_from_mask, mask_from_cards
+from pokerback.poker.evaluator import evaluate_mask, get_lookup_tables
+from pokerback.poker.objects import PlayerEquity, PlayerStatus
+
+# Trials are always split in chunks of this size, so that a seeded run gives the
+# same result no matter how many processes it is spread across
+EQUITY_CHUNK_TRIALS = 1000
+
+
+def _simulate_chunk(hole_masks, board_mask, trials, seed):
+    rand = random.Random(seed)
+    deck = ids_from_mask(FULL_DECK_MASK & ~board_mask & ~sum(hole_masks))
+    num_missing = 5 - bin(board_mask).count("1")
+
+    wins = [0] * len(hole_masks)
+    ties = [0] * len(hole_masks)
+    shares = [0.0] * len(hole_masks)
+    for _ in range(trials):
+        full_board_mask = board_mask
+        for card_id in rand.sample(deck, num_missing):
+            full_board_mask |= 1 << card_id
+
+        strengths = [evaluate_mask(hole | full_board_mask) for hole in hole_masks]
+        best_strength = max(strengths)
+        winners = [i for i in range(len(strengths)) if strengths[i] == best_strength]
+        for i in winners:
+            if len(winners) == 1:
+                wins[i] += 1
+            else:
+                ties[i] += 1
+            shares[i] += 1 / len(winners)
+    return wins, ties, shares
+
+
+def _get_chunks(trials, seed):
+    # Chunk seeds are derived from the seed, or left to the OS when not seeded
+    seeds = random.Random(seed) if seed is not None else None
+    chunks = []
+    while trials > 0:
+        chunk_trials = min(trials, EQUITY_CHUNK_TRIALS)
+        chunk_seed = seeds.getrandbits(64) if seeds is not None else None
+        chunks.append((chunk_trials, chunk_seed))
+        trials -= chunk_trials
+    return chunks
+
+
+def _run_chunks(executor, hole_masks, board_mask, chunks):
+    futures = [
+        executor.submit(_simulate_chunk, hole_masks, board_mask, chunk_trials, seed)
+        for chunk_trials, seed in chunks
+    ]
+    return [future.result() for future in futures]
+
+
+@lru_cache(1)
+def get_equity_pool():
+    # Created on first use and kept, rather than forking processes on every call.
+    # The tables are built before forking so that worker processes inherit them.
+    get_lookup_tables()
+    return ProcessPoolExecutor(max_workers=settings.EQUITY_MAX_WORKERS)
+
+
+def calculate_equity(
+    hole_cards, board_cards=(), trials=10000, seed=None, executor=None, max_workers=None
+):
+    # hole_cards maps each player id to the player's 2 cards
+    player_ids = list(hole_cards.keys())
+    hole_masks = tuple(
+        mask_from_cards(hole_cards[player_id]) for player_id in player_ids
+    )
+    board_mask = mask_from_cards(board_cards)
+    assert len(player_ids) > 1
+    assert len(board_cards) <= 5
+    if trials <= 0:
+        raise ValueError(f"trials must be positive, got {trials}")
+    assert bin(sum(hole_masks) | board_mask).count("1") == (
+        2 * len(player_ids) + len(board_cards)
+    ), "Cards must be distinct"
+
+    if len(board_cards) == 5:
+        # Nothing left to deal, a single trial is exact
+        trials = 1
+
+    chunks = _get_chunks(trials, seed)
+    max_workers = max_workers or settings.EQUITY_MAX_WORKERS
+    if executor is None and (
+        max_workers == 1 or trials < settings.EQUITY_POOL_MIN_TRIALS
+    ):
+        results = [
+            _simulate_chunk(hole_masks, board_mask, chunk_trials, chunk_seed)
+            for chunk_trials, chunk_seed in chunks
+        ]
+    else:
+        results = _run_chunks(
+            executor or get_equity_pool(), hole_masks, board_mask, chunks
+        )
+
+    res = {}
+    for i in range(len(player_ids)):
+        wins = sum(result[0][i] for result in results)
+        ties = sum(result[1][i] for result in results)
+        shares = sum(result[2][i] for result in results)
+        res[player_ids[i]] = PlayerEquity(
+            player_id=player_ids[i],
+            win=wins / trials,
+            tie=ties / trials,
+            equity=shares / trials,
+        )
+    return res
+
+
+def get_game_equities(game, trials=10000, seed=None, executor=None, max_workers=None):
+    # Equities of the players still betting, from the table cards visible so far
+    hole_cards = {
+        player_id: player_state.cards
+        for player_id, player_state in game.player_states.items()
+        if player_state.player_status == PlayerStatus.BETTING
+    }
+    return calculate_equity(
+        hole_cards,
+        board_cards=game.get_visible_table_cards(),
+        trials=trials,
+        seed=seed,
+        executor=executor,
+        max_workers=max_workers,
+    )
@@ -0,0 +1,199 @@
+from functools import lru_cache
+from itertools import combinations_with_replacement
+
+from pokerback.poker.cards import (
+    RANK_CARD_MASKS,
+    SUIT_MASKS,
+    WHEEL_RANK_MASK,
+    count_cards,
+    mask_from_ids,
+    rank_mask,
+)
+
+# Hand strengths are packed into a single int: the hand type grade followed by
+# 5 card ranks, 4 bits each, so that comparing strengths compares hands.
+# Card ranks go from 0 (two) to 12 (ace).
+GRADE_HIGH_CARD = 1
+GRADE_PAIR = 2
+GRADE_TWO_PAIRS = 3
+GRADE_THREE_OF_A_KIND = 4
+GRADE_STRAIGHT = 5
+GRADE_FLUSH = 6
+GRADE_FULL_HOUSE = 7
+GRADE_FOUR_OF_A_KIND = 8
+GRADE_STRAIGHT_FLUSH = 9
+
+# Multisets of ranks are keyed by summing 5 ** rank, no rank shows up over 4 times
+RANK_KEYS = tuple(5 ** rank for rank in range(13))
+
+
+def encode_strength(grade, ranks):
+    strength = grade
+    for i in range(5):
+        strength = (strength << 4) | (ranks[i] if i < len(ranks) else 0)
+    return strength
+
+
+def strength_grade(strength):
+    return strength >> 20
+
+
+def strength_ranks(strength):
+    return [(strength >> (16 - 4 * i)) & 0xF for i in range(5)]
+
+
+def _straight_high(rank_mask):
+    # Return the rank of the highest card of the best straight, or -1
+    for high in range(12, 3, -1):
+        straight_mask = 0b11111 << (high - 4)
+        if rank_mask & straight_mask == straight_mask:
+            return high
+    if rank_mask & WHEEL_RANK_MASK == WHEEL_RANK_MASK:
+        return 3
+    return -1
+
+
+def _straight_strength(grade, high):
+    # Straights are ranked by the number of their second lowest card
+    return encode_strength(grade, [high - 1])
+
+
+def _flush_strength(rank_mask):
+    high = _straight_high(rank_mask)
+    if high >= 0:
+        return _straight_strength(GRADE_STRAIGHT_FLUSH, high)
+    ranks = [rank for rank in range(12, -1, -1) if rank_mask & (1 << rank)]
+    return encode_strength(GRADE_FLUSH, ranks[:5])
+
+
+def _ranks_strength(counts):
+    # Best non-flush hand out of 5 to 7 cards, given the card count of each rank
+    by_count = {1: [], 2: [], 3: [], 4: []}
+    rank_mask = 0
+    for rank in range(12, -1, -1):
+        if counts[rank] > 0:
+            by_count[counts[rank]].append(rank)
+            rank_mask |= 1 << rank
+
+    if by_count[4]:
+        quad = by_count[4][0]
+        kicker = max(rank for rank in range(13) if counts[rank] > 0 and rank != quad)
+        return encode_strength(GRADE_FOUR_OF_A_KIND, [quad] * 4 + [kicker])
+    if by_count[3] and len(by_count[3]) + len(by_count[2]) > 1:
+        trips = by_count[3][0]
+        pair = max(by_count[3][1:] + by_count[2])
+        return encode_strength(GRADE_FULL_HOUSE, [trips] * 3 + [pair] * 2)
+
+    high = _straight_high(rank_mask)
+    if high >= 0:
+        return _straight_strength(GRADE_STRAIGHT, high)
+
+    if by_count[3]:
+        trips = by_count[3][0]
+        kickers = by_count[1][:2]
+        return encode_strength(GRADE_THREE_OF_A_KIND, [trips] * 3 + kickers)
+    if len(by_count[2]) > 1:
+        high_pair, low_pair = by_count[2][:2]
+        kicker = max(by_count[2][2:] + by_count[1])
+        return encode_strength(
+            GRADE_TWO_PAIRS, [high_pair] * 2 + [low_pair] * 2 + [kicker]
+        )
+    if by_count[2]:
+        pair = by_count[2][0]
+        return encode_strength(GRADE_PAIR, [pair] * 2 + by_count[1][:3])
+    return encode_strength(GRADE_HIGH_CARD, by_count[1][:5])
+
+
+def _number_mask_ranks(number_mask):
+    # Ranks held in the 13 bits of one color of a card mask, aces being bit 0
+    return [(number + 12) % 13 for number in range(13) if number_mask & (1 << number)]
+
+
+@lru_cache(1)
+def get_lookup_tables():
+    # Both tables below are indexed by the 13 bits of one color of a card mask
+    # Flush table: color holding 5 to 7 cards -> strength
+    flush_table = {}
+    # Rank keys: color -> its contribution to the rank multiset key
+    rank_keys = []
+    for number_mask in range(1 << 13):
+        ranks = _number_mask_ranks(number_mask)
+        rank_keys.append(sum(RANK_KEYS[rank] for rank in ranks))
+        if 5 <= len(ranks) <= 7:
+            flush_table[number_mask] = _flush_strength(
+                sum(1 << rank for rank in ranks)
+            )
+
+    # Rank table: multiset of 5 to 7 ranks -> strength, ignoring colors
+    rank_table = {}
+    for num_cards in range(5, 8):
+        for ranks in combinations_with_replacement(range(13), num_cards):
+            counts = [0] * 13
+            for rank in ranks:
+                counts[rank] += 1
+            if max(counts) > 4:
+                continue
+            key = sum(RANK_KEYS[rank] for rank in ranks)
+            rank_table[key] = _ranks_strength(counts)
+
+    return flush_table, tuple(rank_keys), rank_table
+
+
+def evaluate_mask(mask):
+    # Strength of the best 5-card hand out of a mask of 5 to 7 cards
+    flush_table, rank_keys, rank_table = get_lookup_tables()
+    key = 0
+    flush_strength = 0
+    for shift in (0, 13, 26, 39):
+        number_mask = (mask >> shift) & 0x1FFF
+        key += rank_keys[number_mask]
+        if number_mask in flush_table:
+            flush_strength = flush_table[number_mask]
+    return max(rank_table[key], flush_strength)
+
+
+def evaluate(card_ids):
+    return evaluate_mask(mask_from_ids(card_ids))
+
+
+def best_hand_card_ids(mask, strength):
+    # Pick the 5 card ids out of a card mask making up a hand of the given strength
+    grade = strength_grade(strength)
+    if grade == GRADE_FLUSH or grade == GRADE_STRAIGHT_FLUSH:
+        for suit_mask in SUIT_MASKS:
+            if count_cards(mask & suit_mask) >= 5:
+                mask &= suit_mask
+
+    if grade == GRADE_STRAIGHT or grade == GRADE_STRAIGHT_FLUSH:
+        high = strength_ranks(strength)[0] + 1
+        ranks = [(high - i) % 13 for i in range(5)]
+    else:
+        ranks = strength_ranks(strength)
+
+    res = []
+    for rank in ranks:
+        rank_cards = mask & RANK_CARD_MASKS[rank]
+        low_bit = rank_cards & -rank_cards
+        assert low_bit > 0
+        res.append(low_bit.bit_length() - 1)
+        mask ^= low_bit
+    return res
+
+
+def count_draw_outs(mask, strength):
+    # (flush outs, straight outs) among the unseen cards for a 5 or 6 card mask
+    grade = strength_grade(strength)
+    flush_outs = 0
+    if grade < GRADE_FLUSH:
+        for suit_mask in SUIT_MASKS:
+            if count_cards(mask & suit_mask) == 4:
+                flush_outs += 9
+
+    straight_outs = 0
+    if grade < GRADE_STRAIGHT:
+        held_ranks = rank_mask(mask)
+        for rank in range(13):
+            rank_bit = 1 << rank
+            if not held_ranks & rank_bit and _straight_high(held_ranks | rank_bit) >= 0:
+                straight_outs += 4
+    return flush_outs, straight_outs
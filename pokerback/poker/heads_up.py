@@ -0,0 +1,299 @@
+import logging
+import mmap
+import os
+import struct
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import combinations
+
+import numpy as np
+from django.conf import settings
+
+from pokerback.poker.cards import (
+    CARD_RANKS,
+    CARD_SUITS,
+    FULL_DECK_MASK,
+    NUM_CARDS,
+    count_cards,
+    ids_from_mask,
+    mask_from_cards,
+)
+from pokerback.poker.evaluator import RANK_KEYS, evaluate_mask, get_lookup_tables
+from pokerback.poker.objects import PlayerEquity
+
+logger = logging.getLogger(__name__)
+
+# All 1326 two-card combos, as (low card id, high card id)
+COMBOS = tuple(combinations(range(NUM_CARDS), 2))
+COMBO_INDICES = {combo: idx for idx, combo in enumerate(COMBOS)}
+NUM_COMBOS = len(COMBOS)
+
+# Preflop table file: header, then (wins, ties) of every combo against every combo
+TABLE_MAGIC = b"PKEQ"
+TABLE_VERSION = 2
+TABLE_HEADER = struct.Struct("<4sII")
+PREFLOP_BOARDS = 1712304  # 48 choose 5
+
+SUIT_PERMUTATIONS = tuple(
+    (a, b, c, d)
+    for a in range(4)
+    for b in range(4)
+    for c in range(4)
+    for d in range(4)
+    if len({a, b, c, d}) == 4
+)
+
+
+def get_combo_idx(card_id_a, card_id_b):
+    return COMBO_INDICES[(min(card_id_a, card_id_b), max(card_id_a, card_id_b))]
+
+
+def enumerate_heads_up(hero_mask, villain_mask, board_mask=0):
+    # Exact (wins, ties, boards) for the hero over every possible board completion
+    deck_bits = [
+        1 << card_id
+        for card_id in ids_from_mask(
+            FULL_DECK_MASK & ~(hero_mask | villain_mask | board_mask)
+        )
+    ]
+    wins = 0
+    ties = 0
+    boards = 0
+    for board_bits in combinations(deck_bits, 5 - count_cards(board_mask)):
+        full_board_mask = board_mask | sum(board_bits)
+        hero_strength = evaluate_mask(hero_mask | full_board_mask)
+        villain_strength = evaluate_mask(villain_mask | full_board_mask)
+        if hero_strength > villain_strength:
+            wins += 1
+        elif hero_strength == villain_strength:
+            ties += 1
+        boards += 1
+    return wins, ties, boards
+
+
+@lru_cache(1)
+def _get_board_tables():
+    # Every 5 card board as its card mask, the index of its multiset of ranks
+    # and the cards of its suit holding 3 cards or more, if any, with the
+    # strengths of every rank multiset plus 2 hole ranks. About 60MB in all, built
+    # in about 10s.
+    flush_table, _, rank_table = get_lookup_tables()
+    board_ids = np.array(list(combinations(range(NUM_CARDS), 5)), dtype=np.int64)
+    board_masks = np.bitwise_or.reduce(np.left_shift(1, board_ids), axis=1)
+
+    rank_keys = np.array(RANK_KEYS, dtype=np.int64)
+    board_keys = rank_keys[np.array(CARD_RANKS)[board_ids]].sum(axis=1)
+    unique_keys, board_rank_classes = np.unique(board_keys, return_inverse=True)
+    rank_strengths = np.zeros((len(unique_keys), 13, 13), dtype=np.int64)
+    for class_idx, key in enumerate(unique_keys.tolist()):
+        for rank_a in range(13):
+            for rank_b in range(13):
+                rank_strengths[class_idx, rank_a, rank_b] = rank_table.get(
+                    key + RANK_KEYS[rank_a] + RANK_KEYS[rank_b], 0
+                )
+
+    suit_masks = np.stack(
+        [(board_masks >> (suit * 13)) & 0x1FFF for suit in range(4)], axis=1
+    )
+    board_suits = np.array(CARD_SUITS)[board_ids]
+    suit_counts = (board_suits[:, :, None] == np.arange(4)).sum(axis=1)
+    flush_suits = suit_counts.argmax(axis=1)
+    has_flush_draw = suit_counts.max(axis=1) >= 3
+    flush_masks = suit_masks[np.arange(len(board_ids)), flush_suits].astype(np.int16)
+    flush_strengths = np.zeros(1 << 13, dtype=np.int64)
+    for number_mask, strength in flush_table.items():
+        flush_strengths[number_mask] = strength
+    return (
+        board_masks,
+        board_rank_classes.astype(np.int32),
+        rank_strengths,
+        has_flush_draw,
+        flush_suits.astype(np.int8),
+        flush_masks,
+        flush_strengths,
+    )
+
+
+def enumerate_heads_up_batch(hero_mask, villain_mask, board_mask=0):
+    # Same as enumerate_heads_up, evaluating all boards at once with numpy, about
+    # 0.1s preflop instead of 6.7s once the board tables are built
+    (
+        board_masks,
+        board_rank_classes,
+        rank_strengths,
+        has_flush_draw,
+        flush_suits,
+        flush_masks,
+        flush_strengths,
+    ) = _get_board_tables()
+    selected = (board_masks & board_mask == board_mask) & (
+        board_masks & (hero_mask | villain_mask) == 0
+    )
+    rank_classes = board_rank_classes[selected]
+    flush_selected = selected & has_flush_draw
+    strengths = []
+    for hole_mask in (hero_mask, villain_mask):
+        rank_a, rank_b = [CARD_RANKS[card_id] for card_id in ids_from_mask(hole_mask)]
+        hole_strengths = rank_strengths[rank_classes, rank_a, rank_b]
+        # Only boards with 3 cards of a suit may make a flush
+        hole_suits = np.array(
+            [(hole_mask >> (suit * 13)) & 0x1FFF for suit in range(4)]
+        )
+        flushes = flush_strengths[
+            flush_masks[flush_selected] | hole_suits[flush_suits[flush_selected]]
+        ]
+        hole_strengths[has_flush_draw[selected]] = np.maximum(
+            hole_strengths[has_flush_draw[selected]], flushes
+        )
+        strengths.append(hole_strengths)
+    hero_strengths, villain_strengths = strengths
+    wins = int((hero_strengths > villain_strengths).sum())
+    ties = int((hero_strengths == villain_strengths).sum())
+    return wins, ties, len(rank_classes)
+
+
+class PreflopTable:
+    def __init__(self, buffer):
+        magic, version, num_combos = TABLE_HEADER.unpack_from(buffer)
+        if magic != TABLE_MAGIC or version != TABLE_VERSION:
+            raise Exception("Invalid preflop equity table")
+        assert num_combos == NUM_COMBOS
+
+        view = memoryview(buffer)
+        combos_start = TABLE_HEADER.size
+        combos_end = combos_start + NUM_COMBOS * NUM_COMBOS * 2 * 4
+        self.buffer = buffer
+        self.combo_results = view[combos_start:combos_end].cast("I")
+
+    def get_combo_result(self, hero_idx, villain_idx):
+        offset = (hero_idx * NUM_COMBOS + villain_idx) * 2
+        wins = self.combo_results[offset]
+        ties = self.combo_results[offset + 1]
+        return wins, ties, PREFLOP_BOARDS
+
+
+def get_preflop_table():
+    # A missing table is not cached, so that workers pick it up once generated
+    path = settings.PREFLOP_EQUITY_PATH
+    if not os.path.exists(path):
+        logger.warning("Preflop equity table %s not found, enumerating boards", path)
+        return None
+    return _load_preflop_table(path)
+
+
+@lru_cache(1)
+def _load_preflop_table(path):
+    # Memory-mapped read only, so all worker processes share the same pages
+    with open(path, "rb") as table_file:
+        buffer = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+    return PreflopTable(buffer)
+
+
+def calculate_heads_up_equity(hole_cards, board_cards=()):
+    # Exact equity of 2 players all-in, hole_cards mapping player ids to 2 cards
+    assert len(hole_cards) == 2
+    hero_id, villain_id = hole_cards.keys()
+    hero_cards = hole_cards[hero_id]
+    villain_cards = hole_cards[villain_id]
+    hero_mask = mask_from_cards(hero_cards)
+    villain_mask = mask_from_cards(villain_cards)
+    board_mask = mask_from_cards(board_cards)
+    assert count_cards(hero_mask | villain_mask | board_mask) == 4 + len(board_cards)
+
+    table = get_preflop_table() if len(board_cards) == 0 else None
+    if table is not None:
+        wins, ties, boards = table.get_combo_result(
+            get_combo_idx(*[card.card_id for card in hero_cards]),
+            get_combo_idx(*[card.card_id for card in villain_cards]),
+        )
+    else:
+        wins, ties, boards = enumerate_heads_up(hero_mask, villain_mask, board_mask)
+
+    losses = boards - wins - ties
+    return {
+        hero_id: PlayerEquity(
+            player_id=hero_id,
+            win=wins / boards,
+            tie=ties / boards,
+            equity=(wins + ties / 2) / boards,
+        ),
+        villain_id: PlayerEquity(
+            player_id=villain_id,
+            win=losses / boards,
+            tie=ties / boards,
+            equity=(losses + ties / 2) / boards,
+        ),
+    }
+
+
+def _permute_suits(mask, permutation):
+    res = 0
+    for suit in range(4):
+        res |= ((mask >> (suit * 13)) & 0x1FFF) << (permutation[suit] * 13)
+    return res
+
+
+def _get_canonical_matchup(hero_mask, villain_mask):
+    # Matchups only differing by a renaming of suits have the same results
+    return min(
+        (
+            _permute_suits(hero_mask, permutation),
+            _permute_suits(villain_mask, permutation),
+        )
+        for permutation in SUIT_PERMUTATIONS
+    )
+
+
+def _enumerate_matchup(matchup):
+    return enumerate_heads_up_batch(*matchup)
+
+
+def build_preflop_results(max_workers=None, log=None):
+    # (wins, ties) of the hero for every ordered pair of non overlapping combos.
+    # The 84825 matchups up to suits, of 1712304 boards each, take about 0.1s
+    # each, so about 2.5 CPU hours, against almost a week with enumerate_heads_up.
+    _get_board_tables()
+    combo_masks = [(1 << low) | (1 << high) for low, high in COMBOS]
+    matchups = {}
+    for hero_idx in range(NUM_COMBOS):
+        for villain_idx in range(hero_idx + 1, NUM_COMBOS):
+            hero_mask = combo_masks[hero_idx]
+            villain_mask = combo_masks[villain_idx]
+            if hero_mask & villain_mask:
+                continue
+            canonical = _get_canonical_matchup(hero_mask, villain_mask)
+            matchups.setdefault(canonical, []).append((hero_idx, villain_idx))
+
+    results = {}
+    canonical_matchups = list(matchups.keys())
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for done, (canonical, (wins, ties, boards)) in enumerate(
+            zip(
+                canonical_matchups,
+                pool.map(_enumerate_matchup, canonical_matchups, chunksize=16),
+            )
+        ):
+            for hero_idx, villain_idx in matchups[canonical]:
+                results[(hero_idx, villain_idx)] = (wins, ties)
+                results[(villain_idx, hero_idx)] = (boards - wins - ties, ties)
+            if log is not None and (done + 1) % 1000 == 0:
+                log("{}/{} matchups".format(done + 1, len(canonical_matchups)))
+    return results
+
+
+def write_preflop_table(path, results):
+    combo_results = array("I", bytes(NUM_COMBOS * NUM_COMBOS * 2 * 4))
+    for (hero_idx, villain_idx), (wins, ties) in results.items():
+        offset = (hero_idx * NUM_COMBOS + villain_idx) * 2
+        combo_results[offset] = wins
+        combo_results[offset + 1] = ties
+
+    # Write aside then move in place, so readers never map a partial file
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as table_file:
+        table_file.write(
+            TABLE_HEADER.pack(TABLE_MAGIC, TABLE_VERSION, NUM_COMBOS)
+        )
+        combo_results.tofile(table_file)
+    os.replace(tmp_path, path)
@@ -0,0 +1,27 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from pokerback.poker.heads_up import build_preflop_results, write_preflop_table
+
+
+class Command(BaseCommand):
+    # About 2.5 CPU hours, spread over --workers processes
+    help = "Enumerate every heads-up preflop matchup into the preflop equity table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=settings.PREFLOP_EQUITY_PATH)
+        parser.add_argument(
+            "--workers", type=int, default=settings.EQUITY_MAX_WORKERS,
+        )
+
+    def handle(self, *args, **options):
+        output = options["output"]
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+        results = build_preflop_results(
+            max_workers=options["workers"], log=self.stdout.write
+        )
+        write_preflop_table(output, results)
+        self.stdout.write("Preflop equity table written to {}".format(output))
@@ -10,17 +10,21 @@ from pokerback.poker.objects import (
     PlayerTokens,
     PlayerStateResponse,
 )
+from pokerback.poker.deck import Dealer
+from pokerback.poker.player_apis import PokerAction
 from pokerback.poker.utils import (
-    get_random_cards,
     get_next_button_idx,
     get_player_min_bet,
     handle_game_over_player_update,
 )
 from pokerback.room.objects import GameType, SlotStatus
-from pokerback.utils.redis import RedisLock
+from pokerback.room.queue import update_room
 
 
 class PokerManager:
+    def __init__(self, dealer=None):
+        self.dealer = dealer or Dealer()
+
     def init_game(self, room, create_room_request):
         assert room.table_metadata.game_type == GameType.POKER
         assert room.poker_games == None
@@ -37,149 +41,188 @@ class PokerManager:
         room.save()
         return room
 
-    def start_game(self, room):
-        with RedisLock(room.room_uuid):
-            poker_games = room.poker_games
-            # assert no current games going on
-            assert (
-                len(poker_games.games) == 0
-                or poker_games.games[-1].game_status == GameStatus.OVER
-            )
-            # assert at least 2 active players are seated
-            active_players = room.table_metadata.get_active_players()
-            assert len(active_players) > 1
-
-            # If starting first game, assign default tokens to players
-            if len(poker_games.games) == 0:
-                for slot in room.table_metadata.slots:
-                    player_id = slot.player_id
-                    if player_id != None:
-                        poker_games.players[player_id] = PlayerTokens(
-                            player_id=player_id,
-                            amount_available=poker_games.game_metadata.init_token,
-                        )
-
-            # Start creating new game
-            # 1. random out the cards on the table and for each player
-            cards = get_random_cards(5 + len(active_players) * 2)
-            # 2. Set new button idx
-            poker_games.game_metadata.button_idx = get_next_button_idx(
-                room, poker_games.game_metadata.button_idx + 1
-            )
-            # 3. create Game object
-            table_metadata = room.table_metadata.copy()
-            game_metadata = poker_games.game_metadata.copy()
-            game = Game(
-                game_id=len(poker_games.games),
-                table_metadata=table_metadata,
-                game_metadata=game_metadata,
-                table_cards=cards[0:5],
-            )
-            # 4. construct player states
-            player_states = {}
-            idx = 0
-            for player_id in active_players:
-                player_states[player_id] = PlayerGameState(
-                    player_id=player_id,
-                    cards=cards[5 + idx * 2 : 7 + idx * 2],
-                    amount_available=poker_games.players[player_id].amount_available,
-                )
-                idx += 1
-            game.player_states = player_states
-            # 5. place small and big blinds
-            slots = table_metadata.slots
-            small_blind_idx = game.get_next_betting_idx(game_metadata.button_idx)
-            small_blind_player_id = slots[small_blind_idx].player_id
-            amount = min(
-                game_metadata.small_blind,
-                player_states[small_blind_player_id].amount_available,
+    def start_game(self, room_uuid):
+        return update_room(room_uuid, self._start_game)
+
+    def _start_game(self, room):
+        poker_games = room.poker_games
+        # assert no current games going on
+        assert (
+            len(poker_games.games) == 0
+            or poker_games.games[-1].game_status == GameStatus.OVER
+        )
+        # assert at least 2 active players are seated
+        active_players = room.table_metadata.get_active_players()
+        assert len(active_players) > 1
+
+        # If starting first game, assign default tokens to players
+        if len(poker_games.games) == 0:
+            for slot in room.table_metadata.slots:
+                player_id = slot.player_id
+                if player_id != None:
+                    poker_games.players[player_id] = PlayerTokens(
+                        player_id=player_id,
+                        amount_available=poker_games.game_metadata.init_token,
+                    )
+
+        # Set new button idx
+        poker_games.game_metadata.button_idx = get_next_button_idx(
+            room, poker_games.game_metadata.button_idx + 1
+        )
+        # Create the game from a fresh deck
+        game_id = len(poker_games.games)
+        game = self.create_game(
+            game_id=game_id,
+            table_metadata=room.table_metadata.copy(),
+            game_metadata=poker_games.game_metadata.copy(),
+            player_amounts={
+                player_id: poker_games.players[player_id].amount_available
+                for player_id in active_players
+            },
+            seed=self.dealer.get_game_seed(room, game_id),
+        )
+        poker_games.games.append(game)
+
+    def create_game(self, game_id, table_metadata, game_metadata, player_amounts, seed):
+        # Players are dealt in slot order, so that a seed always deals the same hands
+        active_players = [
+            slot.player_id
+            for slot in table_metadata.slots
+            if slot.slot_status == SlotStatus.ACTIVE
+        ]
+        # 1. random out the cards on the table and for each player
+        deck = self.dealer.get_deck(seed)
+        cards = deck.deal(5 + len(active_players) * 2)
+        # 2. create Game object
+        game = Game(
+            game_id=game_id,
+            table_metadata=table_metadata,
+            game_metadata=game_metadata,
+            table_cards=cards[0:5],
+            seed=seed,
+        )
+        # 3. construct player states
+        player_states = {}
+        idx = 0
+        for player_id in active_players:
+            player_states[player_id] = PlayerGameState(
+                player_id=player_id,
+                cards=cards[5 + idx * 2 : 7 + idx * 2],
+                amount_available=player_amounts[player_id],
             )
-            player_states[small_blind_player_id].bet(amount)
+            idx += 1
+        game.player_states = player_states
+        # 4. place small and big blinds
+        slots = table_metadata.slots
+        small_blind_idx = game.get_next_betting_idx(game_metadata.button_idx)
+        small_blind_player_id = slots[small_blind_idx].player_id
+        amount = min(
+            game_metadata.small_blind,
+            player_states[small_blind_player_id].amount_available,
+        )
+        player_states[small_blind_player_id].bet(amount)
 
-            big_blind_idx = game.get_next_betting_idx(small_blind_idx)
-            big_blind_player_id = slots[big_blind_idx].player_id
-            amount = min(
-                game_metadata.small_blind * 2,
-                player_states[big_blind_player_id].amount_available,
+        big_blind_idx = game.get_next_betting_idx(small_blind_idx)
+        big_blind_player_id = slots[big_blind_idx].player_id
+        amount = min(
+            game_metadata.small_blind * 2,
+            player_states[big_blind_player_id].amount_available,
+        )
+        player_states[big_blind_player_id].bet(amount)
+
+        # Attach next player id
+        game.next_player_id = slots[game.get_next_betting_idx(big_blind_idx)].player_id
+        return game
+
+    def handle_player_action(self, room_uuid, player_id, action_obj):
+        return update_room(
+            room_uuid,
+            self._handle_player_action,
+            player_id=player_id,
+            poker_action=action_obj.poker_action.to_json(),
+        )
+
+    def _handle_player_action(self, room, player_id, poker_action):
+        # assert game is playing
+        assert (
+            len(room.poker_games.games) > 0
+            and room.poker_games.games[-1].game_status == GameStatus.PLAYING
+        )
+        game = room.poker_games.games[-1]
+        self.apply_action(game, player_id, PokerAction.from_json(poker_action))
+
+        if game.game_status == GameStatus.OVER:
+            # Handle over game processes
+            handle_game_over_player_update(room.poker_games.players, game)
+
+    def apply_action(self, game, player_id, poker_action):
+        # assert waiting for this player's action
+        assert game.next_player_id == player_id
+
+        player_states = game.player_states
+
+        # Find out the min bets needed for the player
+        min_bet = get_player_min_bet(player_states, player_id)
+
+        # Extract and handle action
+        if poker_action.action_type == ActionType.FOLD:
+            # 1. Handle fold
+            assert min_bet > 0
+            player_states[player_id].fold()
+        elif poker_action.action_type == ActionType.CHECK:
+            # 2. Handle check
+            assert min_bet == 0
+        elif poker_action.action_type == ActionType.BET:
+            # 3. Handle bet
+            assert poker_action.amount_bet >= min_bet
+            player_states[player_id].bet(poker_action.amount_bet)
+        else:
+            raise Exception("Invalid Choice")
+
+        # Record player action
+        game.actions.append(
+            Action(
+                player_id=player_id,
+                game_stage=game.stage,
+                action_type=poker_action.action_type,
+                amount_bet=poker_action.amount_bet,
             )
-            player_states[big_blind_player_id].bet(amount)
+        )
 
-            # Attach player states and next player id, save the game to game lists
-            game.player_states = player_states
+        # Check if game is over or stage is complete
+        if game.is_folding():
+            # Fold the game
+            game.handle_fold()
+        elif game.should_show_hand():
+            # Advance to SHOW_HAND stage
+            game.advance_stage(next_stage=GameStage.SHOW_HAND)
+        elif game.is_stage_complete():
+            # Advance to next stage
+            game.advance_stage()
+        else:
+            # Advance to next player
+            slots = game.table_metadata.slots
             game.next_player_id = slots[
-                game.get_next_betting_idx(big_blind_idx)
+                game.get_next_betting_idx(game.get_player_idx(player_id))
             ].player_id
-            poker_games.games.append(game)
 
-            room.save()
-            return room
-
-    def handle_player_action(self, room, player_id, action_obj):
-        with RedisLock(room.room_uuid):
-            # assert game is playing
-            assert (
-                len(room.poker_games.games) > 0
-                and room.poker_games.games[-1].game_status == GameStatus.PLAYING
-            )
-            game = room.poker_games.games[-1]
-            # assert waiting for this player's action
-            assert game.next_player_id == player_id
-
-            player_states = game.player_states
-
-            # Find out the min bets needed for the player
-            min_bet = get_player_min_bet(player_states, player_id)
-
-            # Extract and handle action
-            poker_action = action_obj.poker_action
-            if poker_action.action_type == ActionType.FOLD:
-                # 1. Handle fold
-                assert min_bet > 0
-                player_states[player_id].fold()
-            elif poker_action.action_type == ActionType.CHECK:
-                # 2. Handle check
-                assert min_bet == 0
-            elif poker_action.action_type == ActionType.BET:
-                # 3. Handle bet
-                assert poker_action.amount_bet >= min_bet
-                player_states[player_id].bet(poker_action.amount_bet)
-            else:
-                raise Exception("Invalid Choice")
-
-            # Record player action
-            game.actions.append(
-                Action(
-                    player_id=player_id,
-                    game_stage=game.stage,
-                    action_type=poker_action.action_type,
-                    amount_bet=poker_action.amount_bet,
-                )
-            )
-
-            # Check if game is over or stage is complete
-            if game.is_folding():
-                # Fold the game
-                game.handle_fold()
-            elif game.should_show_hand():
-                # Advance to SHOW_HAND stage
-                game.advance_stage(next_stage=GameStage.SHOW_HAND)
-            elif game.is_stage_complete():
-                # Advance to next stage
-                game.advance_stage()
-            else:
-                # Advance to next player
-                slots = game.table_metadata.slots
-                game.next_player_id = slots[
-                    game.get_next_betting_idx(game.get_player_idx(player_id))
-                ].player_id
-
-            if game.game_status == GameStatus.OVER:
-                # Handle over game processes
-                handle_game_over_player_update(room.poker_games.players, game)
-
-            # Save and return room
-            room.save()
-            return room
+    def replay_game(self, game):
+        # Rebuild a game from its seed and recorded actions, for load tests and
+        # reproducing production hands offline
+        assert game.seed is not None
+        replayed_game = self.create_game(
+            game_id=game.game_id,
+            table_metadata=game.table_metadata.copy(),
+            game_metadata=game.game_metadata.copy(),
+            player_amounts={
+                player_id: player_state.amount_available + player_state.total_betting
+                for player_id, player_state in game.player_states.items()
+            },
+            seed=game.seed,
+        )
+        for action in game.actions:
+            self.apply_action(replayed_game, action.player_id, action)
+        return replayed_game
 
     def fill_player_response(self, response, room, player_id):
         if room.poker_games == None or len(room.poker_games.games) == 0:
@@ -197,5 +240,7 @@ class PokerManager:
             game_status=game.game_status,
             is_your_turn=(game.next_player_id == player_id),
             min_bet=get_player_min_bet(game.player_states, player_id),
+            current_hand=player_state.current_hand,
+            draws=player_state.draws,
         )
         response.poker_state = player_state_response
@@ -1,6 +1,33 @@
 from enum import Enum
+from functools import lru_cache
 from typing import List, Dict, Optional
 
+from django.conf import settings
+
+from pokerback.poker.cards import (
+    CARD_NUMBERS,
+    CARD_RANKS,
+    CARD_SUITS,
+    NUM_CARDS,
+    count_cards,
+    mask_from_cards,
+)
+from pokerback.poker.evaluator import (
+    GRADE_HIGH_CARD,
+    GRADE_PAIR,
+    GRADE_TWO_PAIRS,
+    GRADE_THREE_OF_A_KIND,
+    GRADE_STRAIGHT,
+    GRADE_FLUSH,
+    GRADE_FULL_HOUSE,
+    GRADE_FOUR_OF_A_KIND,
+    GRADE_STRAIGHT_FLUSH,
+    best_hand_card_ids,
+    count_draw_outs,
+    encode_strength,
+    evaluate_mask,
+    strength_grade,
+)
 from pokerback.poker.poker_utils import (
     is_flush,
     is_straight,
@@ -16,12 +43,12 @@ from pokerback.utils.baseobject import BaseObject
 from pokerback.utils.enums import ModelEnum
 
 
-class AmountChangeLog(BaseObject):
+class AmountChangeLog(BaseObject, slots=True):
     amount_changed: int
     game_id: int
 
 
-class PlayerTokens(BaseObject):
+class PlayerTokens(BaseObject, slots=True):
     player_id: str
     amount_available: int
     amount_change_log: List[AmountChangeLog] = []
@@ -45,28 +72,65 @@ class Card(BaseObject):
     color: CardColor
     number: int
 
+    _interned = False
+    codec_id_field = "card_id"
+    frozen = True
+
+    def __new__(cls, *args, card_id=None, **kwargs):
+        # Cards are immutable flyweights, building a known card returns the shared one
+        if card_id in _INTERNED_CARDS:
+            return _INTERNED_CARDS[card_id]
+        return super().__new__(cls)
+
+    def __init__(self, *args, **kwargs):
+        if self._interned:
+            assert kwargs.get("color", self.color) == self.color
+            assert kwargs.get("number", self.number) == self.number
+            return
+        super().__init__(*args, **kwargs)
+
+    def __setattr__(self, key, value):
+        if self._interned:
+            raise AttributeError("Card is immutable")
+        super().__setattr__(key, value)
+
+    def __hash__(self):
+        return self.card_id
+
+    def copy(self):
+        # Interned cards are shared, never copied
+        if self._interned:
+            return self
+        return super().copy()
+
     @classmethod
     def from_id(cls, num):
-        colors = [CardColor.SPADE, CardColor.HEART, CardColor.DIAMOND, CardColor.CLUB]
-        card_color = colors[int(num / 13)]
-        card_num = num % 13 + 1
-        return Card(card_id=num, color=card_color, number=card_num)
+        return CARDS[num]
 
     @classmethod
     def from_card(cls, color, number):
-        colors = {
-            CardColor.SPADE: 0,
-            CardColor.HEART: 1,
-            CardColor.DIAMOND: 2,
-            CardColor.CLUB: 3,
-        }
-        card_id = colors[color] * 13 + number - 1
-        return Card(card_id=card_id, color=color, number=number)
+        return CARDS[CARD_COLORS.index(color) * 13 + number - 1]
 
     def sort_key(item):
         return item.number
 
 
+CARD_COLORS = (CardColor.SPADE, CardColor.HEART, CardColor.DIAMOND, CardColor.CLUB)
+
+_INTERNED_CARDS = {}
+CARDS = tuple(
+    Card(
+        card_id=card_id,
+        color=CARD_COLORS[CARD_SUITS[card_id]],
+        number=CARD_NUMBERS[card_id],
+    )
+    for card_id in range(NUM_CARDS)
+)
+for card in CARDS:
+    object.__setattr__(card, "_interned", True)
+    _INTERNED_CARDS[card.card_id] = card
+
+
 class HandType(Enum):
     STRAIGHT_FLUSH = "straight_flush"
     FOUR_OF_A_KIND = "four_of_a_kind"
@@ -79,10 +143,28 @@ class HandType(Enum):
     HIGH_CARD = "high_card"
 
 
+HAND_TYPE_GRADES = {
+    HandType.HIGH_CARD: GRADE_HIGH_CARD,
+    HandType.PAIR: GRADE_PAIR,
+    HandType.TWO_PAIRS: GRADE_TWO_PAIRS,
+    HandType.THREE_OF_A_KIND: GRADE_THREE_OF_A_KIND,
+    HandType.STRAIGHT: GRADE_STRAIGHT,
+    HandType.FLUSH: GRADE_FLUSH,
+    HandType.FULL_HOUSE: GRADE_FULL_HOUSE,
+    HandType.FOUR_OF_A_KIND: GRADE_FOUR_OF_A_KIND,
+    HandType.STRAIGHT_FLUSH: GRADE_STRAIGHT_FLUSH,
+}
+HAND_TYPES_BY_GRADE = {
+    grade: hand_type for hand_type, grade in HAND_TYPE_GRADES.items()
+}
+
+
 class CardBundle(BaseObject):
     number: int
     cards: List[Card]
 
+    frozen = True
+
     def sort_key(item):
         return (len(item.cards), item.number)
 
@@ -90,6 +172,8 @@ class CardBundle(BaseObject):
 class HandStyle(BaseObject):
     card_bundles: List[CardBundle]
 
+    frozen = True
+
     def counts(self):
         return [len(bundle.cards) for bundle in self.card_bundles]
 
@@ -98,6 +182,13 @@ class Hand(BaseObject):
     hand_type: HandType
     hand_style: HandStyle
 
+    frozen = True
+
+    def __init__(self, *args, strength=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Single comparable int, ordered by hand grade then card numbers
+        self.strength = strength if strength is not None else self._get_strength()
+
     def sorted_cards(self):
         res = []
         for bundle in self.hand_style.card_bundles:
@@ -116,60 +207,48 @@ class Hand(BaseObject):
 
         return res
 
-    def __eq__(self, other):
-        if self.hand_type != other.hand_type:
-            return False
+    def _get_strength(self):
+        grade = HAND_TYPE_GRADES[self.hand_type]
         sorted_cards = self.sorted_cards()
-        other_sorted_cards = other.sorted_cards()
-        for i in range(5):
-            if sorted_cards[i].number != other_sorted_cards[i].number:
-                return False
-        return True
-
-    def sort_key(item):
-        hand_type_grade = {
-            HandType.HIGH_CARD: 1,
-            HandType.PAIR: 2,
-            HandType.TWO_PAIRS: 3,
-            HandType.THREE_OF_A_KIND: 4,
-            HandType.STRAIGHT: 5,
-            HandType.FLUSH: 6,
-            HandType.FULL_HOUSE: 7,
-            HandType.FOUR_OF_A_KIND: 8,
-            HandType.STRAIGHT_FLUSH: 9,
-        }
-        sorted_cards = item.sorted_cards()
         if (
-            item.hand_type == HandType.STRAIGHT
-            or item.hand_type == HandType.STRAIGHT_FLUSH
+            self.hand_type == HandType.STRAIGHT
+            or self.hand_type == HandType.STRAIGHT_FLUSH
         ):
-            return (hand_type_grade[item.hand_type], sorted_cards[1].number, 0, 0, 0, 0)
+            # Straights are ranked by their second lowest card
+            return encode_strength(grade, [sorted_cards[1].number])
         else:
-            return (
-                hand_type_grade[item.hand_type],
-                (sorted_cards[0].number + 11) % 13,
-                (sorted_cards[1].number + 11) % 13,
-                (sorted_cards[2].number + 11) % 13,
-                (sorted_cards[3].number + 11) % 13,
-                (sorted_cards[4].number + 11) % 13,
+            return encode_strength(
+                grade, [(card.number + 11) % 13 for card in sorted_cards]
             )
 
+    def __eq__(self, other):
+        if not isinstance(other, Hand):
+            return NotImplemented
+        return self.strength == other.strength
+
+    def __hash__(self):
+        return hash(self.strength)
+
+    def sort_key(item):
+        return item.strength
+
     @classmethod
-    def from_cards(cls, cards):
+    def from_cards(cls, cards, strength=None):
         assert len(cards) == 5
 
         hand_style = cls._get_hand_style(cards)
-        return cls(
-            hand_type=cls._get_hand_type(cards, hand_style), hand_style=hand_style,
-        )
+        if strength is not None:
+            hand_type = HAND_TYPES_BY_GRADE[strength_grade(strength)]
+        else:
+            hand_type = cls._get_hand_type(cards, hand_style)
+        return cls(hand_type=hand_type, hand_style=hand_style, strength=strength)
 
     @classmethod
     def _get_hand_style(cls, cards):
         bundles = {}
         for card in cards:
-            number = card.number
-            if number == 1:
-                number = 14
+            # Numbers go from 2 to 14, ace being the highest
+            number = CARD_RANKS[card.card_id] + 2
             if number not in bundles:
                 bundles[number] = []
             bundles[number].append(card)
@@ -201,12 +280,31 @@ class Hand(BaseObject):
         return HandType.HIGH_CARD
 
 
+@lru_cache(settings.BEST_HAND_CACHE_SIZE)
+def get_best_hand(mask):
+    # Best hand out of a mask of 5 to 7 cards, see get_best_hand.cache_info() for
+    # hits and misses. Cached hands are shared, they must not be mutated.
+    strength = evaluate_mask(mask)
+    card_ids = best_hand_card_ids(mask, strength)
+    return Hand.from_cards([CARDS[card_id] for card_id in card_ids], strength=strength)
+
+
 class PlayerHand(BaseObject):
     player_id: str
     best_hand: Hand
 
     def sort_key(item):
-        return Hand.sort_key(item.best_hand)
+        return item.best_hand.strength
+
+
+class HandEvaluator(ModelEnum):
+    BRUTE_FORCE = "brute_force"
+    LOOKUP_TABLE = "lookup_table"
+
+
+class HandDraws(BaseObject, slots=True):
+    flush_outs: int = 0
+    straight_outs: int = 0
 
 
 class PlayerStatus(ModelEnum):
@@ -214,7 +312,7 @@ class PlayerStatus(ModelEnum):
     FOLDED = "folded"
 
 
-class PlayerGameState(BaseObject):
+class PlayerGameState(BaseObject, slots=True):
     player_id: str
     cards: List[Card]
     amount_available: int
@@ -223,6 +321,10 @@ class PlayerGameState(BaseObject):
     player_status: PlayerStatus = PlayerStatus.BETTING
     pot_won: int = 0
     best_hand: Optional[Hand] = None
+    # Live hand from the cards visible so far, updated at every stage
+    known_cards_mask: int = 0
+    current_hand: Optional[Hand] = None
+    draws: Optional[HandDraws] = None
 
     def bet(self, amount):
         assert amount > 0
@@ -234,12 +336,35 @@ class PlayerGameState(BaseObject):
     def fold(self):
         self.player_status = PlayerStatus.FOLDED
 
-    def find_best_hand(self, table_cards):
-        available_cards = []
-        for card in self.cards:
-            available_cards.append(card.copy())
-        for card in table_cards:
-            available_cards.append(card.copy())
+    def update_live_hand(self, table_cards):
+        # Table cards add to the mask known from previous stages
+        if self.known_cards_mask == 0:
+            self.known_cards_mask = mask_from_cards(self.cards)
+        self.known_cards_mask |= mask_from_cards(table_cards)
+        num_cards = count_cards(self.known_cards_mask)
+        if num_cards < 5:
+            return
+        self.current_hand = get_best_hand(self.known_cards_mask)
+        if num_cards < 7:
+            flush_outs, straight_outs = count_draw_outs(
+                self.known_cards_mask, self.current_hand.strength
+            )
+            self.draws = HandDraws(flush_outs=flush_outs, straight_outs=straight_outs)
+        else:
+            self.draws = None
+
+    def find_best_hand(self, table_cards, hand_evaluator=None):
+        hand_evaluator = hand_evaluator or HandEvaluator(settings.HAND_EVALUATOR)
+        if hand_evaluator == HandEvaluator.LOOKUP_TABLE:
+            self.best_hand = self._find_best_hand_lookup_table(table_cards)
+        else:
+            self.best_hand = self._find_best_hand_brute_force(table_cards)
+
+    def _find_best_hand_lookup_table(self, table_cards):
+        return get_best_hand(mask_from_cards(self.cards) | mask_from_cards(table_cards))
+
+    def _find_best_hand_brute_force(self, table_cards):
+        available_cards = list(self.cards) + list(table_cards)
 
         hands = []
         for i in range(6):
@@ -252,7 +377,7 @@ class PlayerGameState(BaseObject):
                 assert len(cards) == 5
                 hands.append(Hand.from_cards(cards))
         hands.sort(reverse=True, key=Hand.sort_key)
-        self.best_hand = hands[0]
+        return hands[0]
 
 
 class GameStage(ModelEnum):
@@ -279,7 +404,7 @@ class ActionType(ModelEnum):
     FOLD = "fold"
 
 
-class Action(BaseObject):
+class Action(BaseObject, slots=True):
     player_id: str
     game_stage: GameStage
     action_type: ActionType
@@ -292,7 +417,7 @@ class GameStatus(ModelEnum):
     PAUSED = "paused"
 
 
-class Pot(BaseObject):
+class Pot(BaseObject, slots=True):
     pot_amount: int
     winners: List[str]
 
@@ -308,6 +433,8 @@ class Game(BaseObject):
     stage: GameStage = GameStage.PRE_FLOP
     game_status: GameStatus = GameStatus.PLAYING
     pots: List[Pot] = []
+    # Seed the deck was shuffled with, the game replays from it and its actions
+    seed: Optional[int] = None
 
     def get_player_idx(self, player_id):
         for idx in range(self.table_metadata.max_slots):
@@ -316,6 +443,16 @@ class Game(BaseObject):
                 return idx
         raise Exception("Player not found")
 
+    def get_visible_table_cards(self):
+        visible_counts = {
+            GameStage.PRE_FLOP: 0,
+            GameStage.FLOP: 3,
+            GameStage.TURN: 4,
+            GameStage.RIVER: 5,
+            GameStage.SHOW_HAND: 5,
+        }
+        return self.table_cards[: visible_counts[self.stage]]
+
     def get_next_betting_idx(self, current_idx):
         max_slots = self.table_metadata.max_slots
         slots = self.table_metadata.slots
@@ -374,6 +511,12 @@ class Game(BaseObject):
             # If game is at SHOW_HAND, handle SHOW_HAND and end game
             self.handle_show_hand()
         else:
+            # Update live hands of betting players with the newly revealed cards
+            table_cards = self.get_visible_table_cards()
+            for player_state in self.player_states.values():
+                if player_state.player_status == PlayerStatus.BETTING:
+                    player_state.update_live_hand(table_cards)
+
             # If not, reset next_player to small blind idx
             self.next_player_id = self.table_metadata.slots[
                 self.get_next_betting_idx(self.game_metadata.button_idx)
@@ -390,41 +533,13 @@ class Game(BaseObject):
             if self.player_states[player_id].player_status == PlayerStatus.BETTING
         ]
 
-        # Find all best hands for betting players
-        player_hands = []
+        # Find all best hands for betting players, ties share the same strength
+        player_strengths = {}
         for player_id in betting_players:
             self.player_states[player_id].find_best_hand(self.table_cards)
-            player_hands.append(
-                PlayerHand(
-                    player_id=player_id,
-                    best_hand=self.player_states[player_id].best_hand,
-                )
-            )
-
-        # Rank all the betting players
-        player_hands.sort(reverse=True, key=PlayerHand.sort_key)
-        player_batches = []
-        cur_hand = None
-        cur_batch = []
-        for player_hand in player_hands:
-            if cur_hand is None:
-                cur_batch.append(player_hand.player_id)
-                cur_hand = player_hand.best_hand
-            else:
-                if player_hand.best_hand == cur_hand:
-                    cur_batch.append(player_hand.player_id)
-                else:
-                    player_batches.append(cur_batch.copy())
-                    cur_batch = [player_hand.player_id]
-                    cur_hand = player_hand.best_hand
-        if len(cur_batch) > 0:
-            player_batches.append(cur_batch.copy())
-
-        player_scores = {}
-        for i in range(len(player_batches)):
-            player_batch = player_batches[i]
-            for player_id in player_batch:
-                player_scores[player_id] = len(player_batches) - i
+            player_strengths[player_id] = self.player_states[
+                player_id
+            ].best_hand.strength
 
         # Rank betting amount from low to high
         bettings = []
@@ -456,16 +571,16 @@ class Game(BaseObject):
 
             # Find out all the winning players for this pot from players betting at least this amount
             winners = []
-            cur_score = 0
+            cur_strength = 0
             for player_id in betting_players:
                 player_betting = self.player_states[player_id].total_betting
                 if player_betting < cur_bet:
                     continue
-                player_score = player_scores[player_id]
-                if player_score > cur_score:
-                    cur_score = player_score
+                player_strength = player_strengths[player_id]
+                if player_strength > cur_strength:
+                    cur_strength = player_strength
                     winners = []
-                if player_score == cur_score:
+                if player_strength == cur_strength:
                     winners.append(player_id)
 
             # Split pot to winners to their pot_won
@@ -526,6 +641,16 @@ class PokerGames(BaseObject):
     games: List[Game] = []
     players: Dict[str, PlayerTokens] = {}
 
+    # Past games are only loaded when accessed, polls only reading the current one
+    lazy_fields = ("games",)
+
+
+class PlayerEquity(BaseObject):
+    player_id: str
+    win: float
+    tie: float
+    equity: float
+
 
 class PlayerStateResponse(BaseObject):
     cards: List[Card]
@@ -535,3 +660,5 @@ class PlayerStateResponse(BaseObject):
     game_status: GameStatus
     is_your_turn: bool = False
     min_bet: Optional[int] = None
+    current_hand: Optional[Hand] = None
+    draws: Optional[HandDraws] = None
@@ -1,27 +1,21 @@
+from pokerback.poker.cards import (
+    STRAIGHT_RANK_MASKS,
+    SUIT_MASKS,
+    mask_from_cards,
+    rank_mask,
+)
+
+
 def is_flush(cards):
-    color = cards[0].color
-    for card in cards:
-        if card.color != color:
-            return False
-    return True
+    mask = mask_from_cards(cards)
+    for suit_mask in SUIT_MASKS:
+        if mask & suit_mask == mask:
+            return True
+    return False
 
 
 def is_straight(cards):
-    numbers = [card.number for card in cards]
-    numbers.sort()
-
-    if (
-        numbers[0] == 1
-        and numbers[1] == 10
-        and numbers[2] == 11
-        and numbers[3] == 12
-        and numbers[4] == 13
-    ):
-        return True
-    for i in range(5):
-        if numbers[i] - numbers[0] != i:
-            return False
-    return True
+    return rank_mask(mask_from_cards(cards)) in STRAIGHT_RANK_MASKS
 
 
 def is_straight_flush(cards):
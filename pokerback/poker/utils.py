@@ -1,23 +1,7 @@
-import random
-
-from pokerback.poker.objects import Card, PlayerStatus, AmountChangeLog
+from pokerback.poker.objects import PlayerStatus, AmountChangeLog
 from pokerback.room.objects import SlotStatus
 
 
-def get_random_cards(num_cards):
-    res = []
-    while len(res) < num_cards:
-        new_card = random.randint(0, 51)
-        while new_card in set(res):
-            new_card = random.randint(0, 51)
-        res.append(new_card)
-
-    cards = []
-    for num in res:
-        cards.append(Card.from_id(num))
-    return cards
-
-
 def get_next_button_idx(room, start_idx):
     max_slots = room.table_metadata.max_slots
     slots = room.table_metadata.slots
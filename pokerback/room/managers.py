@@ -9,6 +9,7 @@ from rest_framework import generics
 from pokerback.poker.managers import PokerManager
 from pokerback.room.models import RoomModel
 from pokerback.room.objects import RoomStatus, GameType, SlotStatus
+from pokerback.room.queue import update_room
 from pokerback.utils.redis import RedisLock
 
 
@@ -37,7 +38,7 @@ class RoomManager:
                 room_status=RoomStatus.ACTIVE,
             )
 
-            with RedisLock(room_uuid):
+            with RedisLock(room_uuid, stats_key="room_create_room"):
                 room = room_model.init_room(create_room_request)
                 get_game_manager(game_type).init_game(room, create_room_request)
         return room_model
@@ -49,8 +50,10 @@ class RoomManager:
             )
 
             try:
-                room = room_model.load_room()
-                with RedisLock(room.room_uuid):
+                with RedisLock(
+                    str(room_model.room_uuid), stats_key="room_close_room"
+                ):
+                    room = room_model.load_room()
                     room.room_status = RoomStatus.CLOSED
                     room_record = room.to_json_str()
                     room.delete()
@@ -64,24 +67,30 @@ class RoomManager:
             room_model.closed_at = datetime.datetime.now()
             room_model.save()
 
-    def sit_player(self, room, player, slot_idx):
-        with RedisLock(room.room_uuid):
-            original_state = None
-            for slot in room.table_metadata.slots:
-                if slot.player_id == player.uuid:
-                    original_state = slot.slot_status
-                    slot.player_id = None
-                    slot.player_name = None
-                    slot.slot_status = SlotStatus.EMPTY
-            if slot_idx >= room.table_metadata.max_slots:
-                raise ValidationError("Slot out of range.")
-            if room.table_metadata.slots[slot_idx].slot_status != SlotStatus.EMPTY:
-                raise ValidationError("Slot already filled.")
-
-            room.table_metadata.slots[slot_idx].player_id = player.uuid
-            room.table_metadata.slots[slot_idx].player_name = player.name
-            room.table_metadata.slots[slot_idx].slot_status = (
-                original_state or SlotStatus.ACTIVE
-            )
-            room.save()
-            return room
+    def sit_player(self, room_uuid, player, slot_idx):
+        return update_room(
+            room_uuid,
+            self._sit_player,
+            player_id=player.uuid,
+            player_name=player.name,
+            slot_idx=slot_idx,
+        )
+
+    def _sit_player(self, room, player_id, player_name, slot_idx):
+        original_state = None
+        for slot in room.table_metadata.slots:
+            if slot.player_id == player_id:
+                original_state = slot.slot_status
+                slot.player_id = None
+                slot.player_name = None
+                slot.slot_status = SlotStatus.EMPTY
+        if slot_idx >= room.table_metadata.max_slots:
+            raise ValidationError("Slot out of range.")
+        if room.table_metadata.slots[slot_idx].slot_status != SlotStatus.EMPTY:
+            raise ValidationError("Slot already filled.")
+
+        room.table_metadata.slots[slot_idx].player_id = player_id
+        room.table_metadata.slots[slot_idx].player_name = player_name
+        room.table_metadata.slots[slot_idx].slot_status = (
+            original_state or SlotStatus.ACTIVE
+        )
@@ -1,9 +1,9 @@
-from typing import Optional
+from typing import Dict, Optional
 
 from django.db import models
 from django.db.models.constraints import UniqueConstraint
 
-from pokerback.poker.objects import PokerGames
+from pokerback.poker.objects import Game, PlayerTokens, PokerGames
 from pokerback.room.objects import (
     GameType,
     RoomStatus,
@@ -11,7 +11,18 @@ from pokerback.room.objects import (
     TableMetadata,
 )
 from pokerback.user.models import User
-from pokerback.utils.baseobject import BaseRedisObject
+from pokerback.utils.baseobject import (
+    STORED_FORMAT,
+    BaseObject,
+    BaseRedisObject,
+    LazyList,
+)
+from pokerback.utils.codecs import decode_object
+from pokerback.utils.redis import get_redis
+
+# Format of the games of rooms returned by queued updates, kept as the names of
+# their fields until read from the stored room
+FIELD_NAME_FORMAT = "field_name"
 
 
 class RoomModel(models.Model):
@@ -99,3 +110,99 @@ class Room(BaseRedisObject):
 
     def get_object_key(self):
         return self.room_uuid
+
+    def split_fields(self):
+        # The table, the token ledger and every game are stored in fields of their
+        # own, so that an action only rewrites the current game
+        poker_games = self.poker_games
+        if poker_games is None:
+            return {"room": self}
+        fields = {
+            "room": Room(
+                _validate=False,
+                **dict(
+                    self._asdict(),
+                    poker_games=PokerGames(
+                        _validate=False, game_metadata=poker_games.game_metadata
+                    ),
+                ),
+            ),
+            "players": PlayerLedger(_validate=False, players=poker_games.players),
+        }
+        games = poker_games.games
+        if isinstance(games, LazyList):
+            games = games.iter_stored(STORED_FORMAT)
+        for idx, game in enumerate(games):
+            fields["game:{}".format(idx)] = game
+        return fields
+
+    @classmethod
+    def join_fields(cls, fields):
+        room = decode_object(cls, fields["room"])
+        if room.poker_games is not None:
+            room.poker_games.players = decode_object(
+                PlayerLedger, fields["players"]
+            ).players
+            num_games = sum(1 for name in fields if name.startswith("game:"))
+            room.poker_games.games = LazyList(
+                [fields["game:{}".format(idx)] for idx in range(num_games)],
+                STORED_FORMAT,
+                _load_game,
+            )
+        return room
+
+    def get_current_fields(self):
+        # Stored fields of the room but its past games, which never change once over
+        games = self.poker_games.games if self.poker_games is not None else ()
+        current_game = "game:{}".format(len(games) - 1)
+        return {
+            name: raw
+            for name, raw in self.stored_fields.items()
+            if not name.startswith("game:") or name == current_game
+        }
+
+    @classmethod
+    def from_current_fields(cls, room_uuid, fields, version, num_games):
+        # The room saved at version from its current fields, the past games being
+        # read from the stored room when one of them is first accessed
+        room = cls.join_fields(
+            {name: raw for name, raw in fields.items() if not name.startswith("game:")}
+        )
+        if room.poker_games is not None:
+            room.poker_games.games = LazyList(
+                ["game:{}".format(idx) for idx in range(num_games)],
+                FIELD_NAME_FORMAT,
+                _get_game_loader(room_uuid, fields, num_games),
+            )
+        room.stored_fields = fields
+        room.version = version
+        return room
+
+
+class PlayerLedger(BaseObject):
+    players: Dict[str, PlayerTokens] = {}
+
+
+def _load_game(data):
+    return decode_object(Game, data)
+
+
+def _get_game_loader(room_uuid, fields, num_games):
+    # Loads games by the name of their field, all the games missing from fields
+    # being read at once
+    raw_games = {name: raw for name, raw in fields.items() if name.startswith("game:")}
+
+    def load_game(name):
+        if name not in raw_games:
+            names = [
+                "game:{}".format(idx)
+                for idx in range(num_games)
+                if "game:{}".format(idx) not in raw_games
+            ]
+            values = get_redis().get_field_values(
+                Room.object_key_prefix + room_uuid, names
+            )
+            raw_games.update(zip(names, values))
+        return _load_game(raw_games[name])
+
+    return load_game
@@ -14,7 +14,7 @@ class SlotStatus(ModelEnum):
     EMPTY = "empty"
 
 
-class Slot(BaseObject):
+class Slot(BaseObject, slots=True):
     player_id: Optional[str] = None
     player_name: Optional[str] = None
     slot_status: SlotStatus = SlotStatus.EMPTY
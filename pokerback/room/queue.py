@@ -0,0 +1,141 @@
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from pokerback.room.models import Room
+from pokerback.utils.redis import (
+    RedisConflictError,
+    RedisLock,
+    RedisLockError,
+    get_redis,
+)
+
+# In the "queue" REDIS_UPDATE_MODE, updates of a room are pushed to a list of the
+# room and applied in order by the worker holding the lock of the room, any of
+# the requests waiting for their update taking the lock when it is free
+QUEUE_KEY_PREFIX = "room-queue:"
+RESULT_KEY_PREFIX = "room-result:"
+# Seconds results are kept for requests that gave up waiting for them
+RESULT_EXPIRE = 60
+# Seconds between attempts to consume the queue while waiting for a result.
+# Updates are only applied this long before their deadline, so that their result
+# reaches the request before it gives up and reports the update as failed.
+WAIT_SECONDS = 1
+
+
+class RoomQueueError(Exception):
+    pass
+
+
+def update_room(room_uuid, method, **kwargs):
+    # Applies method, a method of a manager taking the room and kwargs, to the
+    # stored room and saves it, the room being loaded only there. kwargs are JSON
+    # values, so that the update can be queued, and queued updates are applied by
+    # a manager built without arguments.
+    operation = method.__name__.lstrip("_")
+    if settings.REDIS_UPDATE_MODE == "queue":
+        manager_cls = method.__self__.__class__
+        return RoomQueue(room_uuid).submit(
+            "{}.{}".format(manager_cls.__module__, manager_cls.__name__),
+            method.__name__,
+            kwargs,
+        )
+    return Room.update_stored(
+        room_uuid, lambda room: method(room, **kwargs), operation=operation
+    )
+
+
+class RoomQueue:
+    def __init__(self, room_uuid):
+        self.room_uuid = room_uuid
+        self.queue_key = QUEUE_KEY_PREFIX + room_uuid
+
+    def submit(self, manager, method, kwargs):
+        update_id = str(uuid.uuid4())
+        # Wall clock deadline, checked by the worker applying the update
+        deadline = time.time() + settings.ROOM_QUEUE_TIMEOUT
+        get_redis().push(
+            self.queue_key,
+            json.dumps(
+                {
+                    "id": update_id,
+                    "manager": manager,
+                    "method": method,
+                    "kwargs": kwargs,
+                    "deadline": deadline,
+                }
+            ),
+        )
+        while True:
+            self.consume()
+            result = get_redis().wait_pop(RESULT_KEY_PREFIX + update_id, WAIT_SECONDS)
+            if result is not None:
+                break
+            if time.time() >= deadline:
+                raise RoomQueueError(f"Update of room {self.room_uuid} timed out")
+
+        if "error" in result:
+            raise RoomQueueError(result["error"])
+        # The room as saved by the update, without the updates applied after it
+        return Room.from_current_fields(
+            self.room_uuid, result["fields"], result["version"], result["num_games"]
+        )
+
+    def consume(self):
+        # Returns right away when another worker consumes the queue
+        while True:
+            try:
+                with RedisLock(
+                    self.room_uuid, stats_key="room_consume_queue", blocking=False
+                ) as lock:
+                    drained = self._consume(lock)
+            except (RedisLockError, RedisConflictError):
+                return
+            # Updates pushed while the lock was released would be left waiting,
+            # updates left after a full batch are left to the other waiting workers
+            if not drained or not get_redis().length(self.queue_key):
+                return
+
+    def _consume(self, lock):
+        room = None
+        for _ in range(settings.ROOM_QUEUE_MAX_BATCH):
+            update = get_redis().pop(self.queue_key)
+            if update is None:
+                return True
+            update = json.loads(update)
+            if time.time() + WAIT_SECONDS >= update["deadline"]:
+                # The request gave up or is about to, it reports the update failed
+                self._push_result(
+                    update["id"],
+                    {"error": f"Update of room {self.room_uuid} timed out"},
+                )
+                continue
+            if room is None:
+                room = Room.load(self.room_uuid)
+            try:
+                manager = import_string(update["manager"])()
+                getattr(manager, update["method"])(room, **update["kwargs"])
+                room.save(lock=lock)
+                result = {
+                    "fields": room.get_current_fields(),
+                    "version": room.version,
+                    "num_games": len(room.poker_games.games) if room.poker_games else 0,
+                }
+            except Exception as e:
+                # The failed update may have changed the room before failing
+                room = None
+                result = {"error": "{}: {}".format(e.__class__.__name__, e)}
+                # The lease expired, the rest of the batch is left to the next holder
+                if isinstance(e, (RedisLockError, RedisConflictError)):
+                    self._push_result(update["id"], result)
+                    raise
+            self._push_result(update["id"], result)
+        return False
+
+    def _push_result(self, update_id, result):
+        # Dicts are pickled, so that the current fields of the room are pushed as
+        # they are
+        get_redis().push(RESULT_KEY_PREFIX + update_id, result, expire=RESULT_EXPIRE)
@@ -96,6 +96,66 @@ DATABASES = {
 
 # Redis
 REDIS_HOST = os.environ.get("REDIS_HOST", "127.0.0.1")
+REDIS_PORT = int(os.environ.get("REDIS_PORT", default=6379))
+# Connections per worker process, shared by its threads
+REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", default=10))
+# Seconds to wait for a free connection of the pool
+REDIS_POOL_TIMEOUT = float(os.environ.get("REDIS_POOL_TIMEOUT", default=5))
+REDIS_SOCKET_TIMEOUT = float(os.environ.get("REDIS_SOCKET_TIMEOUT", default=5))
+REDIS_SOCKET_CONNECT_TIMEOUT = float(
+    os.environ.get("REDIS_SOCKET_CONNECT_TIMEOUT", default=2)
+)
+# Seconds a lock is held for unless renewed by its holder, renewed every 2/3 of it
+REDIS_LOCK_EXPIRE = int(os.environ.get("REDIS_LOCK_EXPIRE", default=10))
+# Seconds to wait for a lock before failing the request, shorter than
+# REDIS_SOCKET_TIMEOUT as locks are waited for with a blocking command
+REDIS_LOCK_ACQUIRE_TIMEOUT = int(
+    os.environ.get("REDIS_LOCK_ACQUIRE_TIMEOUT", default=3)
+)
+# Locks held longer than this are logged with what they were taken for
+REDIS_SLOW_LOCK_SECONDS = float(os.environ.get("REDIS_SLOW_LOCK_SECONDS", default=1))
+# Format rooms are stored in, "binary" or "json", both formats are always readable
+REDIS_OBJECT_CODEC = os.environ.get("REDIS_OBJECT_CODEC", "binary")
+# Validate whole rooms again before storing them, requests are validated when parsed.
+# "1", "true", "yes" or "on" to enable, defaults to DEBUG
+BASEOBJECT_VALIDATE_ON_SAVE = os.environ.get(
+    "BASEOBJECT_VALIDATE_ON_SAVE", default=str(DEBUG)
+).lower() in ("1", "true", "yes", "on")
+# How rooms are updated, "lock" under the lock of the room, "optimistic" saving
+# them only if they were not changed since they were loaded, see
+# pokerback.utils.baseobject.BaseRedisObject.update, or "queue" by a single
+# worker at a time, see pokerback.room.queue
+REDIS_UPDATE_MODE = os.environ.get("REDIS_UPDATE_MODE", "lock")
+# Attempts of an optimistic update before giving up on a busy room
+REDIS_UPDATE_RETRIES = int(os.environ.get("REDIS_UPDATE_RETRIES", default=5))
+# Seconds a request waits for its queued update before failing
+ROOM_QUEUE_TIMEOUT = int(os.environ.get("ROOM_QUEUE_TIMEOUT", default=10))
+# Updates applied by a worker before leaving the queue of the room to others
+ROOM_QUEUE_MAX_BATCH = int(os.environ.get("ROOM_QUEUE_MAX_BATCH", default=50))
+# Host room responses are streamed in chunks once the room has this many games
+STREAM_RESPONSE_MIN_GAMES = int(
+    os.environ.get("STREAM_RESPONSE_MIN_GAMES", default=50)
+)
+
+
+# Poker
+# Either "lookup_table" or "brute_force", see pokerback.poker.objects.HandEvaluator
+HAND_EVALUATOR = os.environ.get("HAND_EVALUATOR", "lookup_table")
+# Pre-shuffled decks kept per process, 0 shuffles every deck on the request path
+DECK_POOL_SIZE = int(os.environ.get("DECK_POOL_SIZE", default=32))
+# Number of best hands kept per process, keyed by card mask
+BEST_HAND_CACHE_SIZE = int(os.environ.get("BEST_HAND_CACHE_SIZE", default=10000))
+# Processes of the pool of pokerback.poker.equity, created once per worker process
+# on first use, 1 runs the simulation in process
+EQUITY_MAX_WORKERS = int(
+    os.environ.get("EQUITY_MAX_WORKERS", default=os.cpu_count() or 1)
+)
+# Simulations of fewer trials run in process, not worth the pool round trips
+EQUITY_POOL_MIN_TRIALS = int(os.environ.get("EQUITY_POOL_MIN_TRIALS", default=20000))
+# Built by `manage.py build_preflop_equity`, memory-mapped on first use
+PREFLOP_EQUITY_PATH = os.environ.get(
+    "PREFLOP_EQUITY_PATH", os.path.join(BASE_DIR, "data", "preflop_equity.bin")
+)
 
 
 # Password validation
@@ -1,9 +1,17 @@
+import copy
 import json
 from collections import OrderedDict
 from enum import Enum
 from typing import List, Dict, Union
 
-from pokerback.utils.redis import get_redis
+from django.conf import settings
+
+from pokerback.utils.redis import (
+    RedisConflictError,
+    RedisLock,
+    RedisLockError,
+    get_redis,
+)
 
 
 def _get_value_class_from_optional(cls):
@@ -48,57 +56,220 @@ def _get_value_class(cls):
         return cls
 
 
-def _object_from_json_value(cls, json_value):
-    if json_value is None:
-        return None
+# Loaders, dumpers and copiers are compiled once per BaseObject class from its
+# annotations
+_baseobject_loaders = {}
+_baseobject_dumpers = {}
+_baseobject_copiers = {}
+_baseobject_comparators = {}
+_baseobject_hashers = {}
+
 
+def _compile_value_loader(cls):
     real_cls = _get_class(cls)
     if real_cls is Dict:
-        assert isinstance(json_value, dict)
-        value_cls = _get_value_class(cls)
-        res = {}
-        for key in json_value.keys():
-            res[key] = _object_from_json_value(value_cls, json_value[key])
-        return res
+        value_loader = _compile_value_loader(_get_value_class(cls))
+
+        def load_dict(json_value):
+            if json_value is None:
+                return None
+            assert isinstance(json_value, dict)
+            return {key: value_loader(value) for key, value in json_value.items()}
+
+        return load_dict
     elif real_cls is List:
+        value_loader = _compile_value_loader(_get_value_class(cls))
+
+        def load_list(json_value):
+            if json_value is None:
+                return None
+            assert isinstance(json_value, list)
+            return [value_loader(value) for value in json_value]
+
+        return load_list
+    elif real_cls is Union:
+        return _compile_value_loader(_get_value_class(cls))
+    elif issubclass(real_cls, BaseObject):
+
+        def load_baseobject(json_value):
+            if json_value is None:
+                return None
+            assert isinstance(json_value, dict)
+            return _get_baseobject_loader(real_cls)(json_value)
+
+        return load_baseobject
+    elif issubclass(real_cls, Enum):
+
+        def load_enum(json_value):
+            if json_value is None:
+                return None
+            return real_cls(json_value)
+
+        return load_enum
+
+    def load_value(json_value):
+        return json_value
+
+    return load_value
+
+
+def _compile_lazy_list_loader(cls):
+    assert _get_class(cls) is List
+    value_loader = _compile_value_loader(_get_value_class(cls))
+
+    def load_lazy_list(json_value):
+        if json_value is None:
+            return None
         assert isinstance(json_value, list)
-        value_cls = _get_value_class(cls)
-        res = []
-        for val in json_value:
-            res.append(_object_from_json_value(value_cls, val))
-        return res
+        return LazyList(json_value, "json", value_loader)
+
+    return load_lazy_list
+
+
+def _is_plain_value_class(cls):
+    return cls in (int, float, str, bool)
+
+
+def _get_baseobject_loader(cls):
+    loader = _baseobject_loaders.get(cls)
+    if loader is None:
+        # Generate a loader only converting the fields that are not plain values
+        annotations = getattr(cls, "__annotations__", {})
+        namespace = {"cls": cls, "field_keys": frozenset(annotations.keys())}
+        lines = [
+            "def loader(diict):",
+            "    if not field_keys.issuperset(diict.keys()):",
+            "        raise KeyError(set(diict.keys()).difference(field_keys))",
+            "    kwargs = dict(diict)",
+        ]
+        for idx, (key, field_class) in enumerate(annotations.items()):
+            if key in cls.lazy_fields:
+                namespace["load_{}".format(idx)] = _compile_lazy_list_loader(
+                    field_class
+                )
+            elif _is_plain_value_class(field_class):
+                continue
+            else:
+                namespace["load_{}".format(idx)] = _compile_value_loader(field_class)
+            lines.append("    if {!r} in kwargs:".format(key))
+            lines.append(
+                "        kwargs[{0!r}] = load_{1}(kwargs[{0!r}])".format(key, idx)
+            )
+        lines.append("    return cls(_validate=False, **kwargs)")
+        exec("\n".join(lines), namespace)
+        loader = namespace["loader"]
+        _baseobject_loaders[cls] = loader
+    return loader
+
+
+def baseobject_from_json_dict(cls, diict, trusted=False):
+    # The whole tree is built without validation, then validated once from the top
+    obj = _get_baseobject_loader(cls)(diict)
+    if not trusted:
+        obj.validate()
+    return obj
+
+
+def _compile_value_dumper(cls):
+    real_cls = _get_class(cls)
+    if real_cls is Dict:
+        value_dumper = _compile_value_dumper(_get_value_class(cls))
+
+        def dump_dict(value):
+            if value is None:
+                return None
+            return {key: value_dumper(item) for key, item in value.items()}
+
+        return dump_dict
+    elif real_cls is List:
+        value_dumper = _compile_value_dumper(_get_value_class(cls))
+
+        def dump_list(value):
+            if value is None:
+                return None
+            return [value_dumper(item) for item in value]
+
+        return dump_list
     elif real_cls is Union:
-        value_cls = _get_value_class(cls)
-        return _object_from_json_value(value_cls, json_value)
+        return _compile_value_dumper(_get_value_class(cls))
     elif issubclass(real_cls, BaseObject):
-        assert isinstance(json_value, dict)
-        return baseobject_from_json_dict(real_cls, json_value)
+
+        def dump_baseobject(value):
+            if value is None:
+                return None
+            # Dump by the actual class, which may be a subclass of the annotation
+            return _get_baseobject_dumper(value.__class__)(value)
+
+        return dump_baseobject
     elif issubclass(real_cls, Enum):
-        return real_cls(json_value)
-    return json_value
 
+        def dump_enum(value):
+            if value is None:
+                return None
+            return value.value
+
+        return dump_enum
+    elif _is_plain_value_class(real_cls):
 
-def baseobject_from_json_dict(cls, diict):
-    for key in diict.keys():
-        field_class = cls.__annotations__[key]
-        diict[key] = _object_from_json_value(field_class, diict[key])
-    return cls(**diict)
+        def dump_value(value):
+            return value
+
+        return dump_value
+    return baseobject_as_json_dict
+
+
+def _compile_lazy_list_dumper(cls):
+    assert _get_class(cls) is List
+    value_dumper = _compile_value_dumper(_get_value_class(cls))
+
+    def dump_lazy_list(value):
+        if not isinstance(value, LazyList):
+            return None if value is None else [value_dumper(item) for item in value]
+        # Items never loaded are dumped as they were loaded
+        return [
+            item.raw if item.__class__ is RawItem else value_dumper(item)
+            for item in value.iter_stored("json")
+        ]
+
+    return dump_lazy_list
+
+
+def _get_baseobject_dumper(cls):
+    dumper = _baseobject_dumpers.get(cls)
+    if dumper is None:
+        # Generate a dumper building the dict in one literal, in annotation order
+        namespace = {}
+        lines = ["def dumper(obj):", "    return {"]
+        annotations = getattr(cls, "__annotations__", {})
+        for idx, (key, field_class) in enumerate(annotations.items()):
+            if key in cls.lazy_fields:
+                namespace["dump_{}".format(idx)] = _compile_lazy_list_dumper(
+                    field_class
+                )
+                lines.append("        {0!r}: dump_{1}(obj.{0}),".format(key, idx))
+            elif _is_plain_value_class(field_class):
+                lines.append("        {0!r}: obj.{0},".format(key))
+            else:
+                namespace["dump_{}".format(idx)] = _compile_value_dumper(field_class)
+                lines.append("        {0!r}: dump_{1}(obj.{0}),".format(key, idx))
+        lines.append("    }")
+        exec("\n".join(lines), namespace)
+        dumper = namespace["dumper"]
+        _baseobject_dumpers[cls] = dumper
+    return dumper
 
 
 def baseobject_as_json_dict(obj):
     if isinstance(obj, BaseObject):  # detect baseobject
-        return OrderedDict(
-            {
-                key: baseobject_as_json_dict(value)
-                for key, value in obj._asdict().items()
-            }
-        )
+        return _get_baseobject_dumper(obj.__class__)(obj)
     elif isinstance(obj, str):  # iterables - strings
         return obj
     elif hasattr(obj, "keys"):  # iterables - mapping
         return OrderedDict(
             zip(obj.keys(), (baseobject_as_json_dict(item) for item in obj.values()))
         )
+    elif isinstance(obj, list):  # list subclasses like LazyList are dumped as lists
+        return [baseobject_as_json_dict(item) for item in obj]
     elif hasattr(obj, "__iter__"):  # iterables - sequence
         return type(obj)((baseobject_as_json_dict(item) for item in obj))
     elif isinstance(obj, Enum):
@@ -107,6 +278,111 @@ def baseobject_as_json_dict(obj):
         return obj
 
 
+def _copy_immutable(value):
+    return value
+
+
+def _compile_value_copier(cls):
+    real_cls = _get_class(cls)
+    if real_cls is Dict:
+        value_copier = _compile_value_copier(_get_value_class(cls))
+
+        def copy_dict(value):
+            if value is None:
+                return None
+            if value_copier is _copy_immutable:
+                return dict(value)
+            return {key: value_copier(item) for key, item in value.items()}
+
+        return copy_dict
+    elif real_cls is List:
+        value_copier = _compile_value_copier(_get_value_class(cls))
+
+        def copy_list(value):
+            if value is None:
+                return None
+            if value_copier is _copy_immutable:
+                return list(value)
+            return [value_copier(item) for item in value]
+
+        return copy_list
+    elif real_cls is Union:
+        return _compile_value_copier(_get_value_class(cls))
+    elif issubclass(real_cls, BaseObject):
+
+        def copy_baseobject(value):
+            if value is None:
+                return None
+            # Copy by the actual class, which may share immutable objects
+            return value.copy()
+
+        return copy_baseobject
+    elif issubclass(real_cls, Enum) or _is_plain_value_class(real_cls):
+        return _copy_immutable
+    return copy.deepcopy
+
+
+def _get_baseobject_copier(cls):
+    copier = _baseobject_copiers.get(cls)
+    if copier is None:
+        # Generate a copier passing immutable fields as they are
+        namespace = {"cls": cls}
+        lines = ["def copier(obj):", "    return cls(", "        _validate=False,"]
+        annotations = getattr(cls, "__annotations__", {})
+        for idx, (key, field_class) in enumerate(annotations.items()):
+            value_copier = _compile_value_copier(field_class)
+            if value_copier is _copy_immutable:
+                lines.append("        {0}=obj.{0},".format(key))
+            else:
+                namespace["copy_{}".format(idx)] = value_copier
+                lines.append("        {0}=copy_{1}(obj.{0}),".format(key, idx))
+        lines.append("    )")
+        exec("\n".join(lines), namespace)
+        copier = namespace["copier"]
+        _baseobject_copiers[cls] = copier
+    return copier
+
+
+def _get_baseobject_comparator(cls):
+    comparator = _baseobject_comparators.get(cls)
+    if comparator is None:
+        # Generate a comparison of every field, plain values first as they are the
+        # cheapest, stopping at the first difference
+        annotations = getattr(cls, "__annotations__", {})
+        keys = sorted(
+            annotations.keys(),
+            key=lambda key: not _is_plain_value_class(annotations[key]),
+        )
+        namespace = {}
+        lines = ["def comparator(obj, other):", "    return ("]
+        lines.extend("        obj.{0} == other.{0} and".format(key) for key in keys)
+        lines.extend(["        True", "    )"])
+        exec("\n".join(lines), namespace)
+        comparator = namespace["comparator"]
+        _baseobject_comparators[cls] = comparator
+    return comparator
+
+
+def _hash_value(value):
+    if isinstance(value, list):
+        return tuple(_hash_value(item) for item in value)
+    elif isinstance(value, dict):
+        return frozenset((key, _hash_value(item)) for key, item in value.items())
+    return value
+
+
+def _get_baseobject_hasher(cls):
+    hasher = _baseobject_hashers.get(cls)
+    if hasher is None:
+        keys = tuple(getattr(cls, "__annotations__", {}).keys())
+
+        def hasher(obj):
+            return hash(tuple(_hash_value(getattr(obj, key)) for key in keys))
+
+        _baseobject_hashers[cls] = hasher
+    return hasher
+
+
 def validate_baseobject_types(cls, obj):
     real_cls = _get_class(cls)
     if real_cls is Dict:
@@ -128,16 +404,76 @@ def validate_baseobject_types(cls, obj):
         ]
     else:
         assert isinstance(obj, cls)
-        if issubclass(real_cls, BaseObject) and hasattr(real_cls, "__annotations__"):
-            for key, value_cls in real_cls.__annotations__.items():
-                validate_baseobject_types(value_cls, getattr(obj, key, None))
-
-
-class BaseObject(object):
-    def __init__(self, *args, **kwargs):
+        if issubclass(real_cls, BaseObject):
+            if obj.__class__.validate is not BaseObject.validate:
+                # Custom validations validate the fields of the object themselves
+                obj.validate()
+            else:
+                validate_baseobject_fields(real_cls, obj)
+
+
+def validate_baseobject_fields(cls, obj):
+    # Every object of the tree is visited once
+    for key, value_cls in getattr(cls, "__annotations__", {}).items():
+        validate_baseobject_types(value_cls, getattr(obj, key, None))
+
+
+class BaseObjectMeta(type):
+    # Classes declared with `slots=True` keep their fields in __slots__ generated
+    # from their annotations instead of a __dict__ per object, for small objects
+    # held by the thousands. Their defaults are kept aside in _slot_defaults.
+    def __new__(mcs, name, bases, namespace, slots=False, **kwargs):
+        if slots:
+            inherited_slots = set()
+            slot_defaults = {}
+            for base in reversed(bases):
+                for klass in base.__mro__:
+                    inherited_slots.update(getattr(klass, "__slots__", ()))
+                slot_defaults.update(getattr(base, "_slot_defaults", {}))
+            annotations = namespace.get("__annotations__", {})
+            for key in annotations:
+                if key in namespace:
+                    slot_defaults[key] = namespace.pop(key)
+            slot_keys = list(annotations)
+            if namespace.get("frozen"):
+                # Where frozen objects cache their hash
+                slot_keys.append("_hash")
+            namespace["__slots__"] = tuple(
+                key for key in slot_keys if key not in inherited_slots
+            )
+            namespace["_slot_defaults"] = slot_defaults
+        return super().__new__(mcs, name, bases, namespace, **kwargs)
+
+    def __init__(cls, name, bases, namespace, slots=False, **kwargs):
+        super().__init__(name, bases, namespace, **kwargs)
+
+
+class BaseObject(object, metaclass=BaseObjectMeta):
+    __slots__ = ()
+    _slot_defaults = {}
+    # Field fully identifying objects of the class, the binary codec storing only it
+    codec_id_field = None
+    # List fields loaded as LazyList, their items being loaded on first access
+    lazy_fields = ()
+    # Objects of frozen classes are never modified once built, so they are hashable
+    frozen = False
+
+    # Objects are validated when built, unless built from trusted data with
+    # _validate=False, like objects loaded from our own storage
+    def __init__(self, *args, _validate=True, **kwargs):
         for key in kwargs:
             setattr(self, key, kwargs[key])
-        self.validate()
+        for key, default in self._slot_defaults.items():
+            if key not in kwargs:
+                setattr(self, key, default)
+        # Copy mutable defaults, so that objects don't share the class level ones
+        for key in getattr(self.__class__, "__annotations__", {}):
+            if key not in kwargs:
+                default = getattr(self, key, None)
+                if isinstance(default, (list, dict)):
+                    setattr(self, key, default.copy())
+        if _validate:
+            self.validate()
 
     def _asdict(self):
         if not hasattr(self.__class__, "__annotations__"):
@@ -153,10 +489,24 @@ class BaseObject(object):
         if not isinstance(other, BaseObject):
             # don't attempt to compare against unrelated types
             return NotImplemented
-        return self.__repr__() == other.__repr__()
+        if self is other:
+            return True
+        if self.__class__ is not other.__class__:
+            return self._asdict() == other._asdict()
+        return _get_baseobject_comparator(self.__class__)(self, other)
+
+    def __hash__(self):
+        if not self.frozen:
+            raise TypeError(f"unhashable type: '{self.__class__.__name__}'")
+        try:
+            return self._hash
+        except AttributeError:
+            res = _get_baseobject_hasher(self.__class__)(self)
+            object.__setattr__(self, "_hash", res)
+            return res
 
     def validate(self):
-        validate_baseobject_types(self.__class__, self)
+        validate_baseobject_fields(self.__class__, self)
 
     def to_json(self):
         return baseobject_as_json_dict(self)
@@ -180,29 +530,374 @@ class BaseObject(object):
             return default
 
     def copy(self):
-        return self.__class__.from_json_str(self.to_json_str())
+        return _get_baseobject_copier(self.__class__)(self)
+
+    def diff(self, new):
+        return diff_baseobjects(self, new)
+
+    def patch(self, patch):
+        return patch_baseobject(self, patch)
 
     @classmethod
-    def from_json(cls, json_dict):
-        return baseobject_from_json_dict(cls, json_dict)
+    def from_json(cls, json_dict, trusted=False):
+        return baseobject_from_json_dict(cls, json_dict, trusted=trusted)
 
     @classmethod
-    def from_json_str(cls, json_str):
-        return baseobject_from_json_dict(cls, json.loads(json_str))
+    def from_json_str(cls, json_str, trusted=False):
+        return baseobject_from_json_dict(cls, json.loads(json_str), trusted=trusted)
+
+
+class RawItem(object):
+    __slots__ = ("raw_format", "raw")
+
+    def __init__(self, raw_format, raw):
+        self.raw_format = raw_format
+        self.raw = raw
+
+
+class LazyList(list):
+    # List of items kept as they were stored until accessed, each item being loaded
+    # on first access. The last item, like the current game, is loaded right away.
+    def __init__(self, raw_items=(), raw_format=None, load_item=None):
+        super().__init__(RawItem(raw_format, raw) for raw in raw_items)
+        self.load_item = load_item
+        self.num_raw = len(self)
+        if self.num_raw:
+            self[-1]
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            self.load_all()
+            return super().__getitem__(idx)
+        item = super().__getitem__(idx)
+        if item.__class__ is RawItem:
+            item = self.load_item(item.raw)
+            super().__setitem__(idx, item)
+            self.num_raw -= 1
+        return item
+
+    def __setitem__(self, idx, value):
+        if isinstance(idx, slice):
+            self.load_all()
+        elif super().__getitem__(idx).__class__ is RawItem:
+            self.num_raw -= 1
+        super().__setitem__(idx, value)
+
+    def __reduce_ex__(self, protocol):
+        return list, (list(self),)
+
+    def load_all(self):
+        if self.num_raw:
+            for idx in range(len(self)):
+                self[idx]
+
+    def iter_stored(self, raw_format):
+        # Items as they are stored, only loading the ones stored in another format
+        for idx in range(len(self)):
+            item = super().__getitem__(idx)
+            if item.__class__ is RawItem and item.raw_format != raw_format:
+                item = self[idx]
+            yield item
+
+
+def _loading_all(name):
+    method = getattr(list, name)
+
+    def load_all_first(self, *args, **kwargs):
+        self.load_all()
+        for arg in args:
+            # Like comparisons, reading the items of another lazy list
+            if isinstance(arg, LazyList):
+                arg.load_all()
+        return method(self, *args, **kwargs)
+
+    load_all_first.__name__ = name
+    return load_all_first
+
+
+# Everything reading or removing several items loads all of them first
+for _name in (
+    "__iter__",
+    "__reversed__",
+    "__contains__",
+    "__eq__",
+    "__ne__",
+    "__lt__",
+    "__le__",
+    "__gt__",
+    "__ge__",
+    "__repr__",
+    "__add__",
+    "__mul__",
+    "__rmul__",
+    "__imul__",
+    "__delitem__",
+    "copy",
+    "count",
+    "index",
+    "pop",
+    "remove",
+    "sort",
+    "clear",
+):
+    setattr(LazyList, _name, _loading_all(_name))
+
+
+def _escape_path_key(key):
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape_path_key(key):
+    return key.replace("~1", "/").replace("~0", "~")
+
+
+def _get_stored_items(value):
+    if isinstance(value, LazyList):
+        return [list.__getitem__(value, idx) for idx in range(len(value))]
+    return value
+
+
+def _diff_lists(value_cls, old, new, path, ops):
+    old_items = _get_stored_items(old)
+    new_items = _get_stored_items(new)
+    num_common = min(len(old_items), len(new_items))
+    for idx in range(num_common):
+        old_item = old_items[idx]
+        new_item = new_items[idx]
+        if old_item.__class__ is RawItem or new_item.__class__ is RawItem:
+            # Items never loaded on both sides are compared as they were stored
+            if (
+                old_item.__class__ is new_item.__class__
+                and old_item.raw_format == new_item.raw_format
+                and old_item.raw == new_item.raw
+            ):
+                continue
+            old_item = old[idx]
+            new_item = new[idx]
+        _diff_values(value_cls, old_item, new_item, f"{path}/{idx}", ops)
+    value_dumper = _compile_value_dumper(value_cls)
+    for idx in range(num_common, len(new_items)):
+        ops.append({"op": "add", "path": f"{path}/-", "value": value_dumper(new[idx])})
+    for idx in reversed(range(num_common, len(old_items))):
+        ops.append({"op": "remove", "path": f"{path}/{idx}"})
+
+
+def _diff_dicts(value_cls, old, new, path, ops):
+    value_dumper = _compile_value_dumper(value_cls)
+    for key in old:
+        if key not in new:
+            ops.append({"op": "remove", "path": f"{path}/{_escape_path_key(key)}"})
+    for key, new_item in new.items():
+        item_path = f"{path}/{_escape_path_key(key)}"
+        if key not in old:
+            ops.append(
+                {"op": "add", "path": item_path, "value": value_dumper(new_item)}
+            )
+        else:
+            _diff_values(value_cls, old[key], new_item, item_path, ops)
+
+
+def _diff_baseobjects(old, new, path, ops):
+    for key, field_class in getattr(old.__class__, "__annotations__", {}).items():
+        _diff_values(
+            field_class,
+            getattr(old, key),
+            getattr(new, key),
+            f"{path}/{_escape_path_key(key)}",
+            ops,
+        )
+
+
+def _diff_values(cls, old, new, path, ops):
+    if old is new:
+        return
+    real_cls = _get_class(cls)
+    if real_cls is Union and old is not None and new is not None:
+        cls = _get_value_class(cls)
+        real_cls = _get_class(cls)
+
+    if old is None or new is None:
+        pass
+    elif real_cls is List:
+        return _diff_lists(_get_value_class(cls), old, new, path, ops)
+    elif real_cls is Dict:
+        return _diff_dicts(_get_value_class(cls), old, new, path, ops)
+    elif issubclass(real_cls, BaseObject) and old.__class__ is new.__class__:
+        if old.frozen:
+            # Frozen objects may be shared, so they are only replaced as a whole
+            if _get_baseobject_comparator(old.__class__)(old, new):
+                return
+        else:
+            # Not comparing objects first, which would load their lazy fields
+            _diff_baseobjects(old, new, path, ops)
+            return
+    elif old == new:
+        return
+    ops.append(
+        {"op": "replace", "path": path, "value": _compile_value_dumper(cls)(new)}
+    )
+
+
+def diff_baseobjects(old, new):
+    # JSON patch (RFC 6902) of add, remove and replace operations turning the
+    # JSON of old into the JSON of new, only visiting the parts that changed
+    assert old.__class__ is new.__class__
+    ops = []
+    if old is not new:
+        _diff_baseobjects(old, new, "", ops)
+    return ops
+
+
+def _get_patched_child(parent, cls, key):
+    # Child of a patched value, with the class the child is declared with
+    real_cls = _get_class(cls)
+    if real_cls is Union:
+        return _get_patched_child(parent, _get_value_class(cls), key)
+    elif real_cls is List:
+        return parent[int(key)], _get_value_class(cls)
+    elif real_cls is Dict:
+        return parent[key], _get_value_class(cls)
+    return getattr(parent, key), parent.__class__.__annotations__[key]
+
+
+def patch_baseobject(obj, patch):
+    # Applies a patch from diff_baseobjects to obj, in place
+    for op in patch:
+        keys = [_unescape_path_key(key) for key in op["path"].split("/")[1:]]
+        assert len(keys) > 0
+        parent = obj
+        cls = obj.__class__
+        for key in keys[:-1]:
+            parent, cls = _get_patched_child(parent, cls, key)
+        key = keys[-1]
+        if _get_class(cls) is Union:
+            cls = _get_value_class(cls)
+        real_cls = _get_class(cls)
+
+        if real_cls is List:
+            if op["op"] == "remove":
+                del parent[int(key)]
+                continue
+            value = _compile_value_loader(_get_value_class(cls))(op["value"])
+            if key == "-":
+                parent.append(value)
+            elif op["op"] == "add":
+                parent.insert(int(key), value)
+            else:
+                parent[int(key)] = value
+        elif real_cls is Dict:
+            if op["op"] == "remove":
+                del parent[key]
+                continue
+            parent[key] = _compile_value_loader(_get_value_class(cls))(op["value"])
+        else:
+            assert op["op"] in ("add", "replace")
+            field_class = parent.__class__.__annotations__[key]
+            setattr(parent, key, _compile_value_loader(field_class)(op["value"]))
+    return obj
+
+
+# Format of the items of lazy lists kept as the fields they were stored in
+STORED_FORMAT = "stored"
 
 
 class BaseRedisObject(BaseObject):
     object_key_prefix = "fake_prefix_"
+    # Version of the stored object this one was loaded at, bumped by every save
+    version = 0
+    # Fields of the stored hash as they were loaded or last saved
+    stored_fields = {}
 
     def get_object_key(self):
         raise NotImplemented
 
-    def save(self):
-        self.validate()
-        get_redis().set(
-            self.object_key_prefix + self.get_object_key(), self.to_json_str()
+    def split_fields(self):
+        # Objects are stored as hashes of the objects returned here, each of them
+        # being written only when its encoding changed. Raw items of lazy lists
+        # loaded by join_fields are stored as they are.
+        return {"object": self}
+
+    @classmethod
+    def join_fields(cls, fields):
+        from pokerback.utils.codecs import decode_object
+
+        return decode_object(cls, fields["object"])
+
+    def get_changed_fields(self):
+        # Encodings of the fields changed since the object was loaded or saved, and
+        # all the fields as they are once saved
+        from pokerback.utils.codecs import get_codec
+
+        codec = get_codec(settings.REDIS_OBJECT_CODEC)
+        stored_fields = self.stored_fields
+        changed = {}
+        fields = {}
+        for name, part in self.split_fields().items():
+            encoded = part.raw if part.__class__ is RawItem else codec.encode(part)
+            if stored_fields.get(name) != encoded:
+                changed[name] = encoded
+            fields[name] = encoded
+        return changed, fields
+
+    def _save(self, **kwargs):
+        if settings.BASEOBJECT_VALIDATE_ON_SAVE:
+            self.validate()
+        changed, fields = self.get_changed_fields()
+        # Objects not loaded from a hash replace whatever was stored
+        version = get_redis().set_fields(
+            self.object_key_prefix + self.get_object_key(),
+            changed,
+            deleted=[name for name in self.stored_fields if name not in fields],
+            replace=not self.stored_fields,
+            **kwargs,
+        )
+        if version:
+            self.version = version
+            self.stored_fields = fields
+        return version
+
+    def save(self, lock=None):
+        # Saves made under a lock are rejected once another holder took the lock
+        if lock is None:
+            self._save()
+        elif not self._save(lock_key=lock.lock_key, fencing_token=lock.fencing_token):
+            raise RedisLockError(f"Lock {lock.lock_key} expired before saving")
+
+    def save_if_unchanged(self):
+        # Saves only if the stored object is still at the version of this one
+        return bool(self._save(version=self.version))
+
+    def update(self, mutate, operation="update"):
+        # Like update_stored, this object being the first one mutated in the
+        # "optimistic" REDIS_UPDATE_MODE
+        return self.update_stored(
+            self.get_object_key(), mutate, operation=operation, obj=self
         )
 
+    @classmethod
+    def update_stored(cls, object_key, mutate, operation="update", obj=None):
+        # Applies mutate to the stored object and saves it as one transaction,
+        # returning the saved object. Under the lock of the object by default,
+        # in the "optimistic" REDIS_UPDATE_MODE mutate is applied to obj, or to
+        # the object loaded when not given, and saved if nothing was saved since
+        # it was loaded, or applied again to a fresh copy.
+        if settings.REDIS_UPDATE_MODE != "optimistic":
+            stats_key = cls.object_key_prefix + operation
+            with RedisLock(object_key, stats_key=stats_key) as lock:
+                obj = cls.load(object_key)
+                mutate(obj)
+                obj.save(lock=lock)
+                return obj
+
+        if obj is None:
+            obj = cls.load(object_key)
+        for _ in range(settings.REDIS_UPDATE_RETRIES):
+            mutate(obj)
+            if obj.save_if_unchanged():
+                return obj
+            obj = cls.load(object_key)
+        raise RedisConflictError()
+
     def refresh(self):
         self.__dict__ = self.__class__.load(self.get_object_key()).__dict__
 
@@ -211,5 +906,21 @@ class BaseRedisObject(BaseObject):
 
     @classmethod
     def load(cls, object_key):
-        json_str = get_redis().get(cls.object_key_prefix + object_key)
-        return cls.from_json_str(json_str)
+        from pokerback.utils.codecs import decode_object
+
+        data, version = get_redis().get_fields(cls.object_key_prefix + object_key)
+        # Stored objects were validated when built, no need to validate them again
+        if isinstance(data, dict):
+            return cls.from_stored_fields(data, version)
+        # Stored as a single value before objects were stored as hashes
+        obj = decode_object(cls, data)
+        obj.version = version
+        return obj
+
+    @classmethod
+    def from_stored_fields(cls, fields, version):
+        # The object as stored in fields at version, like objects once saved
+        obj = cls.join_fields(fields)
+        obj.stored_fields = fields
+        obj.version = version
+        return obj
@@ -0,0 +1,463 @@
+import struct
+import types
+import zlib
+from enum import Enum
+from functools import lru_cache
+from typing import Dict, List, Union
+
+from pokerback.utils.baseobject import (
+    BaseObject,
+    LazyList,
+    RawItem,
+    _get_class,
+    _get_value_class,
+)
+
+# Binary blobs start with a byte never starting a JSON document or a pickle,
+# then the format version and a fingerprint of the schema of the stored class,
+# which blobs of version 1 must match. Since version 2 the fingerprint is 0, each
+# object starting with the fingerprint of its fields instead, so that objects
+# stored before fields were added at the end of their class are still read.
+BINARY_MAGIC = b"\xffPK"
+BINARY_VERSION = 2
+BINARY_HEADER = struct.Struct("<3sBI")
+FLOAT = struct.Struct("<d")
+# Fingerprints of the fields of objects and of the values of enum members
+TAG = struct.Struct("<H")
+
+
+class CodecError(Exception):
+    pass
+
+
+class _Reader(object):
+    __slots__ = ("data", "pos")
+
+    def __init__(self, data, pos=0):
+        self.data = data
+        self.pos = pos
+
+
+def _write_uint(buffer, value):
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_uint(reader):
+    data = reader.data
+    pos = reader.pos
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            break
+        shift += 7
+    reader.pos = pos
+    return result
+
+
+def _write_int(buffer, value):
+    # Zigzag encoded, so that small negative numbers stay small
+    _write_uint(buffer, value * 2 if value >= 0 else -value * 2 - 1)
+
+
+def _read_int(reader):
+    value = _read_uint(reader)
+    return value // 2 if not value & 1 else -(value + 1) // 2
+
+
+def _write_bool(buffer, value):
+    buffer.append(1 if value else 0)
+
+
+def _read_bool(reader):
+    reader.pos += 1
+    return reader.data[reader.pos - 1] == 1
+
+
+def _write_float(buffer, value):
+    buffer += FLOAT.pack(value)
+
+
+def _read_float(reader):
+    reader.pos += FLOAT.size
+    return FLOAT.unpack_from(reader.data, reader.pos - FLOAT.size)[0]
+
+
+def _write_str(buffer, value):
+    encoded = value.encode("utf-8")
+    _write_uint(buffer, len(encoded))
+    buffer += encoded
+
+
+def _read_str(reader):
+    length = _read_uint(reader)
+    start = reader.pos
+    reader.pos += length
+    return bytes(reader.data[start : reader.pos]).decode("utf-8")
+
+
+_PLAIN_CODECS = {
+    bool: (_write_bool, _read_bool),
+    int: (_write_int, _read_int),
+    float: (_write_float, _read_float),
+    str: (_write_str, _read_str),
+}
+
+# Codecs are compiled once per BaseObject class from its annotations
+_baseobject_codecs = {}
+
+
+def _compile_value_codec(cls, version):
+    real_cls = _get_class(cls)
+    if real_cls is Dict:
+        write_key, read_key = _compile_value_codec(cls.__args__[0], version)
+        write_value, read_value = _compile_value_codec(_get_value_class(cls), version)
+
+        def write_dict(buffer, value):
+            _write_uint(buffer, len(value))
+            for key, item in value.items():
+                write_key(buffer, key)
+                write_value(buffer, item)
+
+        def read_dict(reader):
+            # Keys are read first, dict comprehensions evaluate values first in 3.6
+            res = {}
+            for _ in range(_read_uint(reader)):
+                key = read_key(reader)
+                res[key] = read_value(reader)
+            return res
+
+        return write_dict, read_dict
+    elif real_cls is List:
+        write_value, read_value = _compile_value_codec(_get_value_class(cls), version)
+
+        def write_list(buffer, value):
+            _write_uint(buffer, len(value))
+            for item in value:
+                write_value(buffer, item)
+
+        def read_list(reader):
+            return [read_value(reader) for _ in range(_read_uint(reader))]
+
+        return write_list, read_list
+    elif real_cls is Union:
+        write_value, read_value = _compile_value_codec(_get_value_class(cls), version)
+
+        def write_optional(buffer, value):
+            if value is None:
+                buffer.append(0)
+            else:
+                buffer.append(1)
+                write_value(buffer, value)
+
+        def read_optional(reader):
+            reader.pos += 1
+            if reader.data[reader.pos - 1] == 0:
+                return None
+            return read_value(reader)
+
+        return write_optional, read_optional
+    elif issubclass(real_cls, BaseObject):
+
+        def write_baseobject(buffer, value):
+            _get_baseobject_codec(real_cls, version)[0](buffer, value)
+
+        def read_baseobject(reader):
+            return _get_baseobject_codec(real_cls, version)[1](reader)
+
+        return write_baseobject, read_baseobject
+    elif issubclass(real_cls, Enum) and version == 1:
+        # Enums were stored by their position in the enum
+        members = list(real_cls)
+        indices = {member: idx for idx, member in enumerate(members)}
+
+        def write_enum(buffer, value):
+            _write_uint(buffer, indices[value])
+
+        def read_enum(reader):
+            idx = _read_uint(reader)
+            if idx >= len(members):
+                raise CodecError(f"Unknown {real_cls.__name__} member {idx}")
+            return members[idx]
+
+        return write_enum, read_enum
+    elif issubclass(real_cls, Enum):
+        # Enums are stored by the fingerprint of their value, so that members can
+        # be added or reordered, and removed ones are not read as another member
+        tags = {member: _get_tag(repr(member.value)) for member in real_cls}
+        members = {tag: member for member, tag in tags.items()}
+        if len(members) != len(tags):
+            raise CodecError(f"Members of {real_cls.__name__} have the same tag")
+
+        def write_enum(buffer, value):
+            buffer += TAG.pack(tags[value])
+
+        def read_enum(reader):
+            reader.pos += TAG.size
+            tag = TAG.unpack_from(reader.data, reader.pos - TAG.size)[0]
+            try:
+                return members[tag]
+            except KeyError:
+                raise CodecError(f"Unknown {real_cls.__name__} member") from None
+
+        return write_enum, read_enum
+    elif real_cls in _PLAIN_CODECS:
+        return _PLAIN_CODECS[real_cls]
+    raise CodecError(f"Unsupported class {cls}")
+
+
+def _get_raw_format(version):
+    # Items kept undecoded in another version are decoded before being stored again
+    return "binary" if version == BINARY_VERSION else "binary{}".format(version)
+
+
+def _compile_lazy_list_codec(cls, version):
+    # Items are stored with their size, so that they can be kept undecoded
+    assert _get_class(cls) is List
+    write_value, read_value = _compile_value_codec(_get_value_class(cls), version)
+    raw_format = _get_raw_format(version)
+
+    def write_lazy_list(buffer, value):
+        items = (
+            value.iter_stored(raw_format) if isinstance(value, LazyList) else value
+        )
+        _write_uint(buffer, len(value))
+        for item in items:
+            if item.__class__ is RawItem:
+                encoded = item.raw
+            else:
+                encoded = bytearray()
+                write_value(encoded, item)
+            _write_uint(buffer, len(encoded))
+            buffer += encoded
+
+    def read_item(raw):
+        return read_value(_Reader(raw))
+
+    def read_lazy_list(reader):
+        raw_items = []
+        for _ in range(_read_uint(reader)):
+            length = _read_uint(reader)
+            raw_items.append(bytes(reader.data[reader.pos : reader.pos + length]))
+            reader.pos += length
+        return LazyList(raw_items, raw_format, read_item)
+
+    return write_lazy_list, read_lazy_list
+
+
+def _has_default(cls, key):
+    if key in cls._slot_defaults:
+        return True
+    # Fields of slotted classes are member descriptors on the class
+    default = getattr(cls, key, _has_default)
+    return default is not _has_default and not isinstance(
+        default, types.MemberDescriptorType
+    )
+
+
+def _get_tag(description):
+    return zlib.crc32(description.encode("utf-8")) & 0xFFFF
+
+
+def _describe_field_class(cls):
+    # Like _describe_schema, objects and enums being described by their name only,
+    # as they are checked when read themselves
+    real_cls = _get_class(cls)
+    if real_cls in _GENERIC_NAMES:
+        return "{}[{}]".format(
+            _GENERIC_NAMES[real_cls],
+            ",".join(_describe_field_class(arg) for arg in cls.__args__),
+        )
+    elif real_cls is type(None):
+        return "None"
+    elif issubclass(real_cls, BaseObject) and real_cls.codec_id_field is not None:
+        return "{}#{}".format(real_cls.__name__, real_cls.codec_id_field)
+    return real_cls.__name__
+
+
+def _get_layout_tags(cls):
+    # Fingerprint of the first fields of cls, for each number of first fields
+    descriptions = [
+        "{}{}:{}".format(
+            key, "~" if key in cls.lazy_fields else "", _describe_field_class(field)
+        )
+        for key, field in getattr(cls, "__annotations__", {}).items()
+    ]
+    tags = [
+        _get_tag(",".join(descriptions[:num_fields]))
+        for num_fields in range(len(descriptions) + 1)
+    ]
+    if len(set(tags)) != len(tags):
+        raise CodecError(f"Fields of {cls.__name__} have the same tag")
+    return tags
+
+
+def _compile_fields_reader(cls, field_readers, layout_tags):
+    # Reads objects stored before fields were added at the end of the class, the
+    # fields added since taking their default
+    keys = list(field_readers)
+    num_fields_by_tag = {tag: num_fields for num_fields, tag in enumerate(layout_tags)}
+
+    def read_fields(reader, tag):
+        num_fields = num_fields_by_tag.get(tag)
+        if num_fields is None:
+            raise CodecError(f"Stored {cls.__name__} has different fields")
+        for key in keys[num_fields:]:
+            if not _has_default(cls, key):
+                raise CodecError(f"Stored {cls.__name__} has no field {key}")
+        kwargs = {}
+        for key in keys[:num_fields]:
+            kwargs[key] = field_readers[key](reader)
+        return cls(_validate=False, **kwargs)
+
+    return read_fields
+
+
+def _get_baseobject_codec(cls, version=BINARY_VERSION):
+    codec = _baseobject_codecs.get((cls, version))
+    if codec is not None:
+        return codec
+
+    id_field = cls.codec_id_field
+    if id_field is not None:
+        # Objects fully known from one int field, like cards from their id
+        def write_by_id(buffer, obj):
+            _write_uint(buffer, getattr(obj, id_field))
+
+        def read_by_id(reader):
+            return cls(_validate=False, **{id_field: _read_uint(reader)})
+
+        codec = (write_by_id, read_by_id)
+        _baseobject_codecs[(cls, version)] = codec
+        return codec
+
+    # Generate an encoder and a decoder of the fields in annotation order
+    annotations = getattr(cls, "__annotations__", {})
+    layout_tags = _get_layout_tags(cls)
+    namespace = {"cls": cls, "TAG": TAG}
+    write_lines = ["def write(buffer, obj):"]
+    read_lines = ["def read(reader):"]
+    if version == 1:
+        write_lines.append("    pass")
+    else:
+        write_lines.append("    buffer += {!r}".format(TAG.pack(layout_tags[-1])))
+        read_lines += [
+            "    reader.pos += TAG.size",
+            "    tag = TAG.unpack_from(reader.data, reader.pos - TAG.size)[0]",
+            "    if tag != {}:".format(layout_tags[-1]),
+            "        return read_fields(reader, tag)",
+        ]
+    read_lines += ["    return cls(", "        _validate=False,"]
+    field_readers = {}
+    for idx, (key, field_class) in enumerate(annotations.items()):
+        if key in cls.lazy_fields:
+            write_value, read_value = _compile_lazy_list_codec(field_class, version)
+        else:
+            write_value, read_value = _compile_value_codec(field_class, version)
+        field_readers[key] = read_value
+        namespace["write_{}".format(idx)] = write_value
+        namespace["read_{}".format(idx)] = read_value
+        write_lines.append("    write_{1}(buffer, obj.{0})".format(key, idx))
+        read_lines.append("        {0}=read_{1}(reader),".format(key, idx))
+    read_lines.append("    )")
+    namespace["read_fields"] = _compile_fields_reader(cls, field_readers, layout_tags)
+    exec("\n".join(write_lines), namespace)
+    exec("\n".join(read_lines), namespace)
+    codec = (namespace["write"], namespace["read"])
+    _baseobject_codecs[(cls, version)] = codec
+    return codec
+
+
+_GENERIC_NAMES = {Dict: "Dict", List: "List", Union: "Union"}
+
+
+def _describe_schema(cls, described):
+    real_cls = _get_class(cls)
+    if real_cls in _GENERIC_NAMES:
+        return "{}[{}]".format(
+            _GENERIC_NAMES[real_cls],
+            ",".join(_describe_schema(arg, described) for arg in cls.__args__),
+        )
+    elif real_cls is type(None):
+        return "None"
+    elif issubclass(real_cls, BaseObject):
+        if real_cls in described:
+            return real_cls.__name__
+        described.add(real_cls)
+        if real_cls.codec_id_field is not None:
+            return "{}#{}".format(real_cls.__name__, real_cls.codec_id_field)
+        return "{}({})".format(
+            real_cls.__name__,
+            ",".join(
+                "{}{}:{}".format(
+                    key,
+                    "~" if key in real_cls.lazy_fields else "",
+                    _describe_schema(field_class, described),
+                )
+                for key, field_class in getattr(
+                    real_cls, "__annotations__", {}
+                ).items()
+            ),
+        )
+    elif issubclass(real_cls, Enum):
+        return "{}[{}]".format(
+            real_cls.__name__, ",".join(str(member.value) for member in real_cls)
+        )
+    return real_cls.__name__
+
+
+@lru_cache(None)
+def get_schema_fingerprint(cls):
+    # Changes whenever a field, a field type or an enum stored under cls changes
+    return zlib.crc32(_describe_schema(cls, set()).encode("utf-8"))
+
+
+class JsonCodec:
+    def encode(self, obj):
+        return obj.to_json_str()
+
+    def decode(self, cls, data):
+        return cls.from_json_str(data, trusted=True)
+
+
+class BinaryCodec:
+    # Positional fields in annotation order, card ids only and varint numbers.
+    # Fields are only ever added at the end of classes, objects stored with other
+    # fields failing to decode. Blobs of version 1 are only read with the schema
+    # they were written with.
+    def encode(self, obj):
+        buffer = bytearray(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, 0))
+        _get_baseobject_codec(obj.__class__)[0](buffer, obj)
+        return bytes(buffer)
+
+    def decode(self, cls, data):
+        magic, version, fingerprint = BINARY_HEADER.unpack_from(data)
+        if magic != BINARY_MAGIC or version not in (1, BINARY_VERSION):
+            raise CodecError("Unknown binary format")
+        if version == 1 and fingerprint != get_schema_fingerprint(cls):
+            raise CodecError(f"Stored {cls.__name__} has a different schema")
+        reader = _Reader(memoryview(data), BINARY_HEADER.size)
+        obj = _get_baseobject_codec(cls, version)[1](reader)
+        if reader.pos != len(data):
+            raise CodecError("Trailing data")
+        return obj
+
+
+CODECS = {"json": JsonCodec(), "binary": BinaryCodec()}
+
+
+def get_codec(name):
+    return CODECS[name]
+
+
+def decode_object(cls, data):
+    # Reads both binary blobs and JSON ones, written before binary storage
+    if isinstance(data, (bytes, bytearray)) and data.startswith(BINARY_MAGIC):
+        return CODECS["binary"].decode(cls, data)
+    return CODECS["json"].decode(cls, data)
@@ -1,29 +1,212 @@
+import bisect
+import logging
 import pickle
 import redis
 import redis_lock
+import threading
+import time
 from functools import lru_cache
 
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# Stored values start with a tag of their format, values stored before tags were
+# added start with the pickle protocol byte for dicts, anything else being raw
+VALUE_TAG = b"\x00"
+BYTES_FORMAT = b"b"
+STR_FORMAT = b"s"
+PICKLE_FORMAT = b"p"
+LEGACY_PICKLE_PREFIX = b"\x80"
+
+# Versions of values are counters stored next to them, bumped on every save
+VERSION_KEY_SUFFIX = ":version"
+
+# Locks hand out increasing fencing tokens, kept long after any lease expired
+FENCING_TOKEN_PREFIX = "lock-token:"
+FENCING_TOKEN_EXPIRE = 24 * 3600
+
+# Fields of a hash and its version, or the value stored before objects were
+# stored as hashes
+GET_FIELDS_SCRIPT = """
+local value
+if redis.call("TYPE", KEYS[1]).ok == "string" then
+    value = redis.call("GET", KEYS[1])
+else
+    value = redis.call("HGETALL", KEYS[1])
+end
+return {value, redis.call("GET", KEYS[2])}
+"""
+
+# Sets and deletes fields of a hash and bumps its version, returning the new
+# version. When checking the version, only if the hash is still at the version it
+# was read at, when checking the fencing token, only if no lock holder came after
+# the one holding the token, returning 0 otherwise. Arguments are sent in chunks,
+# lua only unpacking a few thousands of them at once, unpack having moved to
+# table.unpack in the lua of fakeredis.
+SET_FIELDS_SCRIPT = """
+local unpack = unpack or table.unpack
+if ARGV[1] == "version" then
+    if (redis.call("GET", KEYS[2]) or "0") ~= ARGV[2] then
+        return 0
+    end
+elseif ARGV[1] == "token" then
+    if redis.call("GET", KEYS[3]) ~= ARGV[2] then
+        return 0
+    end
+end
+if ARGV[3] == "1" then
+    redis.call("DEL", KEYS[1])
+end
+local last_set = 4 + 2 * tonumber(ARGV[4])
+for idx = 5, last_set, 1000 do
+    redis.call("HMSET", KEYS[1], unpack(ARGV, idx, math.min(idx + 999, last_set)))
+end
+for idx = last_set + 1, #ARGV, 1000 do
+    redis.call("HDEL", KEYS[1], unpack(ARGV, idx, math.min(idx + 999, #ARGV)))
+end
+return redis.call("INCR", KEYS[2])
+"""
+
+# Upper bounds in seconds of the buckets of lock wait and hold times
+LOCK_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+logger = logging.getLogger(__name__)
+
+
+def encode_value(val):
+    if isinstance(val, dict):
+        return VALUE_TAG + PICKLE_FORMAT + pickle.dumps(val)
+    elif isinstance(val, str):
+        return VALUE_TAG + STR_FORMAT + val.encode("utf-8")
+    elif isinstance(val, (bytes, bytearray)):
+        return VALUE_TAG + BYTES_FORMAT + val
+    # Numbers are stored as they are, like INCR counters
+    return val
+
+
+def decode_value(data):
+    if data is None:
+        return None
+    if data[:1] == VALUE_TAG:
+        value_format = data[1:2]
+        if value_format == PICKLE_FORMAT:
+            return pickle.loads(data[2:])
+        elif value_format == STR_FORMAT:
+            return data[2:].decode("utf-8")
+        elif value_format == BYTES_FORMAT:
+            return data[2:]
+        raise Exception("Unknown value format")
+    if data[:1] == LEGACY_PICKLE_PREFIX:
+        try:
+            return pickle.loads(data)
+        except Exception:
+            return data
+    return data
 
 
 class RedisClient:
-    def __init__(self, host=settings.REDIS_HOST):
-        self.redis_client = redis.StrictRedis(host)
+    def __init__(self, host=settings.REDIS_HOST, connection_pool=None):
+        # A blocking pool shared by the threads of a worker, waiting for a free
+        # connection instead of failing when all of them are in use
+        self.connection_pool = connection_pool or redis.BlockingConnectionPool(
+            host=host,
+            port=settings.REDIS_PORT,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        )
+        # Locks are waited for with a blocking command, which has to return before
+        # the socket times out for the wait to fail as a lock timeout
+        socket_timeout = self.connection_pool.connection_kwargs.get("socket_timeout")
+        if (
+            socket_timeout is not None
+            and settings.REDIS_LOCK_ACQUIRE_TIMEOUT >= socket_timeout
+        ):
+            raise ImproperlyConfigured(
+                "REDIS_LOCK_ACQUIRE_TIMEOUT must be shorter than REDIS_SOCKET_TIMEOUT"
+            )
+        self.redis_client = redis.StrictRedis(connection_pool=self.connection_pool)
+        self.get_fields_script = self.redis_client.register_script(GET_FIELDS_SCRIPT)
+        self.set_fields_script = self.redis_client.register_script(SET_FIELDS_SCRIPT)
 
     def set(self, key, val):
-        if isinstance(val, dict):
-            return self.redis_client.set(key, pickle.dumps(val))
-        else:
-            return self.redis_client.set(key, val)
+        return self.redis_client.set(key, encode_value(val))
 
     def get(self, key):
-        try:
-            return pickle.loads(self.redis_client.get(key))
-        except Exception:
-            return self.redis_client.get(key)
+        return decode_value(self.redis_client.get(key))
 
     def delete(self, key):
-        self.redis_client.delete(key)
+        self.redis_client.delete(key, key + VERSION_KEY_SUFFIX)
+
+    def get_fields(self, key):
+        # Fields of the hash at key and its version in one round trip, or the value
+        # stored at key as a string, values never saved with a version being at
+        # version 0
+        value, version = self.get_fields_script(keys=[key, key + VERSION_KEY_SUFFIX])
+        if isinstance(value, list):
+            fields = {}
+            for idx in range(0, len(value), 2):
+                fields[value[idx].decode("utf-8")] = decode_value(value[idx + 1])
+            value = fields or None
+        else:
+            value = decode_value(value)
+        return value, int(version or 0)
+
+    def get_field_values(self, key, names):
+        # Values of some fields of the hash at key, None for missing ones
+        return [decode_value(value) for value in self.redis_client.hmget(key, names)]
+
+    def set_fields(
+        self,
+        key,
+        fields,
+        deleted=(),
+        replace=False,
+        version=None,
+        lock_key=None,
+        fencing_token=None,
+    ):
+        # Sets fields of the hash at key, the hash being deleted first when
+        # replacing it, either if it is still at version or, when saving under a
+        # lock, if the lock is still held with fencing_token. Returns the new
+        # version of the hash, or 0 if it was not set.
+        if version is not None:
+            check, expected = "version", version
+        elif fencing_token is not None:
+            check, expected = "token", fencing_token
+        else:
+            check, expected = "", ""
+        args = [check, expected, 1 if replace else 0, len(fields)]
+        for name, val in fields.items():
+            args += [name, encode_value(val)]
+        args += deleted
+        return self.set_fields_script(
+            keys=[
+                key,
+                key + VERSION_KEY_SUFFIX,
+                FENCING_TOKEN_PREFIX + (lock_key or key),
+            ],
+            args=args,
+        )
+
+    def push(self, key, val, expire=None):
+        pipeline = self.redis_client.pipeline()
+        pipeline.rpush(key, encode_value(val))
+        if expire is not None:
+            pipeline.expire(key, expire)
+        return pipeline.execute()[0]
+
+    def pop(self, key):
+        return decode_value(self.redis_client.lpop(key))
+
+    def wait_pop(self, key, timeout):
+        # timeout is in whole seconds, redis 3 not taking fractions of them
+        item = self.redis_client.blpop(key, timeout=timeout)
+        return decode_value(item[1]) if item is not None else None
+
+    def length(self, key):
+        return self.redis_client.llen(key)
 
     def update_dict(self, key, dict_vals):
         cur = self.get(key)
@@ -33,12 +216,33 @@ class RedisClient:
         self.set(key, cur)
 
     def get_lock(self, key, blocking=True):
-        lock = redis_lock.Lock(self.redis_client, key)
-        if lock.acquire(blocking=blocking):
+        # Leases expire unless renewed by the thread of their holder, so that the
+        # lock of a dead worker is released within seconds
+        lock = redis_lock.Lock(
+            self.redis_client,
+            key,
+            expire=settings.REDIS_LOCK_EXPIRE,
+            auto_renewal=True,
+        )
+        try:
+            acquired = lock.acquire(
+                blocking=blocking,
+                timeout=settings.REDIS_LOCK_ACQUIRE_TIMEOUT if blocking else None,
+            )
+        except redis.TimeoutError:
+            # The socket timed out while waiting, like the wait itself
+            acquired = False
+        if acquired:
             return lock
         else:
             raise RedisLockError()
 
+    def get_fencing_token(self, key):
+        pipeline = self.redis_client.pipeline()
+        pipeline.incr(FENCING_TOKEN_PREFIX + key)
+        pipeline.expire(FENCING_TOKEN_PREFIX + key, FENCING_TOKEN_EXPIRE)
+        return pipeline.execute()[0]
+
 
 @lru_cache(3)
 def get_redis():
@@ -49,14 +253,131 @@ class RedisLockError(Exception):
     pass
 
 
+class RedisConflictError(Exception):
+    pass
+
+
+class Histogram:
+    def __init__(self, buckets=LOCK_TIME_BUCKETS):
+        self.buckets = buckets
+        # The last count is of values over the last bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self):
+        # Cumulative counts per upper bound, like prometheus histograms
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {"buckets": buckets, "count": self.count, "sum": self.sum}
+
+
+class LockStats:
+    def __init__(self):
+        self.wait = Histogram()
+        self.hold = Histogram()
+        self.contended = 0
+        self.timeouts = 0
+
+    def to_dict(self):
+        return {
+            "wait": self.wait.to_dict(),
+            "hold": self.hold.to_dict(),
+            "contended": self.contended,
+            "timeouts": self.timeouts,
+        }
+
+
+# Timings of the locks taken by this process, per stats key of the locks
+_lock_stats = {}
+_lock_stats_mutex = threading.Lock()
+
+
+def _record_lock_stats(stats_key, wait=None, hold=None, contended=False, timeout=False):
+    with _lock_stats_mutex:
+        lock_stats = _lock_stats.get(stats_key)
+        if lock_stats is None:
+            lock_stats = _lock_stats[stats_key] = LockStats()
+        if wait is not None:
+            lock_stats.wait.observe(wait)
+        if hold is not None:
+            lock_stats.hold.observe(hold)
+        lock_stats.contended += contended
+        lock_stats.timeouts += timeout
+
+
+def get_lock_stats():
+    with _lock_stats_mutex:
+        return {
+            stats_key: lock_stats.to_dict()
+            for stats_key, lock_stats in _lock_stats.items()
+        }
+
+
+def reset_lock_stats():
+    with _lock_stats_mutex:
+        _lock_stats.clear()
+
+
 class RedisLock:
-    def __init__(self, lock_key, redis_client=get_redis()):
+    # Timings are recorded under stats_key, naming what the lock is taken for
+    # rather than the locked key, like "room_start_game"
+    def __init__(
+        self, lock_key, redis_client=get_redis(), stats_key="other", blocking=True
+    ):
         self.lock_key = lock_key
         self.redis_client = redis_client
+        self.stats_key = stats_key
+        self.blocking = blocking
         self.lock = None
+        self.fencing_token = None
+        self.acquired_at = None
 
     def __enter__(self):
-        self.lock = self.redis_client.get_lock(self.lock_key)
+        started_at = time.monotonic()
+        try:
+            self.lock = self.redis_client.get_lock(self.lock_key, blocking=False)
+            contended = False
+        except RedisLockError:
+            # Only a busy lock takes a second round trip to wait for it
+            contended = True
+            if not self.blocking:
+                _record_lock_stats(self.stats_key, contended=True)
+                raise
+            try:
+                self.lock = self.redis_client.get_lock(self.lock_key)
+            except RedisLockError:
+                _record_lock_stats(
+                    self.stats_key,
+                    wait=time.monotonic() - started_at,
+                    contended=True,
+                    timeout=True,
+                )
+                raise
+        self.acquired_at = time.monotonic()
+        _record_lock_stats(
+            self.stats_key, wait=self.acquired_at - started_at, contended=contended
+        )
+        self.fencing_token = self.redis_client.get_fencing_token(self.lock_key)
+        return self
 
     def __exit__(self, type, value, traceback):
-        self.lock.release()
+        try:
+            self.lock.release()
+        except redis_lock.NotAcquired:
+            # The lease expired, saves made after a new holder took it were rejected
+            pass
+        hold = time.monotonic() - self.acquired_at
+        _record_lock_stats(self.stats_key, hold=hold)
+        if hold > settings.REDIS_SLOW_LOCK_SECONDS:
+            logger.warning(
+                "Lock %s (%s) held for %.3fs", self.lock_key, self.stats_key, hold
+            )
@@ -0,0 +1,260 @@
+import json
+from enum import Enum
+from json.encoder import encode_basestring
+from typing import Dict, List, Union
+
+from pokerback.utils.baseobject import (
+    BaseObject,
+    LazyList,
+    RawItem,
+    _get_class,
+    _get_value_class,
+)
+
+# Fragments buffered before a chunk is sent, a few tens of KB of JSON
+STREAM_CHUNK_FRAGMENTS = 4096
+
+# Compact JSON like the rendering of rest_framework's JSONRenderer
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+# Encoders append the JSON fragments of a value to a list. Streamers are
+# generators doing the same for values holding lists of objects, which are the
+# ones growing with the room, yielding when the fragments should be flushed.
+_baseobject_encoders = {}
+_baseobject_streamers = {}
+
+
+def _encode_plain(value, out):
+    out.append(_dumps(value))
+
+
+def _encode_str(value, out):
+    out.append(encode_basestring(value) if value is not None else "null")
+
+
+def _encode_int(value, out):
+    out.append(str(int(value)) if value is not None else "null")
+
+
+def _encode_enum(value, out):
+    out.append(_dumps(value.value) if value is not None else "null")
+
+
+def _get_field_prefixes(cls):
+    # `{"key":` for the first field, then `,"key":`
+    return [
+        ("{" if idx == 0 else ",") + encode_basestring(key) + ":"
+        for idx, key in enumerate(getattr(cls, "__annotations__", {}).keys())
+    ]
+
+
+def _is_baseobject_class(cls):
+    real_cls = _get_class(cls)
+    if real_cls is Union:
+        real_cls = _get_class(_get_value_class(cls))
+    return isinstance(real_cls, type) and issubclass(real_cls, BaseObject)
+
+
+def _is_streamed(cls, visited=None):
+    # Whether values of cls may hold lists of objects
+    real_cls = _get_class(cls)
+    if real_cls in (Dict, List):
+        value_cls = _get_value_class(cls)
+        return _is_baseobject_class(value_cls) or _is_streamed(value_cls, visited)
+    elif real_cls is Union:
+        return _is_streamed(_get_value_class(cls), visited)
+    elif _is_baseobject_class(real_cls):
+        visited = visited or set()
+        if real_cls in visited:
+            return False
+        visited.add(real_cls)
+        return any(
+            _is_streamed(field_class, visited)
+            for field_class in getattr(real_cls, "__annotations__", {}).values()
+        )
+    return False
+
+
+def _compile_value_encoder(cls):
+    real_cls = _get_class(cls)
+    if real_cls is Dict:
+        encode_value = _compile_value_encoder(_get_value_class(cls))
+
+        def encode_dict(value, out):
+            if value is None:
+                out.append("null")
+                return
+            separator = "{"
+            for key, item in value.items():
+                out.append(separator + encode_basestring(str(key)) + ":")
+                encode_value(item, out)
+                separator = ","
+            out.append("}" if separator == "," else "{}")
+
+        return encode_dict
+    elif real_cls is List:
+        encode_value = _compile_value_encoder(_get_value_class(cls))
+
+        def encode_list(value, out):
+            if value is None:
+                out.append("null")
+                return
+            separator = "["
+            for item in value:
+                out.append(separator)
+                encode_value(item, out)
+                separator = ","
+            out.append("]" if separator == "," else "[]")
+
+        return encode_list
+    elif real_cls is Union:
+        return _compile_value_encoder(_get_value_class(cls))
+    elif issubclass(real_cls, BaseObject):
+
+        def encode_baseobject(value, out):
+            if value is None:
+                out.append("null")
+                return
+            # Encode by the actual class, which may be a subclass of the annotation
+            _get_baseobject_encoder(value.__class__)(value, out)
+
+        return encode_baseobject
+    elif issubclass(real_cls, Enum):
+        return _encode_enum
+    elif real_cls is str:
+        return _encode_str
+    elif real_cls is int:
+        return _encode_int
+    return _encode_plain
+
+
+def _get_baseobject_encoder(cls):
+    encoder = _baseobject_encoders.get(cls)
+    if encoder is None:
+        fields = [
+            (prefix, key, _compile_value_encoder(field_class))
+            for prefix, (key, field_class) in zip(
+                _get_field_prefixes(cls), getattr(cls, "__annotations__", {}).items()
+            )
+        ]
+
+        def encoder(obj, out):
+            if not fields:
+                out.append("{}")
+                return
+            for prefix, key, encode_value in fields:
+                out.append(prefix)
+                encode_value(getattr(obj, key), out)
+            out.append("}")
+
+        _baseobject_encoders[cls] = encoder
+    return encoder
+
+
+def _compile_value_streamer(cls):
+    real_cls = _get_class(cls)
+    if real_cls is Union:
+        return _compile_value_streamer(_get_value_class(cls))
+    elif real_cls is List:
+        value_cls = _get_value_class(cls)
+        encode_value = _compile_value_encoder(value_cls)
+        stream_value = (
+            _compile_value_streamer(value_cls) if _is_streamed(value_cls) else None
+        )
+
+        def stream_list(value, out):
+            if value is None:
+                out.append("null")
+                return
+            if isinstance(value, LazyList):
+                # Items never loaded from JSON are written as they were loaded
+                items = value.iter_stored("json")
+            else:
+                items = value
+            separator = "["
+            for item in items:
+                out.append(separator)
+                separator = ","
+                if item.__class__ is RawItem:
+                    out.append(_dumps(item.raw))
+                elif stream_value is not None:
+                    yield from stream_value(item, out)
+                else:
+                    encode_value(item, out)
+                if len(out) >= STREAM_CHUNK_FRAGMENTS:
+                    yield
+            out.append("]" if separator == "," else "[]")
+
+        return stream_list
+    elif real_cls is Dict:
+        value_cls = _get_value_class(cls)
+        encode_value = _compile_value_encoder(value_cls)
+        stream_value = (
+            _compile_value_streamer(value_cls) if _is_streamed(value_cls) else None
+        )
+
+        def stream_dict(value, out):
+            if value is None:
+                out.append("null")
+                return
+            separator = "{"
+            for key, item in value.items():
+                out.append(separator + encode_basestring(str(key)) + ":")
+                separator = ","
+                if stream_value is not None:
+                    yield from stream_value(item, out)
+                else:
+                    encode_value(item, out)
+                if len(out) >= STREAM_CHUNK_FRAGMENTS:
+                    yield
+            out.append("}" if separator == "," else "{}")
+
+        return stream_dict
+
+    def stream_baseobject(value, out):
+        if value is None:
+            out.append("null")
+            return
+        yield from _get_baseobject_streamer(value.__class__)(value, out)
+
+    return stream_baseobject
+
+
+def _get_baseobject_streamer(cls):
+    streamer = _baseobject_streamers.get(cls)
+    if streamer is None:
+        prefixes = _get_field_prefixes(cls)
+        fields = []
+        for prefix, (key, field_class) in zip(
+            prefixes, getattr(cls, "__annotations__", {}).items()
+        ):
+            if _is_streamed(field_class):
+                fields.append((prefix, key, None, _compile_value_streamer(field_class)))
+            else:
+                fields.append((prefix, key, _compile_value_encoder(field_class), None))
+
+        def streamer(obj, out):
+            if not fields:
+                out.append("{}")
+                return
+            for prefix, key, encode_value, stream_value in fields:
+                out.append(prefix)
+                if stream_value is not None:
+                    yield from stream_value(getattr(obj, key), out)
+                else:
+                    encode_value(getattr(obj, key), out)
+            out.append("}")
+
+        _baseobject_streamers[cls] = streamer
+    return streamer
+
+
+def iter_json_chunks(obj):
+    # JSON of obj.to_json() as utf-8 chunks, written straight from the fields of
+    # obj without building the whole JSON document in memory
+    out = []
+    for _ in _get_baseobject_streamer(obj.__class__)(obj, out):
+        yield "".join(out).encode("utf-8")
+        out.clear()
+    if out:
+        yield "".join(out).encode("utf-8")
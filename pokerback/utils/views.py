@@ -1,7 +1,11 @@
+from itertools import chain
+
+from django.http import StreamingHttpResponse
 from rest_framework import generics, status
 from rest_framework.response import Response
 
 from pokerback.utils.baseobject import BaseObject
+from pokerback.utils.streaming import iter_json_chunks
 
 
 class BasicRequest(BaseObject):
@@ -12,7 +16,37 @@ class BasicResponse(BaseObject):
     pass
 
 
+def get_response(response_obj, stream=False):
+    # Streamed responses are written in chunks straight from the response object.
+    # Their status is sent with the first chunk, so only errors in the first
+    # chunk still give an invalid format response.
+    try:
+        if stream:
+            chunks = iter_json_chunks(response_obj)
+            first_chunk = next(chunks, b"")
+        else:
+            response_json = response_obj.to_json()
+    except Exception as e:
+        print(e)
+        return Response(
+            "Response format is invalid.", status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if stream:
+        return StreamingHttpResponse(
+            chain((first_chunk,), chunks),
+            content_type="application/json",
+            status=status.HTTP_200_OK,
+        )
+    return Response(response_json, status=status.HTTP_200_OK)
+
+
 class BaseGetView(generics.GenericAPIView):
+    stream_response = False
+
+    def should_stream(self, response_obj):
+        return self.stream_response
+
     def get_response_class(self):
         response_cls = getattr(self, "response_class")
         assert issubclass(response_cls, BaseObject)
@@ -23,19 +57,15 @@ class BaseGetView(generics.GenericAPIView):
 
     def get(self, request, *args, **kwargs):
         response_obj = self.handle_request()
+        return get_response(response_obj, stream=self.should_stream(response_obj))
 
-        try:
-            response_json = response_obj.to_json()
-        except Exception as e:
-            print(e)
-            return Response(
-                "Response format is invalid.", status=status.HTTP_400_BAD_REQUEST
-            )
 
-        return Response(response_json, status=status.HTTP_200_OK)
+class BasePostView(generics.GenericAPIView):
+    stream_response = False
 
+    def should_stream(self, response_obj):
+        return self.stream_response
 
-class BasePostView(generics.GenericAPIView):
     def get_request_class(self):
         request_cls = getattr(self, "request_class")
         assert issubclass(request_cls, BaseObject)
@@ -59,13 +89,4 @@ class BasePostView(generics.GenericAPIView):
             )
 
         response_obj = self.handle_request(request_obj)
-
-        try:
-            response_json = response_obj.to_json()
-        except Exception as e:
-            print(e)
-            return Response(
-                "Response format is invalid.", status=status.HTTP_400_BAD_REQUEST
-            )
-
-        return Response(response_json, status=status.HTTP_200_OK)
+        return get_response(response_obj, stream=self.should_stream(response_obj))
@@ -1,7 +1,10 @@
+import fakeredis
 import pytest
+import redis
 from uuid import uuid4
 
 from pokerback.user.models import User
+from pokerback.utils.redis import RedisClient, get_redis
 
 
 @pytest.fixture
@@ -10,3 +13,151 @@ def user(uuid=None):
         uuid = uuid4()
 
     return User.objects.create(uuid=uuid)
+
+
+class FakeLock:
+    def release(self):
+        pass
+
+
+class FakeStrictRedis:
+    # Commands of redis used by pokerback.utils.redis, with its scripts run in
+    # python
+    def __init__(self):
+        self.values = {}
+        self.num_gets = 0
+        self.num_round_trips = 0
+        self.bytes_written = 0
+
+    def _encode(self, val):
+        return val if isinstance(val, bytes) else str(val).encode()
+
+    def set(self, key, val):
+        self.num_round_trips += 1
+        self.values[key] = self._encode(val)
+        return True
+
+    def get(self, key):
+        self.num_gets += 1
+        self.num_round_trips += 1
+        return self.values.get(key)
+
+    def _incr(self, key):
+        self.values[key] = self._encode(int(self.values.get(key, 0)) + 1)
+        return int(self.values[key])
+
+    def _rpush(self, key, val):
+        self.values.setdefault(key, []).append(val)
+        return len(self.values[key])
+
+    def lpop(self, key):
+        self.num_round_trips += 1
+        items = self.values.get(key)
+        if not items:
+            return None
+        item = items.pop(0)
+        if not items:
+            del self.values[key]
+        return item
+
+    def blpop(self, key, timeout=0):
+        # Nothing can be pushed while waiting, in a single thread
+        item = self.lpop(key)
+        return (key, item) if item is not None else None
+
+    def llen(self, key):
+        self.num_round_trips += 1
+        return len(self.values.get(key, []))
+
+    def delete(self, *keys):
+        self.num_round_trips += 1
+        for key in keys:
+            self.values.pop(key, None)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def get_fields(self, keys):
+        self.num_round_trips += 1
+        key, version_key = keys
+        value = self.values.get(key)
+        if isinstance(value, dict):
+            value = [item for field in value.items() for item in field]
+        return [value or [], self.values.get(version_key)]
+
+    def hmget(self, key, names):
+        self.num_round_trips += 1
+        fields = self.values.get(key, {})
+        return [fields.get(self._encode(name)) for name in names]
+
+    def set_fields(self, keys, args):
+        self.num_round_trips += 1
+        key, version_key, token_key = keys
+        args = [self._encode(arg) for arg in args]
+        check, expected, replace, num_set = args[:4]
+        if check == b"version" and self.values.get(version_key, b"0") != expected:
+            return 0
+        if check == b"token" and self.values.get(token_key) != expected:
+            return 0
+        if replace == b"1":
+            self.values.pop(key, None)
+        fields = self.values.setdefault(key, {})
+        last_set = 4 + 2 * int(num_set)
+        for idx in range(4, last_set, 2):
+            fields[args[idx]] = args[idx + 1]
+            self.bytes_written += len(args[idx + 1])
+        for name in args[last_set:]:
+            fields.pop(name, None)
+        return self._incr(version_key)
+
+
+class FakePipeline:
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.commands = []
+
+    def set(self, key, val):
+        self.commands.append(lambda: self.redis_client.values.update({key: val}))
+
+    def incr(self, key):
+        self.commands.append(lambda: self.redis_client._incr(key))
+
+    def rpush(self, key, val):
+        self.commands.append(lambda: self.redis_client._rpush(key, val))
+
+    def expire(self, key, seconds):
+        self.commands.append(lambda: True)
+
+    def execute(self):
+        self.redis_client.num_round_trips += 1
+        return [command() for command in self.commands]
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = get_redis()
+    fake = FakeStrictRedis()
+    monkeypatch.setattr(client, "redis_client", fake)
+    monkeypatch.setattr(client, "get_fields_script", fake.get_fields)
+    monkeypatch.setattr(client, "set_fields_script", fake.set_fields)
+    monkeypatch.setattr(client, "get_lock", lambda key, blocking=True: FakeLock())
+    return fake
+
+
+@pytest.fixture
+def server_redis(monkeypatch):
+    # Commands, scripts and locks run by fakeredis, like a redis server would
+    client = get_redis()
+    server_client = RedisClient(
+        connection_pool=redis.ConnectionPool(
+            connection_class=fakeredis.FakeConnection, server=fakeredis.FakeServer()
+        )
+    )
+    for name in (
+        "connection_pool",
+        "redis_client",
+        "get_fields_script",
+        "set_fields_script",
+    ):
+        monkeypatch.setattr(client, name, getattr(server_client, name))
+    return client
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from pokerback.poker.batch_evaluator import evaluate_batch, hand_types_from_grades
+from pokerback.poker.cards import mask_from_ids
+from pokerback.poker.evaluator import best_hand_card_ids, evaluate
+from pokerback.poker.objects import Card, Hand
+
+
+@pytest.mark.django_db
+def test_evaluate_batch_matches_evaluate():
+    rand = np.random.RandomState(0)
+    card_ids = np.array([rand.choice(52, 7, replace=False) for _ in range(3000)])
+    strengths, grades = evaluate_batch(card_ids)
+
+    assert strengths.tolist() == [evaluate(row) for row in card_ids.tolist()]
+    hand_types = hand_types_from_grades(grades[:100])
+    for row, hand_type in zip(card_ids[:100].tolist(), hand_types):
+        mask = mask_from_ids(row)
+        best_ids = best_hand_card_ids(mask, evaluate(row))
+        hand = Hand.from_cards([Card.from_id(card_id) for card_id in best_ids])
+        assert hand.hand_type == hand_type
+
+
+@pytest.mark.django_db
+def test_evaluate_batch_hand_types():
+    card_ids = [
+        # Straight flush with a pair on board
+        [0, 9, 10, 11, 12, 13, 14],
+        # Quads with a pair kicker
+        [3, 16, 29, 42, 1, 14, 12],
+        # Two trips making a full house
+        [3, 16, 29, 4, 17, 30, 50],
+        # Wheel straight
+        [13, 1, 15, 29, 43, 20, 34],
+    ]
+    strengths, grades = evaluate_batch(card_ids)
+    assert strengths.tolist() == [evaluate(row) for row in card_ids]
+    assert [hand_type.value for hand_type in hand_types_from_grades(grades)] == [
+        "straight_flush",
+        "four_of_a_kind",
+        "full_house",
+        "straight",
+    ]
@@ -0,0 +1,32 @@
+import random
+import pytest
+
+from pokerback.poker.deck import Deck, DeckPool, shuffle_card_ids
+
+
+@pytest.mark.django_db
+def test_shuffle_card_ids():
+    assert sorted(shuffle_card_ids()) == list(range(52))
+    assert shuffle_card_ids(random.Random(1)) == shuffle_card_ids(random.Random(1))
+
+
+@pytest.mark.django_db
+def test_deal():
+    deck = Deck.shuffled()
+    cards = deck.deal(5) + deck.deal(16)
+    assert len(set(card.card_id for card in cards)) == 21
+    assert cards[0].card_id == deck.card_ids[0]
+    with pytest.raises(AssertionError):
+        deck.deal(32)
+
+
+@pytest.mark.django_db
+def test_deck_pool():
+    pool = DeckPool(size=2)
+    try:
+        decks = [pool.get_deck() for _ in range(5)]
+    finally:
+        pool.close()
+    assert not pool.refill_thread.is_alive()
+    for deck in decks:
+        assert sorted(deck.card_ids) == list(range(52))
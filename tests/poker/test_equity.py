@@ -0,0 +1,59 @@
+import pytest
+
+from pokerback.poker.equity import calculate_equity, get_equity_pool
+from pokerback.poker.objects import Card, CardColor
+
+
+def _cards(*cards):
+    return [Card.from_card(color=color, number=number) for color, number in cards]
+
+
+@pytest.fixture
+def hole_cards():
+    return {
+        "aces": _cards((CardColor.SPADE, 1), (CardColor.HEART, 1)),
+        "kings": _cards((CardColor.SPADE, 13), (CardColor.HEART, 13)),
+    }
+
+
+@pytest.mark.django_db
+def test_preflop_equity(hole_cards):
+    res = calculate_equity(hole_cards, trials=3000, seed=1, max_workers=1)
+    assert 0.75 < res["aces"].equity < 0.88
+    assert res["aces"].equity + res["kings"].equity == pytest.approx(1)
+    assert res["aces"].tie == res["kings"].tie
+
+
+@pytest.mark.django_db
+def test_seeded_equity_is_deterministic(hole_cards, settings):
+    settings.EQUITY_POOL_MIN_TRIALS = 0
+    board_cards = _cards((CardColor.CLUB, 13), (CardColor.DIAMOND, 2))
+    in_process = calculate_equity(
+        hole_cards, board_cards, trials=2500, seed=7, max_workers=1
+    )
+    in_pool = calculate_equity(
+        hole_cards, board_cards, trials=2500, seed=7, max_workers=2
+    )
+    assert in_process == in_pool
+    # The pool is kept for the next calls
+    assert get_equity_pool() is get_equity_pool()
+
+
+@pytest.mark.django_db
+def test_complete_board_equity(hole_cards):
+    board_cards = _cards(
+        (CardColor.CLUB, 13),
+        (CardColor.DIAMOND, 2),
+        (CardColor.DIAMOND, 5),
+        (CardColor.CLUB, 9),
+        (CardColor.HEART, 7),
+    )
+    res = calculate_equity(hole_cards, board_cards, max_workers=1)
+    assert res["kings"].win == 1
+    assert res["aces"].equity == 0
+
+
+@pytest.mark.django_db
+def test_equity_without_trials(hole_cards):
+    with pytest.raises(ValueError):
+        calculate_equity(hole_cards, trials=0, max_workers=1)
@@ -0,0 +1,81 @@
+import random
+import pytest
+
+from pokerback.poker.cards import mask_from_ids
+from pokerback.poker.evaluator import (
+    best_hand_card_ids,
+    evaluate,
+    evaluate_mask,
+)
+from pokerback.poker.objects import (
+    Card,
+    Hand,
+    HandEvaluator,
+    PlayerGameState,
+    get_best_hand,
+)
+
+
+def _random_player_and_table(rand):
+    card_ids = rand.sample(range(52), 7)
+    cards = [Card.from_id(card_id) for card_id in card_ids]
+    player_state = PlayerGameState(
+        player_id="player", cards=cards[:2], amount_available=1000
+    )
+    return player_state, cards[2:]
+
+
+@pytest.mark.django_db
+def test_lookup_table_matches_brute_force():
+    rand = random.Random(0)
+    for _ in range(300):
+        player_state, table_cards = _random_player_and_table(rand)
+
+        player_state.find_best_hand(table_cards, HandEvaluator.BRUTE_FORCE)
+        brute_force_hand = player_state.best_hand
+        player_state.find_best_hand(table_cards, HandEvaluator.LOOKUP_TABLE)
+        lookup_table_hand = player_state.best_hand
+
+        assert lookup_table_hand.hand_type == brute_force_hand.hand_type
+        assert lookup_table_hand.strength == brute_force_hand.strength
+
+
+@pytest.mark.django_db
+def test_evaluate_matches_hand_strength():
+    rand = random.Random(1)
+    for _ in range(300):
+        card_ids = rand.sample(range(52), 5)
+        hand = Hand.from_cards([Card.from_id(card_id) for card_id in card_ids])
+        assert evaluate(card_ids) == hand.strength
+
+
+@pytest.mark.django_db
+def test_best_hand_card_ids():
+    # Royal flush of spades among 7 cards
+    mask = mask_from_ids([0, 9, 10, 11, 12, 14, 27])
+    strength = evaluate_mask(mask)
+    assert sorted(best_hand_card_ids(mask, strength)) == [0, 9, 10, 11, 12]
+
+    # Wheel straight
+    mask = mask_from_ids([13, 1, 15, 29, 43, 20, 34])
+    strength = evaluate_mask(mask)
+    assert sorted(best_hand_card_ids(mask, strength)) == [1, 13, 15, 29, 43]
+
+
+@pytest.mark.django_db
+def test_best_hand_cache():
+    get_best_hand.cache_clear()
+    rand = random.Random(2)
+    player_state, table_cards = _random_player_and_table(rand)
+    other_state = PlayerGameState(
+        player_id="other", cards=player_state.cards, amount_available=1000
+    )
+
+    player_state.find_best_hand(table_cards, HandEvaluator.LOOKUP_TABLE)
+    other_state.find_best_hand(table_cards, HandEvaluator.LOOKUP_TABLE)
+    player_state.find_best_hand(table_cards, HandEvaluator.LOOKUP_TABLE)
+
+    cache_info = get_best_hand.cache_info()
+    assert cache_info.misses == 1
+    assert cache_info.hits == 2
+    assert other_state.best_hand is player_state.best_hand
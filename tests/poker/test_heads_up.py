@@ -0,0 +1,91 @@
+import pytest
+
+from pokerback.poker.equity import calculate_equity
+from pokerback.poker.heads_up import (
+    PREFLOP_BOARDS,
+    calculate_heads_up_equity,
+    enumerate_heads_up,
+    enumerate_heads_up_batch,
+    get_combo_idx,
+    get_preflop_table,
+    write_preflop_table,
+)
+from pokerback.poker.cards import mask_from_cards
+from pokerback.poker.objects import Card, CardColor
+
+
+def _cards(*cards):
+    return [Card.from_card(color=color, number=number) for color, number in cards]
+
+
+@pytest.fixture
+def hole_cards():
+    return {
+        "aces": _cards((CardColor.SPADE, 1), (CardColor.HEART, 1)),
+        "suited_connectors": _cards((CardColor.CLUB, 8), (CardColor.CLUB, 9)),
+    }
+
+
+@pytest.fixture
+def preflop_table_path(settings, tmp_path):
+    settings.PREFLOP_EQUITY_PATH = str(tmp_path / "preflop_equity.bin")
+    return settings.PREFLOP_EQUITY_PATH
+
+
+@pytest.mark.django_db
+def test_flop_equity_matches_simulation(hole_cards):
+    board_cards = _cards(
+        (CardColor.CLUB, 2), (CardColor.DIAMOND, 10), (CardColor.CLUB, 13)
+    )
+    exact = calculate_heads_up_equity(hole_cards, board_cards)
+    simulated = calculate_equity(
+        hole_cards, board_cards, trials=3000, seed=3, max_workers=1
+    )
+    assert exact["aces"].equity + exact["suited_connectors"].equity == 1
+    for player_id in hole_cards:
+        assert exact[player_id].equity == pytest.approx(
+            simulated[player_id].equity, abs=0.03
+        )
+
+
+@pytest.mark.django_db
+def test_enumerate_heads_up_batch(hole_cards):
+    hero_mask = mask_from_cards(hole_cards["aces"])
+    villain_mask = mask_from_cards(hole_cards["suited_connectors"])
+    for board_cards in [
+        _cards((CardColor.CLUB, 2), (CardColor.CLUB, 10)),
+        _cards((CardColor.SPADE, 9), (CardColor.HEART, 9)),
+    ]:
+        board_mask = mask_from_cards(board_cards)
+        assert enumerate_heads_up_batch(
+            hero_mask, villain_mask, board_mask
+        ) == enumerate_heads_up(hero_mask, villain_mask, board_mask)
+
+
+@pytest.mark.django_db
+def test_preflop_equity_from_table(hole_cards, preflop_table_path):
+    hero_idx = get_combo_idx(*[card.card_id for card in hole_cards["aces"]])
+    villain_idx = get_combo_idx(
+        *[card.card_id for card in hole_cards["suited_connectors"]]
+    )
+    wins, ties = 1300000, 12304
+    write_preflop_table(
+        preflop_table_path,
+        {
+            (hero_idx, villain_idx): (wins, ties),
+            (villain_idx, hero_idx): (PREFLOP_BOARDS - wins - ties, ties),
+        },
+    )
+
+    res = calculate_heads_up_equity(hole_cards)
+    assert res["aces"].win == wins / PREFLOP_BOARDS
+    assert res["suited_connectors"].tie == ties / PREFLOP_BOARDS
+
+
+@pytest.mark.django_db
+def test_preflop_table_generated_later(preflop_table_path, caplog):
+    assert get_preflop_table() is None
+    assert "enumerating boards" in caplog.text
+
+    write_preflop_table(preflop_table_path, {})
+    assert get_preflop_table() is not None
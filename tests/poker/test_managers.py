@@ -0,0 +1,78 @@
+import pytest
+
+from pokerback.poker.deck import SeededDealer
+from pokerback.poker.managers import PokerManager
+from pokerback.poker.objects import ActionType, Game, GameMetadata, GameStatus
+from pokerback.poker.player_apis import PokerAction
+from pokerback.poker.utils import get_player_min_bet
+from pokerback.room.objects import GameType, Slot, SlotStatus, TableMetadata
+
+
+class FakeRoom:
+    room_uuid = "room"
+
+
+def _table_metadata(num_players):
+    return TableMetadata(
+        game_type=GameType.POKER,
+        max_slots=num_players + 1,
+        slots=[
+            Slot(player_id="player_{}".format(idx), slot_status=SlotStatus.ACTIVE)
+            for idx in range(num_players)
+        ]
+        + [Slot()],
+        action_seconds_limit=60,
+    )
+
+
+def _create_game(manager, game_id):
+    table_metadata = _table_metadata(4)
+    return manager.create_game(
+        game_id=game_id,
+        table_metadata=table_metadata,
+        game_metadata=GameMetadata(small_blind=10, init_token=1000, button_idx=0),
+        player_amounts={
+            slot.player_id: 1000 for slot in table_metadata.slots if slot.player_id
+        },
+        seed=manager.dealer.get_game_seed(FakeRoom(), game_id),
+    )
+
+
+def _play(manager, game):
+    # Everyone calls, the first player raises at every stage
+    while game.game_status == GameStatus.PLAYING:
+        player_id = game.next_player_id
+        min_bet = get_player_min_bet(game.player_states, player_id)
+        if player_id == "player_0":
+            poker_action = PokerAction(
+                action_type=ActionType.BET, amount_bet=min_bet + 20
+            )
+        elif min_bet > 0:
+            poker_action = PokerAction(action_type=ActionType.BET, amount_bet=min_bet)
+        else:
+            poker_action = PokerAction(action_type=ActionType.CHECK)
+        manager.apply_action(game, player_id, poker_action)
+
+
+@pytest.mark.django_db
+def test_seeded_dealer():
+    manager = PokerManager(dealer=SeededDealer(seed=42))
+    game = _create_game(manager, game_id=3)
+    same_game = _create_game(manager, game_id=3)
+    next_game = _create_game(manager, game_id=4)
+
+    assert game.seed is not None
+    assert game.table_cards == same_game.table_cards
+    assert game.table_cards != next_game.table_cards
+    assert game.player_states == same_game.player_states
+
+
+@pytest.mark.django_db
+def test_replay_game():
+    manager = PokerManager(dealer=SeededDealer(seed=42))
+    game = _create_game(manager, game_id=0)
+    _play(manager, game)
+    assert game.game_status == GameStatus.OVER
+
+    replayed_game = PokerManager().replay_game(Game.from_json_str(game.to_json_str()))
+    assert replayed_game == game
@@ -0,0 +1,147 @@
+import pytest
+
+from pokerback.poker.objects import (
+    Card,
+    CardColor,
+    Game,
+    GameMetadata,
+    GameStage,
+    GameStatus,
+    Hand,
+    HandType,
+    PlayerGameState,
+)
+from pokerback.room.objects import GameType, Slot, SlotStatus, TableMetadata
+
+
+def _cards(*cards):
+    return [Card.from_card(color=color, number=number) for color, number in cards]
+
+
+def _game(player_cards, player_bets, table_cards):
+    player_ids = list(player_cards.keys())
+    table_metadata = TableMetadata(
+        game_type=GameType.POKER,
+        max_slots=len(player_ids),
+        slots=[
+            Slot(player_id=player_id, slot_status=SlotStatus.ACTIVE)
+            for player_id in player_ids
+        ],
+        action_seconds_limit=60,
+    )
+    player_states = {}
+    for player_id in player_ids:
+        player_states[player_id] = PlayerGameState(
+            player_id=player_id,
+            cards=player_cards[player_id],
+            amount_available=1000,
+        )
+        player_states[player_id].bet(player_bets[player_id])
+    return Game(
+        game_id=0,
+        table_metadata=table_metadata,
+        game_metadata=GameMetadata(small_blind=10, init_token=1000),
+        table_cards=table_cards,
+        player_states=player_states,
+        stage=GameStage.RIVER,
+    )
+
+
+@pytest.mark.django_db
+def test_show_hand_split_and_side_pots():
+    table_cards = _cards(
+        (CardColor.SPADE, 2),
+        (CardColor.HEART, 7),
+        (CardColor.DIAMOND, 9),
+        (CardColor.CLUB, 12),
+        (CardColor.SPADE, 13),
+    )
+    game = _game(
+        player_cards={
+            # Short stacked player with the best hand, a set of nines
+            "a": _cards((CardColor.HEART, 9), (CardColor.CLUB, 9)),
+            # Two players splitting the side pot with the same pair of aces
+            "b": _cards((CardColor.HEART, 1), (CardColor.CLUB, 3)),
+            "c": _cards((CardColor.DIAMOND, 1), (CardColor.HEART, 3)),
+        },
+        player_bets={"a": 100, "b": 300, "c": 300},
+        table_cards=table_cards,
+    )
+    game.advance_stage()
+
+    assert game.stage == GameStage.SHOW_HAND
+    assert game.game_status == GameStatus.OVER
+    assert game.player_states["b"].best_hand == game.player_states["c"].best_hand
+    assert (
+        game.player_states["a"].best_hand.strength
+        > game.player_states["b"].best_hand.strength
+    )
+    assert [(pot.pot_amount, pot.winners) for pot in game.pots] == [
+        (300, ["a"]),
+        (400, ["b", "c"]),
+    ]
+    assert game.player_states["a"].pot_won == 300
+    assert game.player_states["b"].pot_won == 200
+    assert game.player_states["c"].pot_won == 200
+
+
+@pytest.mark.django_db
+def test_cards_are_interned():
+    card = Card.from_card(color=CardColor.HEART, number=12)
+    assert card is Card.from_id(card.card_id)
+    assert card is Card.from_json(card.to_json())
+    assert card is card.copy()
+    with pytest.raises(AttributeError):
+        card.number = 1
+    with pytest.raises(AssertionError):
+        Card(card_id=card.card_id, color=CardColor.SPADE, number=12)
+
+
+@pytest.mark.django_db
+def test_live_hand_by_stage():
+    table_cards = _cards(
+        (CardColor.SPADE, 10),
+        (CardColor.HEART, 11),
+        (CardColor.SPADE, 2),
+        (CardColor.SPADE, 4),
+        (CardColor.CLUB, 7),
+    )
+    game = _game(
+        player_cards={
+            "a": _cards((CardColor.SPADE, 8), (CardColor.SPADE, 9)),
+            "b": _cards((CardColor.HEART, 2), (CardColor.CLUB, 2)),
+        },
+        player_bets={"a": 20, "b": 20},
+        table_cards=table_cards,
+    )
+    game.stage = GameStage.PRE_FLOP
+
+    game.advance_stage()
+    player_state = game.player_states["a"]
+    assert player_state.current_hand.hand_type == HandType.HIGH_CARD
+    assert player_state.draws.flush_outs == 9
+    assert player_state.draws.straight_outs == 8
+    assert game.player_states["b"].current_hand.hand_type == HandType.THREE_OF_A_KIND
+
+    game.advance_stage()
+    assert player_state.current_hand.hand_type == HandType.FLUSH
+    assert player_state.draws.flush_outs == 0
+
+    game.advance_stage()
+    assert player_state.current_hand.hand_type == HandType.FLUSH
+    assert player_state.draws is None
+
+
+@pytest.mark.django_db
+def test_cards_and_hands_as_keys():
+    cards = _cards(
+        (CardColor.SPADE, 1),
+        (CardColor.SPADE, 13),
+        (CardColor.SPADE, 12),
+        (CardColor.SPADE, 11),
+        (CardColor.SPADE, 10),
+    )
+    assert len(set(cards + _cards((CardColor.SPADE, 1)))) == 5
+    hand = Hand.from_cards(cards)
+    same_hand = Hand.from_cards(list(reversed(cards)))
+    assert {hand: "royal flush"}[same_hand] == "royal flush"
@@ -1,7 +1,6 @@
 import pytest
 
-from pokerback.poker.objects import Card, CardColor
-from pokerback.poker.poker_utils import Hand, HandType
+from pokerback.poker.objects import Card, CardColor, Hand, HandType
 
 
 @pytest.mark.django_db
@@ -0,0 +1,216 @@
+import pytest
+from types import SimpleNamespace
+
+from pokerback.apis.player_apis import PlayerActionRequest
+from pokerback.poker.managers import PokerManager
+from pokerback.poker.objects import ActionType, GameMetadata, PokerGames
+from pokerback.poker.player_apis import PokerAction
+from pokerback.room.managers import RoomManager
+from pokerback.room.models import Room
+from pokerback.room.objects import GameType, RoomStatus, Slot, TableMetadata
+from pokerback.utils.codecs import get_codec
+from pokerback.utils.redis import RedisConflictError, RedisLockError, encode_value
+
+
+def build_room():
+    room = Room(
+        room_uuid="room",
+        room_key="ROOM",
+        host_user_uuid="host",
+        room_status=RoomStatus.ACTIVE,
+        table_metadata=TableMetadata(
+            game_type=GameType.POKER,
+            max_slots=4,
+            action_seconds_limit=60,
+            slots=[Slot() for _ in range(4)],
+        ),
+    )
+    room.save()
+    return room
+
+
+def sit(room, name, slot_idx):
+    player = SimpleNamespace(uuid=name, name=name)
+    return RoomManager().sit_player(room.room_uuid, player, slot_idx)
+
+
+def sit_loaded(room, name, slot_idx):
+    # Sits on the room as it was loaded, rather than on the stored room
+    return room.update(
+        lambda room: RoomManager()._sit_player(room, name, name, slot_idx)
+    )
+
+
+@pytest.mark.django_db
+def test_update_under_lock(fake_redis):
+    room = build_room()
+    assert room.version == 1
+    stale_room = Room.load("room")
+    sit(room, "a", 0)
+
+    # Mutations apply to the stored room, not to the room given
+    room = sit_loaded(stale_room, "b", 1)
+    assert room.version == 3
+    assert [slot.player_id for slot in Room.load("room").table_metadata.slots] == [
+        "a",
+        "b",
+        None,
+        None,
+    ]
+
+
+@pytest.mark.django_db
+def test_update_lease_expired(fake_redis):
+    build_room()
+
+    def slow_update(room):
+        room.room_key = "SLOW"
+        # The lease expired and the lock was taken by another worker
+        fake_redis._incr("lock-token:room")
+
+    with pytest.raises(RedisLockError):
+        Room.load("room").update(slow_update)
+    assert Room.load("room").room_key == "ROOM"
+
+
+@pytest.mark.django_db
+def test_update_optimistic(fake_redis, settings):
+    settings.REDIS_UPDATE_MODE = "optimistic"
+    room = build_room()
+
+    # Loaded once, then saved as it did not change since it was loaded
+    fake_redis.num_round_trips = 0
+    room = sit(room, "a", 0)
+    assert fake_redis.num_round_trips == 2
+    assert room.version == 2
+
+    # Retried on the stored room after a conflict
+    stale_room = Room.load("room")
+    sit(room, "b", 1)
+    room = sit_loaded(stale_room, "c", 2)
+    assert room.version == 4
+    assert [slot.player_id for slot in Room.load("room").table_metadata.slots] == [
+        "a",
+        "b",
+        "c",
+        None,
+    ]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("update_mode", ["lock", "optimistic"])
+def test_update_loads_once(fake_redis, settings, monkeypatch, update_mode):
+    settings.REDIS_UPDATE_MODE = update_mode
+    room = build_room()
+    loaded_keys = []
+    load = Room.load.__func__
+
+    def counted_load(cls, object_key):
+        loaded_keys.append(object_key)
+        return load(cls, object_key)
+
+    monkeypatch.setattr(Room, "load", classmethod(counted_load))
+    sit(room, "a", 0)
+    assert loaded_keys == ["room"]
+
+
+@pytest.mark.django_db
+def test_update_optimistic_conflicts(fake_redis, settings):
+    settings.REDIS_UPDATE_MODE = "optimistic"
+    settings.REDIS_UPDATE_RETRIES = 3
+    room = build_room()
+
+    def concurrent_update(room):
+        fake_redis._incr("room_room:version")
+
+    with pytest.raises(RedisConflictError):
+        room.update(concurrent_update)
+
+
+def play_games(room, num_games):
+    manager = PokerManager()
+    for _ in range(num_games):
+        room = manager.start_game(room.room_uuid)
+        game = room.poker_games.games[-1]
+        room = manager.handle_player_action(
+            room.room_uuid,
+            game.next_player_id,
+            PlayerActionRequest(poker_action=PokerAction(action_type=ActionType.FOLD)),
+        )
+    return room
+
+
+@pytest.mark.django_db
+def test_room_fields(fake_redis):
+    room = build_room()
+    room.poker_games = PokerGames(
+        game_metadata=GameMetadata(small_blind=10, init_token=1000)
+    )
+    room.save()
+    sit(room, "a", 0)
+    room = play_games(sit(room, "b", 1), 3)
+    stored_room = Room.load("room")
+    # Past games are loaded when accessed
+    assert stored_room.poker_games.games.num_raw == 2
+    assert stored_room == room
+    assert sorted(fake_redis.values["room_room"]) == [
+        b"game:0",
+        b"game:1",
+        b"game:2",
+        b"players",
+        b"room",
+    ]
+
+    # An action only writes the current game
+    manager = PokerManager()
+    room = manager.start_game(room.room_uuid)
+    fake_redis.bytes_written = 0
+    manager.handle_player_action(
+        room.room_uuid,
+        room.poker_games.games[-1].next_player_id,
+        PlayerActionRequest(
+            poker_action=PokerAction(action_type=ActionType.BET, amount_bet=10)
+        ),
+    )
+    current_game = fake_redis.values["room_room"][b"game:3"]
+    assert fake_redis.bytes_written == len(current_game)
+
+
+@pytest.mark.django_db
+def test_room_fields_legacy(fake_redis):
+    room = build_room()
+    room.poker_games = PokerGames(
+        game_metadata=GameMetadata(small_blind=10, init_token=1000)
+    )
+    room.save()
+    sit(room, "a", 0)
+    room = play_games(sit(room, "b", 1), 2)
+
+    # Rooms stored as one value are stored as hashes once saved again
+    for codec in ("json", "binary"):
+        fake_redis.values["room_room"] = encode_value(get_codec(codec).encode(room))
+        assert Room.load("room") == room
+        room = play_games(Room.load("room"), 1)
+        assert Room.load("room") == room
+        assert len(fake_redis.values["room_room"]) == len(room.poker_games.games) + 2
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("update_mode", ["lock", "optimistic", "queue"])
+def test_room_fields_server(server_redis, settings, update_mode):
+    settings.REDIS_UPDATE_MODE = update_mode
+    room = build_room()
+    room.poker_games = PokerGames(
+        game_metadata=GameMetadata(small_blind=10, init_token=1000)
+    )
+    room.save()
+    sit(room, "a", 0)
+    room = play_games(sit(room, "b", 1), 3)
+    assert Room.load("room") == room
+
+    # Rooms stored as one value are stored as hashes once saved again
+    server_redis.set("room_room", get_codec("binary").encode(room))
+    room = play_games(Room.load("room"), 1)
+    assert Room.load("room") == room
+    fields, _ = server_redis.get_fields("room_room")
+    assert len(fields) == len(room.poker_games.games) + 2
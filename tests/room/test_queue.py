@@ -0,0 +1,162 @@
+import json
+import pytest
+import time
+
+from pokerback.poker.objects import GameMetadata, PokerGames
+from pokerback.room.models import Room
+from pokerback.room.queue import RoomQueue, RoomQueueError
+from pokerback.utils.redis import RedisConflictError, RedisLockError, get_redis
+from tests.room.test_models import build_room, play_games, sit
+
+
+def push_update(update_id, **kwargs):
+    get_redis().push(
+        "room-queue:room",
+        json.dumps(
+            {
+                "id": update_id,
+                "manager": "pokerback.room.managers.RoomManager",
+                "method": "_sit_player",
+                "kwargs": kwargs,
+                "deadline": time.time() + 10,
+            }
+        ),
+    )
+
+
+@pytest.mark.django_db
+def test_queued_updates(fake_redis, settings, monkeypatch):
+    settings.REDIS_UPDATE_MODE = "queue"
+    room = build_room()
+
+    # Updates queued by other requests are applied first, in order
+    push_update("other", player_id="a", player_name="a", slot_idx=0)
+    push_update("failing", player_id="b", player_name="b", slot_idx=0)
+    room = sit(room, "c", 2)
+    assert [slot.player_id for slot in room.table_metadata.slots] == [
+        "a",
+        None,
+        "c",
+        None,
+    ]
+    assert room.version == 3
+    assert get_redis().pop("room-result:other")["version"] == 2
+    assert "Slot already filled" in get_redis().pop("room-result:failing")["error"]
+    assert not get_redis().length("room-queue:room")
+
+    with pytest.raises(RoomQueueError):
+        sit(room, "d", 0)
+    assert Room.load("room").table_metadata.slots[0].player_id == "a"
+
+    # The room saved by the update is returned, without the updates applied after
+    wait_pop = get_redis().wait_pop
+
+    def wait_pop_after_update(key, timeout):
+        push_update("later", player_id="e", player_name="e", slot_idx=3)
+        RoomQueue("room").consume()
+        return wait_pop(key, timeout)
+
+    monkeypatch.setattr(get_redis(), "wait_pop", wait_pop_after_update)
+    room = sit(room, "d", 1)
+    assert [slot.player_id for slot in room.table_metadata.slots] == [
+        "a",
+        "d",
+        "c",
+        None,
+    ]
+    stored_room = Room.load("room")
+    assert stored_room.table_metadata.slots[3].player_id == "e"
+    assert room.version == stored_room.version - 1
+
+
+@pytest.mark.django_db
+def test_queued_updates_past_games(fake_redis, settings, monkeypatch):
+    settings.REDIS_UPDATE_MODE = "queue"
+    room = build_room()
+    room.poker_games = PokerGames(
+        game_metadata=GameMetadata(small_blind=10, init_token=1000)
+    )
+    room.save()
+    sit(room, "a", 0)
+    room = play_games(sit(room, "b", 1), 3)
+
+    # Results only carry the current game, past games are read when accessed
+    pushed = []
+    push_result = RoomQueue._push_result
+
+    def recorded_push_result(self, update_id, result):
+        pushed.append(result)
+        push_result(self, update_id, result)
+
+    monkeypatch.setattr(RoomQueue, "_push_result", recorded_push_result)
+    room = play_games(room, 1)
+    assert sorted(pushed[-1]["fields"]) == ["game:3", "players", "room"]
+    assert room.poker_games.games.num_raw == 3
+    num_round_trips = fake_redis.num_round_trips
+    assert room == Room.load("room")
+    assert fake_redis.num_round_trips == num_round_trips + 2
+
+    # Saved again, the past games are saved as they were
+    room.room_key = "SAVED"
+    room.save()
+    assert Room.load("room") == room
+
+
+@pytest.mark.django_db
+def test_queued_updates_batches(fake_redis, settings):
+    settings.REDIS_UPDATE_MODE = "queue"
+    settings.ROOM_QUEUE_MAX_BATCH = 2
+    build_room()
+
+    for idx in range(3):
+        push_update(str(idx), player_id=str(idx), player_name="", slot_idx=idx)
+    RoomQueue("room").consume()
+    assert get_redis().length("room-queue:room") == 1
+    RoomQueue("room").consume()
+    assert [slot.player_id for slot in Room.load("room").table_metadata.slots] == [
+        "0",
+        "1",
+        "2",
+        None,
+    ]
+
+
+@pytest.mark.django_db
+def test_queued_updates_timeout(fake_redis, settings, monkeypatch):
+    settings.REDIS_UPDATE_MODE = "queue"
+    settings.ROOM_QUEUE_TIMEOUT = 0
+    room = build_room()
+
+    # Another worker consumes the queue, and never gets to this update
+    get_lock_free = get_redis().get_lock
+
+    def get_lock(key, blocking=True):
+        raise RedisLockError()
+
+    monkeypatch.setattr(get_redis(), "get_lock", get_lock)
+    with pytest.raises(RoomQueueError):
+        sit(room, "a", 0)
+    assert get_redis().length("room-queue:room") == 1
+
+    # The update is skipped once the request gave up on it
+    monkeypatch.setattr(get_redis(), "get_lock", get_lock_free)
+    RoomQueue("room").consume()
+    assert not get_redis().length("room-queue:room")
+    assert Room.load("room").table_metadata.slots[0].player_id is None
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("error", [RedisLockError, RedisConflictError])
+def test_queued_updates_lease_expired(fake_redis, monkeypatch, error):
+    build_room()
+    push_update("0", player_id="0", player_name="", slot_idx=0)
+    push_update("1", player_id="1", player_name="", slot_idx=1)
+
+    # The save is rejected, the next update is left to the next holder of the lock
+    def rejected_save(room, lock=None):
+        raise error()
+
+    monkeypatch.setattr(Room, "save", rejected_save)
+    RoomQueue("room").consume()
+    assert error.__name__ in get_redis().pop("room-result:0")["error"]
+    assert get_redis().length("room-queue:room") == 1
@@ -4,7 +4,7 @@ from enum import Enum
 from recordclass import RecordClass
 from typing import List, Dict, Optional
 
-from pokerback.utils.baseobject import BaseObject
+from pokerback.utils.baseobject import BaseObject, baseobject_as_json_dict
 
 
 class Choice(Enum):
@@ -81,3 +81,199 @@ def test_deserialize(b_object, b_json):
 def test_validate():
     with pytest.raises(AssertionError):
         A(num="a", text="b")
+
+
+class Positive(BaseObject):
+    num: int
+
+    def validate(self):
+        assert self.num > 0
+        super().validate()
+
+
+class C(BaseObject):
+    positives: List[Positive]
+
+
+@pytest.mark.django_db
+def test_validate_nested():
+    with pytest.raises(AssertionError):
+        B.from_json({"a": {"num": "1", "text": "text_a"}, "lists": [], "dicts": {}})
+    with pytest.raises(AssertionError):
+        C.from_json({"positives": [{"num": 1}, {"num": -1}]})
+    assert C.from_json({"positives": [{"num": 1}]}).positives[0].num == 1
+
+
+@pytest.mark.django_db
+def test_deserialize_trusted():
+    # Trusted data is not validated
+    c = C.from_json({"positives": [{"num": -1}]}, trusted=True)
+    assert c.positives[0].num == -1
+    with pytest.raises(AssertionError):
+        c.validate()
+
+
+class Slotted(BaseObject, slots=True):
+    num: int
+    nums: List[int] = []
+    choice: Choice = Choice.CHOICE_A
+
+
+class SlottedChild(Slotted, slots=True):
+    a: Optional[A] = None
+
+
+@pytest.mark.django_db
+def test_slots():
+    slotted = Slotted(num=1)
+    assert not hasattr(slotted, "__dict__")
+    assert slotted.nums == [] and slotted.nums is not Slotted(num=2).nums
+    assert slotted.deep_get("choice") == Choice.CHOICE_A
+    with pytest.raises(AttributeError):
+        slotted.unknown = 1
+    with pytest.raises(AssertionError):
+        Slotted(num="a")
+
+    child = SlottedChild(num=1, a=A(num=2, text="text_a"))
+    assert not hasattr(child, "__dict__")
+    assert child.choice == Choice.CHOICE_A
+    assert child.a.num == 2
+
+    json_str = slotted.to_json_str()
+    assert json.loads(json_str) == {"num": 1, "nums": [], "choice": 1}
+    assert Slotted.from_json_str(json_str) == slotted
+
+
+@pytest.mark.django_db
+def test_copy(b_object):
+    b_copy = b_object.copy()
+    assert b_copy == b_object
+    assert b_copy.a is not b_object.a
+    assert b_copy.lists[0]["first"] is not b_object.lists[0]["first"]
+    assert b_copy.dicts["first"][1] is None
+
+    b_copy.lists[0]["first"].num = 2
+    assert b_object.lists[0]["first"].num == 1
+
+
+@pytest.mark.django_db
+def test_copy_snapshot(b_object):
+    snapshot = b_object.copy()
+    b_object.a.num = 2
+    b_object.lists[0]["first"].text = "changed"
+    b_object.lists.append({})
+    assert snapshot.a.num == 1
+    assert snapshot.lists[0]["first"].text == "text_a"
+    assert len(snapshot.lists) == len(b_object.lists) - 1
+
+
+class History(BaseObject):
+    entries: List[A] = []
+
+    lazy_fields = ("entries",)
+
+
+@pytest.mark.django_db
+def test_lazy_fields():
+    json_dict = {
+        "entries": [{"num": num, "text": "text", "choice": 1} for num in range(3)]
+    }
+    history = History.from_json(json_dict, trusted=True)
+    # Only the last entry is loaded
+    assert history.entries.num_raw == 2
+    assert len(history.entries) == 3
+    assert history.entries[-1].num == 2
+    assert history.entries.num_raw == 2
+    assert history.entries[0].num == 0
+    assert history.entries.num_raw == 1
+
+    history.entries.append(A(num=3, text="text"))
+    assert history.to_json() == {
+        "entries": json_dict["entries"] + [{"num": 3, "text": "text", "choice": 2}]
+    }
+    assert history.entries.num_raw == 1
+    assert [entry.num for entry in history.entries] == [0, 1, 2, 3]
+    assert history.entries.num_raw == 0
+
+
+@pytest.mark.django_db
+def test_lazy_fields_as_json_dict():
+    json_dict = {
+        "entries": [{"num": num, "text": "text", "choice": 1} for num in range(3)]
+    }
+    history = History.from_json(json_dict, trusted=True)
+    assert baseobject_as_json_dict(history.entries) == json_dict["entries"]
+
+
+class FrozenPair(BaseObject):
+    text: str
+    nums: List[int]
+
+    frozen = True
+
+
+@pytest.mark.django_db
+def test_equality(b_object):
+    assert b_object == b_object.copy()
+    other = b_object.copy()
+    other.dicts["second"][0].num = 2
+    assert b_object != other
+    assert A(num=1, text="a") != A(num=1, text="a", choice=Choice.CHOICE_A)
+    assert A(num=1, text="a") != B(a=A(num=1, text="a"), lists=[], dicts={})
+
+
+@pytest.mark.django_db
+def test_hash():
+    with pytest.raises(TypeError):
+        hash(A(num=1, text="a"))
+    pair = FrozenPair(text="a", nums=[1, 2])
+    same_pair = FrozenPair(text="a", nums=[1, 2])
+    assert pair == same_pair and hash(pair) == hash(same_pair)
+    assert {pair: 1}[same_pair] == 1
+    assert FrozenPair(text="a", nums=[2, 1]) not in {pair}
+
+
+@pytest.mark.django_db
+def test_diff_and_patch(b_object):
+    new_b = b_object.copy()
+    new_b.a.num = 2
+    new_b.lists[0]["first"].choice = Choice.CHOICE_A
+    new_b.lists[1]["fourth/~"] = A(num=4, text="text_d")
+    del new_b.lists[0]["second"]
+    new_b.lists.append({})
+    new_b.dicts["first"] = [None]
+    new_b.optionals_present = None
+    new_b.optionals_none = A(num=5, text="text_e")
+
+    patch = b_object.diff(new_b)
+    assert {"op": "replace", "path": "/a/num", "value": 2} in patch
+    assert {"op": "remove", "path": "/lists/0/second"} in patch
+    assert {"op": "add", "path": "/lists/-", "value": {}} in patch
+    assert {
+        "op": "add",
+        "path": "/lists/1/fourth~1~0",
+        "value": {"num": 4, "text": "text_d", "choice": 2},
+    } in patch
+    assert b_object.copy().patch(json.loads(json.dumps(patch))) == new_b
+    assert new_b.copy().patch(new_b.diff(b_object)) == b_object
+    assert b_object.diff(b_object.copy()) == []
+
+
+@pytest.mark.django_db
+def test_diff_lazy_fields():
+    json_dict = {
+        "entries": [{"num": num, "text": "text", "choice": 1} for num in range(3)]
+    }
+    old = History.from_json(json_dict, trusted=True)
+    new = History.from_json(json_dict, trusted=True)
+    new.entries[-1].num = 5
+    new.entries.append(A(num=3, text="text"))
+
+    patch = old.diff(new)
+    assert patch == [
+        {"op": "replace", "path": "/entries/2/num", "value": 5},
+        {"op": "add", "path": "/entries/-", "value": new.entries[3].to_json()},
+    ]
+    # Entries never loaded on both sides are not loaded to be compared
+    assert old.entries.num_raw == 2 and new.entries.num_raw == 2
+    assert old.patch(patch).to_json() == new.to_json()
@@ -0,0 +1,168 @@
+import pytest
+from enum import Enum
+from typing import Dict, List, Optional
+
+from pokerback.poker.objects import Card, CardColor
+from pokerback.utils.baseobject import BaseObject
+from pokerback.utils.codecs import (
+    BINARY_HEADER,
+    BINARY_MAGIC,
+    CodecError,
+    _get_baseobject_codec,
+    decode_object,
+    get_codec,
+    get_schema_fingerprint,
+)
+
+
+class Choice(Enum):
+    CHOICE_A = "a"
+    CHOICE_B = "b"
+
+
+class Leaf(BaseObject):
+    num: int
+    ratio: float = 0.5
+    flag: bool = False
+    choice: Choice = Choice.CHOICE_A
+
+
+class Tree(BaseObject):
+    name: str
+    leaves: List[Leaf]
+    leaves_by_name: Dict[str, Leaf] = {}
+    cards: List[Card] = []
+    optional_leaf: Optional[Leaf] = None
+    optional_num: Optional[int] = None
+
+
+@pytest.fixture
+def tree():
+    return Tree(
+        name="tree ♠",
+        leaves=[Leaf(num=-1), Leaf(num=1 << 40, ratio=-2.25, flag=True)],
+        leaves_by_name={"first": Leaf(num=0, choice=Choice.CHOICE_B)},
+        cards=[Card.from_card(CardColor.CLUB, 1), Card.from_card(CardColor.HEART, 13)],
+        optional_num=300,
+    )
+
+
+@pytest.mark.django_db
+def test_binary_codec(tree):
+    data = get_codec("binary").encode(tree)
+    assert data.startswith(BINARY_MAGIC)
+    assert len(data) < len(get_codec("json").encode(tree)) / 2
+
+    decoded = decode_object(Tree, data)
+    assert decoded == tree
+    assert decoded.cards[0] is tree.cards[0]
+    assert decoded.optional_leaf is None
+
+
+@pytest.mark.django_db
+def test_legacy_json(tree):
+    json_str = get_codec("json").encode(tree)
+    assert decode_object(Tree, json_str) == tree
+    assert decode_object(Tree, json_str.encode("utf-8")) == tree
+
+
+@pytest.mark.django_db
+def test_schema_changed(tree):
+    data = get_codec("binary").encode(tree)
+    with pytest.raises(CodecError):
+        decode_object(Leaf, data)
+
+
+def stored_classes(leaf_num_class=int):
+    # Tree and Leaf as they were stored, before fields were added or changed
+    class Leaf(BaseObject):
+        num: leaf_num_class
+        ratio: float = 0.5
+        flag: bool = False
+
+    class Tree(BaseObject):
+        name: str
+        leaves: List[Leaf]
+
+    return Tree, Leaf
+
+
+class Empty(BaseObject):
+    pass
+
+
+@pytest.mark.django_db
+def test_field_added():
+    StoredTree, StoredLeaf = stored_classes()
+    stored = StoredTree(name="tree", leaves=[StoredLeaf(num=1, flag=True)])
+    data = get_codec("binary").encode(stored)
+
+    # Fields added since the tree was stored take their default
+    decoded = decode_object(Tree, data)
+    assert decoded == Tree(name="tree", leaves=[Leaf(num=1, flag=True)])
+    assert decode_object(Tree, get_codec("binary").encode(decoded)) == decoded
+
+    # Fields without a default cannot be missing
+    with pytest.raises(CodecError):
+        decode_object(Tree, get_codec("binary").encode(Empty()))
+
+
+@pytest.mark.django_db
+def test_field_changed():
+    StoredTree, StoredLeaf = stored_classes(leaf_num_class=str)
+    stored = StoredTree(name="tree", leaves=[StoredLeaf(num="1")])
+    with pytest.raises(CodecError):
+        decode_object(Tree, get_codec("binary").encode(stored))
+
+
+# Choice as it was stored, before a member was removed and members reordered
+StoredChoice = Enum("Choice", [("CHOICE_C", "c"), ("CHOICE_B", "b")])
+
+
+@pytest.mark.django_db
+def test_enum_changed():
+    StoredLeaf = type(
+        "Leaf",
+        (BaseObject,),
+        {
+            "__annotations__": dict(Leaf.__annotations__, choice=StoredChoice),
+            "ratio": 0.5,
+            "flag": False,
+        },
+    )
+
+    # Members are read by value, members removed since failing to decode
+    data = get_codec("binary").encode(StoredLeaf(num=1, choice=StoredChoice.CHOICE_B))
+    assert decode_object(Leaf, data).choice == Choice.CHOICE_B
+    data = get_codec("binary").encode(StoredLeaf(num=1, choice=StoredChoice.CHOICE_C))
+    with pytest.raises(CodecError):
+        decode_object(Leaf, data)
+
+
+@pytest.mark.django_db
+def test_binary_version_1(tree):
+    fingerprint = get_schema_fingerprint(Tree)
+    buffer = bytearray(BINARY_HEADER.pack(BINARY_MAGIC, 1, fingerprint))
+    _get_baseobject_codec(Tree, 1)[0](buffer, tree)
+    assert decode_object(Tree, bytes(buffer)) == tree
+    with pytest.raises(CodecError):
+        decode_object(Leaf, bytes(buffer))
+
+
+class History(BaseObject):
+    trees: List[Tree] = []
+
+    lazy_fields = ("trees",)
+
+
+@pytest.mark.django_db
+def test_binary_codec_lazy_fields(tree):
+    history = History(trees=[tree, tree.copy()])
+    data = get_codec("binary").encode(history)
+    decoded = decode_object(History, data)
+    assert decoded.trees.num_raw == 1
+    # Items never loaded are stored again as they were
+    assert get_codec("binary").encode(decoded) == data
+    assert get_codec("json").encode(decoded) == get_codec("json").encode(history)
+    assert decoded.trees.num_raw == 0
+    assert decoded == history
@@ -0,0 +1,236 @@
+import pickle
+import pytest
+import redis
+import redis_lock
+import time
+from django.core.exceptions import ImproperlyConfigured
+
+from pokerback.utils.redis import (
+    RedisClient,
+    RedisLock,
+    RedisLockError,
+    decode_value,
+    encode_value,
+    get_lock_stats,
+    reset_lock_stats,
+)
+from tests.conftest import FakeStrictRedis
+
+
+@pytest.fixture
+def redis_client():
+    client = RedisClient()
+    client.redis_client = FakeStrictRedis()
+    return client
+
+
+@pytest.mark.django_db
+def test_values(redis_client):
+    values = {"dict": {"a": [1, 2]}, "str": "text ♠", "bytes": b"\xff\x00\x80"}
+    for key, val in values.items():
+        redis_client.set(key, val)
+    for key, val in values.items():
+        assert redis_client.get(key) == val
+    # A single round trip per value
+    assert redis_client.redis_client.num_gets == len(values)
+    assert redis_client.get("missing") is None
+
+
+@pytest.mark.django_db
+def test_legacy_values():
+    assert decode_value(pickle.dumps({"a": 1})) == {"a": 1}
+    assert decode_value(b'{"room_uuid": "a"}') == b'{"room_uuid": "a"}'
+    assert decode_value(b"\x80 not a pickle") == b"\x80 not a pickle"
+    assert decode_value(encode_value(b"\x80")) == b"\x80"
+
+
+@pytest.mark.django_db
+def test_connection_pool(settings):
+    settings.REDIS_MAX_CONNECTIONS = 3
+    settings.REDIS_SOCKET_TIMEOUT = 1.5
+    settings.REDIS_LOCK_ACQUIRE_TIMEOUT = 1
+    pool = RedisClient().connection_pool
+    assert pool.max_connections == 3
+    assert pool.connection_kwargs["socket_timeout"] == 1.5
+
+    # Waiting for a lock would time out the socket first
+    settings.REDIS_LOCK_ACQUIRE_TIMEOUT = 2
+    with pytest.raises(ImproperlyConfigured):
+        RedisClient()
+
+
+@pytest.mark.django_db
+def test_versioned_fields(redis_client):
+    fake = redis_client.redis_client
+    redis_client.get_fields_script = fake.get_fields
+    redis_client.set_fields_script = fake.set_fields
+    assert redis_client.get_fields("key") == (None, 0)
+    assert redis_client.set_fields("key", {"a": b"1", "b": "2"}) == 1
+    assert redis_client.get_fields("key") == ({"a": b"1", "b": "2"}, 1)
+
+    # Only set if the hash is still at the version given
+    assert redis_client.set_fields("key", {"a": b"3"}, version=0) == 0
+    assert redis_client.get_fields("key") == ({"a": b"1", "b": "2"}, 1)
+    assert redis_client.set_fields("key", {"a": b"3"}, deleted=["b"], version=1) == 2
+    assert redis_client.get_fields("key") == ({"a": b"3"}, 2)
+    assert redis_client.set_fields("key", {"c": b"4"}, replace=True) == 3
+    assert redis_client.get_fields("key") == ({"c": b"4"}, 3)
+
+    redis_client.delete("key")
+    assert redis_client.get_fields("key") == (None, 0)
+
+    # Values stored before hashes are read as they are
+    fake.set("key", encode_value("legacy"))
+    assert redis_client.get_fields("key") == ("legacy", 0)
+
+
+@pytest.mark.django_db
+def test_fields_scripts(server_redis):
+    assert server_redis.get_fields("key") == (None, 0)
+    assert server_redis.set_fields("key", {"a": b"1", "b": "2"}) == 1
+    assert server_redis.get_fields("key") == ({"a": b"1", "b": "2"}, 1)
+
+    # Only set if the hash is still at the version given
+    assert server_redis.set_fields("key", {"a": b"3"}, version=0) == 0
+    assert server_redis.set_fields("key", {"a": b"3"}, version=2) == 0
+    assert server_redis.get_fields("key") == ({"a": b"1", "b": "2"}, 1)
+    assert server_redis.set_fields("key", {"a": b"3"}, deleted=["b"], version=1) == 2
+    assert server_redis.get_fields("key") == ({"a": b"3"}, 2)
+    assert server_redis.get_field_values("key", ["a", "b"]) == [b"3", None]
+
+    # Only set if no lock holder came after the one holding the token
+    token = server_redis.get_fencing_token("room")
+    assert server_redis.get_fencing_token("room") == token + 1
+    assert not server_redis.set_fields(
+        "key", {"a": b"4"}, lock_key="room", fencing_token=token
+    )
+    assert server_redis.set_fields(
+        "key", {"a": b"4"}, lock_key="room", fencing_token=token + 1
+    )
+    assert server_redis.get_fields("key") == ({"a": b"4"}, 3)
+
+    # Values stored before hashes are read as they are, and replaced by hashes
+    server_redis.delete("key")
+    server_redis.set("key", "legacy")
+    assert server_redis.get_fields("key") == ("legacy", 0)
+    assert server_redis.set_fields("key", {"c": b"5"}, replace=True, version=0) == 1
+    assert server_redis.get_fields("key") == ({"c": b"5"}, 1)
+
+    # Arguments are unpacked in chunks
+    fields = {str(idx): str(idx).encode() for idx in range(2500)}
+    assert server_redis.set_fields("key", fields, replace=True) == 2
+    assert server_redis.get_fields("key") == (fields, 2)
+    deleted = [str(idx) for idx in range(2200)]
+    assert server_redis.set_fields("key", {"c": b"6"}, deleted=deleted) == 3
+    fields = {str(idx): str(idx).encode() for idx in range(2200, 2500)}
+    assert server_redis.get_fields("key") == (dict(fields, c=b"6"), 3)
+
+
+class FakeLeaseLock:
+    # Taken by someone else when busy, until the timeout if it is 0
+    busy = False
+
+    def __init__(self, redis_client, name, expire=None, auto_renewal=False):
+        self.expire = expire
+        self.auto_renewal = auto_renewal
+
+    def acquire(self, blocking=True, timeout=None):
+        self.timeout = timeout
+        if not blocking:
+            return not self.busy
+        return timeout != 0
+
+    def release(self):
+        raise redis_lock.NotAcquired()
+
+
+@pytest.mark.django_db
+def test_lease_locks(redis_client, monkeypatch, settings):
+    settings.REDIS_LOCK_EXPIRE = 7
+    settings.REDIS_LOCK_ACQUIRE_TIMEOUT = 3
+    monkeypatch.setattr(redis_lock, "Lock", FakeLeaseLock)
+
+    with RedisLock("room", redis_client=redis_client) as lock:
+        assert lock.lock.expire == 7
+        assert lock.lock.auto_renewal
+        assert lock.fencing_token == 1
+    # Waited for when busy, releasing an expired lease is not an error
+    monkeypatch.setattr(FakeLeaseLock, "busy", True)
+    with RedisLock("room", redis_client=redis_client) as lock:
+        assert lock.lock.timeout == 3
+        assert lock.fencing_token == 2
+
+    settings.REDIS_LOCK_ACQUIRE_TIMEOUT = 0
+    with pytest.raises(RedisLockError):
+        with RedisLock("room", redis_client=redis_client):
+            pass
+
+
+@pytest.mark.django_db
+def test_lock_stats(redis_client, monkeypatch, settings, caplog):
+    monkeypatch.setattr(redis_lock, "Lock", FakeLeaseLock)
+    reset_lock_stats()
+
+    with RedisLock("room", redis_client=redis_client, stats_key="room_start_game"):
+        pass
+    monkeypatch.setattr(FakeLeaseLock, "busy", True)
+    settings.REDIS_SLOW_LOCK_SECONDS = -1
+    with RedisLock("room", redis_client=redis_client, stats_key="room_start_game"):
+        pass
+    settings.REDIS_LOCK_ACQUIRE_TIMEOUT = 0
+    with pytest.raises(RedisLockError):
+        with RedisLock("room", redis_client=redis_client):
+            pass
+
+    lock_stats = get_lock_stats()
+    assert lock_stats["room_start_game"]["wait"]["count"] == 2
+    assert lock_stats["room_start_game"]["hold"]["count"] == 2
+    assert lock_stats["room_start_game"]["hold"]["buckets"]["+Inf"] == 2
+    assert lock_stats["room_start_game"]["contended"] == 1
+    assert lock_stats["room_start_game"]["timeouts"] == 0
+    assert lock_stats["other"]["hold"]["count"] == 0
+    assert lock_stats["other"]["timeouts"] == 1
+    assert "Lock room (room_start_game) held for" in caplog.text
+
+
+@pytest.mark.django_db
+def test_lock_acquire_timeout(server_redis, monkeypatch, settings):
+    settings.REDIS_LOCK_ACQUIRE_TIMEOUT = 1
+    redis_client = server_redis
+    reset_lock_stats()
+
+    # Held by another holder, the wait times out
+    assert redis_lock.Lock(redis_client.redis_client, "room", expire=10).acquire()
+    started_at = time.monotonic()
+    with pytest.raises(RedisLockError):
+        with RedisLock("room", redis_client=redis_client):
+            pass
+    assert time.monotonic() - started_at >= 1
+
+    # Like the socket timing out while waiting
+    def blpop(*args, **kwargs):
+        raise redis.TimeoutError()
+
+    monkeypatch.setattr(redis_client.redis_client, "blpop", blpop)
+    with pytest.raises(RedisLockError):
+        with RedisLock("room", redis_client=redis_client):
+            pass
+    assert get_lock_stats()["other"]["timeouts"] == 2
+
+
+@pytest.mark.django_db
+def test_fenced_fields(redis_client):
+    redis_client.set_fields_script = redis_client.redis_client.set_fields
+    token = redis_client.get_fencing_token("room")
+    assert redis_client.set_fields(
+        "key", {"a": b"1"}, lock_key="room", fencing_token=token
+    )
+
+    # Rejected once the lock was taken by another holder
+    assert redis_client.get_fencing_token("room") == token + 1
+    assert not redis_client.set_fields(
+        "key", {"a": b"2"}, lock_key="room", fencing_token=token
+    )
+    assert redis_client.set_fields(
+        "key", {"a": b"2"}, lock_key="room", fencing_token=token + 1
+    )
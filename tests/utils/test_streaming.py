@@ -0,0 +1,81 @@
+import json
+import pytest
+from rest_framework.test import APIRequestFactory
+from typing import Dict, List, Optional
+
+from pokerback.utils import streaming
+from pokerback.utils.baseobject import BaseObject
+from pokerback.utils.streaming import iter_json_chunks
+from pokerback.utils.views import BaseGetView
+
+from tests.utils.test_baseobject import A, B, History, a_object, b_object
+
+
+class Log(BaseObject):
+    name: str
+    entries: List[B] = []
+    by_name: Dict[str, List[A]] = {}
+    last: Optional[B] = None
+    ratio: float = 0.5
+
+
+def _dumps(obj):
+    return json.dumps(
+        obj.to_json(), ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+@pytest.mark.django_db
+def test_iter_json_chunks(b_object, monkeypatch):
+    monkeypatch.setattr(streaming, "STREAM_CHUNK_FRAGMENTS", 10)
+    log = Log(
+        name='log "♠"',
+        entries=[b_object, b_object],
+        by_name={"empty": [], "a": [b_object.a]},
+        last=b_object,
+    )
+    chunks = list(iter_json_chunks(log))
+    assert len(chunks) > 1
+    assert b"".join(chunks) == _dumps(log)
+    assert b"".join(iter_json_chunks(Log(name="empty"))) == _dumps(Log(name="empty"))
+
+
+@pytest.mark.django_db
+def test_iter_json_chunks_lazy_fields():
+    json_dict = {
+        "entries": [{"num": num, "text": "text", "choice": 1} for num in range(3)]
+    }
+    history = History.from_json(json_dict, trusted=True)
+    assert json.loads(b"".join(iter_json_chunks(history)).decode()) == json_dict
+    assert history.entries.num_raw == 2
+
+
+class LogView(BaseGetView):
+    authentication_classes = ()
+    permission_classes = ()
+
+    response_class = Log
+    stream_response = True
+
+    def handle_request(self):
+        return Log(name="log")
+
+
+@pytest.mark.django_db
+def test_streaming_view():
+    response = LogView.as_view()(APIRequestFactory().get("/"))
+    assert response.streaming
+    assert response["Content-Type"] == "application/json"
+    assert b"".join(response.streaming_content) == _dumps(Log(name="log"))
+
+
+class InvalidLogView(LogView):
+    def handle_request(self):
+        return Log(name=object(), _validate=False)
+
+
+@pytest.mark.django_db
+def test_streaming_view_invalid():
+    response = InvalidLogView.as_view()(APIRequestFactory().get("/"))
+    assert not response.streaming
+    assert response.status_code == 400